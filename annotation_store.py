@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Shared, change-aware store for the annotation CSV.
+
+The CSV is parsed once per process and only re-read when its mtime or size
+changes on disk, so UI handlers can call into the store on every event
+without paying for a full ``pd.read_csv``. Crop columns are loaded as
+categoricals.
+
+For very large batches, ``python annotation_store.py convert`` turns the CSV
+into an uncompressed Arrow IPC file once. Pointed at that file, the store
+memory-maps it instead of building a DataFrame: single rows are read on
+demand, and whole columns are only materialized when a feature needs them
+(e.g. filtered navigation).
+"""
+
+import argparse
+import os
+import re
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from label_taxonomy import LabelMatrix, LabelNormalizer, encode_label_columns, parse_label_column
+from review_store import IMAGE_EXTENSIONS, get_disambiguated_filename, get_image_filename_from_path
+
+# Low-cardinality columns stored as categoricals
+CATEGORICAL_COLUMNS = ("crop1", "crop2")
+ARROW_EXTENSIONS = (".arrow", ".feather")
+
+
+def parse_labels(label_str: str) -> List[str]:
+    """Parse label string to list of labels"""
+    try:
+        # Handle different label formats
+        if isinstance(label_str, str):
+            # Remove brackets and quotes, split by comma
+            cleaned = label_str.strip("[]'\"")
+            if cleaned:
+                labels = [label.strip().strip("'\"") for label in cleaned.split(",")]
+                return [label for label in labels if label]
+        return []
+    except:
+        return []
+
+
+def convert_csv_to_arrow(csv_path: str, arrow_path: str) -> int:
+    """
+    Convert the annotation CSV to an uncompressed Arrow IPC file for memory-mapping.
+
+    Crop columns are dictionary-encoded (categoricals); every other column is
+    kept as a string column. The file is written next to arrow_path and renamed
+    into place, so a running app picks it up atomically.
+
+    Returns:
+        int: Number of rows written
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    convert_options = pa_csv.ConvertOptions(
+        column_types={name: pa.string() for name in header},
+        strings_can_be_null=True,
+    )
+    table = pa_csv.read_csv(csv_path, convert_options=convert_options)
+    for name in CATEGORICAL_COLUMNS:
+        if name in table.column_names:
+            position = table.column_names.index(name)
+            table = table.set_column(position, name, table.column(name).dictionary_encode())
+    # One shared dictionary per column, as the IPC file format requires
+    table = table.unify_dictionaries().combine_chunks()
+
+    temp_path = f"{arrow_path}.tmp"
+    with pa.OSFile(temp_path, "wb") as sink:
+        with pa_ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=64 * 1024)
+    os.replace(temp_path, arrow_path)
+    return table.num_rows
+
+
+class _RowIndexer:
+    """``table.iloc[row]`` for AnnotationTable, returning one row as a Series"""
+
+    def __init__(self, table: "AnnotationTable"):
+        self._table = table
+
+    def __getitem__(self, row: int) -> pd.Series:
+        return pd.Series(self._table.get_row(row))
+
+
+class AnnotationTable:
+    """
+    Read-only, memory-mapped annotation table backed by an Arrow IPC file.
+
+    Supports the subset of the DataFrame interface the app uses: len(),
+    ``empty``, ``columns``, ``in``, ``table[column]`` and ``table.iloc[row]``.
+    Rows are read individually from the mapped file, so memory stays bounded
+    regardless of the batch size; columns are materialized only when asked
+    for, and converted once per table.
+    """
+
+    def __init__(self, arrow_path: str):
+        import pyarrow as pa
+        import pyarrow.ipc as pa_ipc
+
+        self.arrow_path = arrow_path
+        # Zero-copy: record batches point straight into the mapped file
+        self._table = pa_ipc.open_file(pa.memory_map(arrow_path, "r")).read_all()
+        self.columns = pd.Index(self._table.column_names)
+        self.iloc = _RowIndexer(self)
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._table.num_rows
+
+    @property
+    def empty(self) -> bool:
+        return self._table.num_rows == 0
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._table.column_names
+
+    def get_row(self, row: int) -> dict:
+        """Read a single row as {column: value}"""
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(f"row {row} out of range for {len(self)} annotations")
+        values = self._table.slice(row, 1).to_pylist()[0]
+        # Match pd.read_csv, which gives NaN for empty cells
+        return {name: (float("nan") if value is None else value) for name, value in values.items()}
+
+    def __getitem__(self, column: str) -> pd.Series:
+        """Materialize a whole column (categorical for dictionary-encoded columns)"""
+        series = self._columns.get(column)
+        if series is not None:
+            return series
+        series = self._table.column(column).to_pandas()
+        series.name = column
+        with self._lock:
+            return self._columns.setdefault(column, series)
+
+    def get_column(self, column: str):
+        """Return a column as the mapped pyarrow ChunkedArray, without converting it"""
+        return self._table.column(column)
+
+
+class AnnotationIndex:
+    """Bidirectional row <-> image_path <-> review filename index for one CSV version"""
+
+    def __init__(self, image_paths):
+        self.image_paths = list(image_paths)
+        self.row_by_path = {}
+        self.filename_by_path = {}
+        self.path_by_filename = {}
+        # image_path -> rows after the first one that repeat the same image
+        self.duplicate_rows = {}
+        # Plain review filename -> every image path that maps to it
+        self.collisions = {}
+
+        for row, image_path in enumerate(self.image_paths):
+            if image_path in self.row_by_path:
+                # Duplicate rows share the first row's review
+                self.duplicate_rows.setdefault(image_path, []).append(row)
+                continue
+            self.row_by_path[image_path] = row
+
+            filename = get_image_filename_from_path(image_path)
+            # e.g. a/b_c.png and a_b/c.png: every colliding image gets a suffixed name,
+            # so which image a review file belongs to never depends on CSV row order.
+            # Reviews saved under the plain name before the collision appeared are
+            # still found by the review store, which checks their stored image_path.
+            if filename in self.collisions:
+                self.collisions[filename].append(image_path)
+                filename = get_disambiguated_filename(image_path)
+            elif filename in self.path_by_filename:
+                owner = self.path_by_filename.pop(filename)
+                self.collisions[filename] = [owner, image_path]
+                self._assign_filename(owner, get_disambiguated_filename(owner))
+                filename = get_disambiguated_filename(image_path)
+            self._assign_filename(image_path, filename)
+
+        if self.collisions:
+            print(f"Warning: {len(self.collisions)} review filename collisions detected; "
+                  f"colliding images use disambiguated filenames")
+
+    def _assign_filename(self, image_path: str, filename: str):
+        self.filename_by_path[image_path] = filename
+        self.path_by_filename[filename] = image_path
+
+    def get_row(self, image_path: str) -> Optional[int]:
+        """Return the 0-based row of an image path, or None if not in the CSV"""
+        return self.row_by_path.get(image_path)
+
+    def get_rows(self, image_paths: Iterable[str]) -> np.ndarray:
+        """Return the 0-based row of each image path, -1 for paths not in the CSV"""
+        return np.array([self.row_by_path.get(image_path, -1) for image_path in image_paths], dtype=np.int64)
+
+    def get_image_path(self, row: int) -> str:
+        """Return the image path stored at a 0-based row"""
+        return self.image_paths[row]
+
+    def get_review_filename(self, image_path: str) -> str:
+        """Return the review JSON filename for an image path"""
+        filename = self.filename_by_path.get(image_path)
+        return filename if filename is not None else get_image_filename_from_path(image_path)
+
+    def get_image_path_for_filename(self, filename: str) -> Optional[str]:
+        """Return the image path a review JSON filename belongs to"""
+        return self.path_by_filename.get(filename)
+
+
+class ArrowAnnotationIndex(AnnotationIndex):
+    """
+    AnnotationIndex over the image_path column of a memory-mapped AnnotationTable.
+
+    Lookups are hash probes into the mapped column (pyarrow.compute) instead of
+    Python dicts over every row. Only duplicate rows and colliding review
+    filenames, usually a handful, are kept as dicts.
+    """
+
+    def __init__(self, image_paths):
+        """
+        Args:
+            image_paths: pyarrow ChunkedArray of image paths, one per CSV row
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        self._pa = pa
+        self._pc = pc
+        self.image_paths = image_paths
+        self.filename_by_path = {}
+        self.path_by_filename = {}
+        self.duplicate_rows = {}
+        self.collisions = {}
+
+        # Row of the first occurrence of each row's image path
+        first_rows = pc.index_in(image_paths, value_set=image_paths).to_numpy()
+        is_first = first_rows == np.arange(len(first_rows))
+        for row in np.flatnonzero(~is_first).tolist():
+            self.duplicate_rows.setdefault(self.get_image_path(row), []).append(row)
+
+        # Same rules as AnnotationIndex: every image whose plain filename collides
+        # with another image's gets a disambiguated filename
+        self._unique_paths = image_paths.filter(pa.array(is_first))
+        self._plain_filenames = self._get_plain_filenames(self._unique_paths)
+        counts = pc.value_counts(self._plain_filenames)
+        colliding = counts.field("values").filter(pc.greater(counts.field("counts"), 1))
+        if len(colliding):
+            mask = pc.is_in(self._plain_filenames, value_set=colliding)
+            for image_path, filename in zip(self._unique_paths.filter(mask).to_pylist(),
+                                            self._plain_filenames.filter(mask).to_pylist()):
+                self.collisions.setdefault(filename, []).append(image_path)
+                self._assign_filename(image_path, get_disambiguated_filename(image_path))
+            print(f"Warning: {len(self.collisions)} review filename collisions detected; "
+                  f"colliding images use disambiguated filenames")
+
+    def _get_plain_filenames(self, image_paths):
+        """get_image_filename_from_path for a whole column, computed in Arrow"""
+        pc = self._pc
+        names = pc.replace_substring(image_paths, "/", "_")
+        names = pc.replace_substring(names, "\\", "_")
+        extensions = "|".join(re.escape(extension) for extension in IMAGE_EXTENSIONS)
+        names = pc.replace_substring_regex(names, f"({extensions})$", "")
+        return pc.binary_join_element_wise(names, ".json", "")
+
+    def get_row(self, image_path: str) -> Optional[int]:
+        """Return the 0-based row of an image path, or None if not in the CSV"""
+        row = self._pc.index(self.image_paths, image_path).as_py()
+        return row if row >= 0 else None
+
+    def get_rows(self, image_paths: Iterable[str]) -> np.ndarray:
+        """Return the 0-based row of each image path, -1 for paths not in the CSV"""
+        values = self._pa.array(list(image_paths), type=self._pa.string())
+        rows = self._pc.index_in(values, value_set=self.image_paths)
+        return rows.fill_null(-1).to_numpy().astype(np.int64)
+
+    def get_image_path(self, row: int) -> str:
+        """Return the image path stored at a 0-based row"""
+        return self.image_paths[row].as_py()
+
+    def get_image_path_for_filename(self, filename: str) -> Optional[str]:
+        """Return the image path a review JSON filename belongs to"""
+        if filename in self.path_by_filename or filename in self.collisions:
+            return self.path_by_filename.get(filename)
+        position = self._pc.index(self._plain_filenames, filename).as_py()
+        return self._unique_paths[position].as_py() if position >= 0 else None
+
+
+class AnnotationStore:
+    """
+    Process-wide cache of the annotation CSV, reloaded when the file changes.
+
+    If csv_path is an Arrow file (see convert_csv_to_arrow) the store serves a
+    memory-mapped AnnotationTable instead of a DataFrame.
+    """
+
+    def __init__(self, csv_path: str, normalizer_fn: Optional[Callable[[], LabelNormalizer]] = None):
+        self.csv_path = csv_path
+        self.is_arrow = csv_path.endswith(ARROW_EXTENSIONS)
+        # Returns the current label normalizer; it changes when labels.json is reloaded
+        self.normalizer_fn = normalizer_fn
+        self.version = 0
+        self._df = pd.DataFrame()
+        self._signature = None
+        self._label_lists = ([], [])
+        self._label_matrices = None
+        self._label_matrices_key = None
+        self._index = None
+        self._index_version = None
+        self._lock = threading.Lock()
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        """Return (mtime_ns, size) of the CSV, or None if it cannot be stat'ed"""
+        try:
+            stat = os.stat(self.csv_path)
+        except OSError as e:
+            print(f"Error loading CSV: {e}")
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get_dataframe(self) -> pd.DataFrame:
+        """Return the annotation DataFrame, re-reading the CSV only if it changed"""
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return self._df
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            if signature != self._signature:
+                try:
+                    if self.is_arrow:
+                        df = AnnotationTable(self.csv_path)
+                    else:
+                        df = pd.read_csv(self.csv_path, dtype={name: "category" for name in CATEGORICAL_COLUMNS})
+                except Exception as e:
+                    # Keep serving the last good copy (e.g. file is mid-write)
+                    print(f"Error loading CSV: {e}")
+                    return self._df
+                self._df = df
+                # Parse both label columns once, column-wise, instead of per view.
+                # Memory-mapped tables parse the requested row on demand instead.
+                if not self.is_arrow and "label1" in df and "label2" in df:
+                    self._label_lists = (parse_label_column(df["label1"]), parse_label_column(df["label2"]))
+                else:
+                    self._label_lists = ([], [])
+                self._index = None
+                self._signature = signature
+                self.version += 1
+            return self._df
+
+    def get_labels(self, df: pd.DataFrame, index: int) -> Tuple[List[str], List[str]]:
+        """Return parsed (label1, label2) lists for a row, parsed once per CSV version"""
+        if df is not self._df or self.is_arrow:
+            # Stale DataFrame from before a reload, or a memory-mapped table
+            row = df.iloc[index]
+            return parse_labels(row["label1"]), parse_labels(row["label2"])
+        label1, label2 = self._label_lists
+        return label1[index], label2[index]
+
+    def get_index(self) -> AnnotationIndex:
+        """Return the row/image_path/review filename index, built once per CSV version"""
+        if self._index is not None and self._index_version == self.version:
+            return self._index
+        with self._lock:
+            if self._index is None or self._index_version != self.version:
+                if "image_path" not in self._df:
+                    self._index = AnnotationIndex([])
+                elif self.is_arrow:
+                    # Probe the mapped column instead of building dicts over every row
+                    self._index = ArrowAnnotationIndex(self._df.get_column("image_path"))
+                else:
+                    self._index = AnnotationIndex(self._df["image_path"])
+                self._index_version = self.version
+            return self._index
+
+    def get_label_matrices(self) -> Tuple[LabelMatrix, LabelMatrix]:
+        """Return normalized multi-hot (label1, label2) matrices for the current CSV version"""
+        normalizer = self.normalizer_fn() if self.normalizer_fn else None
+        key = (self.version, normalizer)
+        if self._label_matrices is not None and self._label_matrices_key == key:
+            return self._label_matrices
+        with self._lock:
+            if self._label_matrices is None or self._label_matrices_key != key:
+                normalizer = normalizer or LabelNormalizer({})
+                self._label_matrices = tuple(
+                    encode_label_columns([self._df["label1"], self._df["label2"]], normalizer)
+                )
+                self._label_matrices_key = key
+            return self._label_matrices
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the annotation store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Convert the annotation CSV to a memory-mappable Arrow file")
+    convert_parser.add_argument("--csv", default="double_annotations_for_review.csv", help="Annotations CSV")
+    convert_parser.add_argument("--arrow", default=None, help="Output Arrow file (default: CSV path with .arrow)")
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        arrow_path = args.arrow or os.path.splitext(args.csv)[0] + ".arrow"
+        count = convert_csv_to_arrow(args.csv, arrow_path)
+        print(f"Wrote {count} annotations from {args.csv} to {arrow_path}")
@@ -1,87 +1,151 @@
 import gradio as gr
 import pandas as pd
 import os
-import json
+import asyncio
+import atexit
+import functools
 from typing import List, Tuple, Optional
-import hashlib
 import secrets
-from PIL import Image
+import signal
+import threading
+import time
+from collections import OrderedDict
+
+from annotation_store import AnnotationStore
+from bulk_review import POLICIES, POLICY_ALIASES, bulk_accept, format_bulk_result
+from executors import BoundedPool, PoolSaturated
+from image_index import BROKEN_STATUSES, ImageIndexStore
+from image_pyramid import ImagePyramid
+from label_taxonomy import CompiledTaxonomy, TaxonomyStore
+from metrics import METRICS, USER_EVENTS_METRIC, start_metrics_server
+from prefetch import Prefetcher
+from review_store import DURABILITY_SYNC, create_review_backend
+from session_store import create_session_backend
+from thumbnails import ThumbnailCache
+from user_store import UserStore
+from work_queue import (MODE_ALL, MODE_ASSIGNED, MODE_BROKEN, MODE_CROP, MODE_DISAGREEING, MODE_REVIEWER,
+                        MODE_UNREVIEWED, AssignmentScheduler, WorkQueue, create_lease_backend)
 
 # Configuration
 CSV_FILE_PATH = "/home/ashishp_wadhwaniai_org/pdsa-annotation-double/assets/double_annotations_for_review.csv"
+ANNOTATION_ARROW_PATH = None  # Arrow file from `annotation_store.py convert`; memory-mapped instead of loading the CSV
 OUTPUT_DIR = "/home/ashishp_wadhwaniai_org/pdsa-annotation-double/output"
 USERS_JSON_PATH = "/home/ashishp_wadhwaniai_org/pdsa-annotation-double/users.json"
 LABELS_JSON_PATH = "/home/ashishp_wadhwaniai_org/pdsa-annotation-double/assets/labels.json"
+LABEL_ALIASES = {}  # Extra label spellings, e.g. {"FAW": "Fall_Armyworm"}; case is always ignored
+THUMBNAIL_CACHE_DIR = "/home/ashishp_wadhwaniai_org/pdsa-annotation-double/thumbnail_cache"
+THUMBNAIL_CACHE_MAX_BYTES = 2 * 1024 ** 3  # 2 GiB budget, least-recently-used thumbnails are evicted
+IMAGE_PYRAMID_DIR = None  # Directory built by image_pyramid.py; closest pre-generated size is served from it
+DISPLAY_IMAGE_SIZE = 640  # Longest side of the displayed image in pixels
+ZOOM_IMAGE_SIZES = [1280, 2048]  # Larger sizes reviewers can switch the image to, e.g. the pyramid's larger renditions
+IMAGE_INDEX_PATH = None  # Sidecar from `image_index.py`; broken images are flagged and left out of the work queues
+IMAGE_ORIGINAL_MAX_BYTES = 1024 ** 2  # Originals up to this size (and DISPLAY_IMAGE_SIZE) are served without resizing
+REVIEW_DB_PATH = None  # e.g. ".../reviews.sqlite3" to use the indexed SQLite review store
+REVIEW_LOG_DIR = None  # e.g. ".../review_log" to append every submission to a review log and keep the history
+REVIEW_DB_EMIT_JSON = True  # With REVIEW_DB_PATH or REVIEW_LOG_DIR set, also write per-image JSON files to OUTPUT_DIR
+REVIEW_OUTPUT_LAYOUT = None  # "flat" or "sharded" for new JSON files; None follows the layout OUTPUT_DIR is marked with
+REVIEW_DURABILITY = DURABILITY_SYNC  # "sync": write before acknowledging; "group": batched background writes
+REVIEW_GROUP_COMMIT_INTERVAL = 0.5  # Seconds between group commits
+REVIEW_GROUP_COMMIT_MAX_BATCH = 100  # Commit early once this many reviews are queued
+PREFETCH_AHEAD = 3  # Next annotations to warm after each load
+PREFETCH_BEHIND = 1  # Previous annotations to warm after each load
+PREFETCH_WORKERS = 4
+PREFETCHED_REVIEW_STATUS_TTL = 30  # Seconds a prefetched review status stays valid
+PREFETCHED_REVIEW_STATUS_MAX = 4096  # Prefetched review statuses kept at most; oldest are dropped first
+ASSIGNMENT_BATCH_SIZE = 20  # Unreviewed annotations leased to a reviewer at a time
+ASSIGNMENT_LEASE_SECONDS = 15 * 60  # Leases not renewed by activity within this time are reclaimed
+SESSION_DB_PATH = None  # e.g. ".../sessions.sqlite3" to share sessions and assignment leases across workers and restarts
+SESSION_TTL_SECONDS = 8 * 3600  # Idle sessions are expired after this long
+SESSION_MAX_COUNT = 1000  # In-memory backend only: least recently used sessions beyond this are dropped
+IO_POOL_WORKERS = 16  # Threads running handlers' disk work (CSV, review JSON, sessions); also the per-event concurrency
+IO_POOL_MAX_QUEUED = 256  # Handler calls allowed to wait for an I/O thread before "server busy" is returned
+IMAGE_POOL_WORKERS = os.cpu_count() or 4  # Threads decoding and resizing images (Pillow releases the GIL)
+HANDLER_TIMEOUT_SECONDS = 30  # Per-request limit for UI events; the reviewer gets an error instead of waiting
+BULK_TIMEOUT_SECONDS = 600  # Per-request limit for admin bulk actions
+QUEUE_MAX_SIZE = 512  # Gradio queue length; requests beyond it are turned away
+PASSWORD_CACHE_TTL_SECONDS = 12 * 3600  # Verified logins skip the password hash for this long (0 disables)
+ADMIN_USERS = []  # Usernames allowed to run bulk actions such as accepting all agreeing annotations
+BULK_ACCEPT_POLICY = POLICY_ALIASES  # Default agreement rule: "exact", "case" or "aliases" (case plus LABEL_ALIASES)
+METRICS_ENABLED = False  # Record handler latency histograms and per-user counters
+METRICS_HOST = "127.0.0.1"  # /metrics is served on this address only
+METRICS_PORT = 9464  # Prometheus scrape port for /metrics
+
+METRICS.enabled = METRICS_ENABLED
+METRICS.describe("review_app_handler_seconds", "Latency of Gradio event handlers")
+METRICS.describe("review_app_operation_seconds", "Latency of annotation, image and review store operations")
+METRICS.describe("review_app_handler_exceptions_total", "Unhandled exceptions raised by Gradio event handlers")
+METRICS.describe("review_app_pool_wait_seconds", "Time handler and image work waited for a pool worker")
+METRICS.describe("review_app_user_events_total", "Per-user review events (save, save_rejected, error, auto_accept)")
+
+# Hashed reviewer credentials, reloaded when users.json changes on disk
+USER_STORE = UserStore(USERS_JSON_PATH, cache_ttl=PASSWORD_CACHE_TTL_SECONDS)
 
-# Load users from JSON file
 def load_users() -> dict:
-    """Load user credentials from JSON file"""
-    try:
-        with open(USERS_JSON_PATH, 'r') as f:
-            data = json.load(f)
-            return data.get("users", {})
-    except FileNotFoundError:
-        print(f"Error: {USERS_JSON_PATH} not found. Please create the users.json file.")
-        return {}
-    except json.JSONDecodeError as e:
-        print(f"Error parsing {USERS_JSON_PATH}: {e}")
-        return {}
-    except Exception as e:
-        print(f"Error loading users: {e}")
-        return {}
+    """Get the current {username: password hash} table (hot-reloaded when users.json changes)"""
+    return USER_STORE.get_users()
 
-# Load users at startup
-USERS = load_users()
+# Compiled crop label taxonomy, reloaded atomically when labels.json changes on disk
+TAXONOMY = TaxonomyStore(LABELS_JSON_PATH, LABEL_ALIASES)
 
-# Load labels from JSON file
-def load_labels() -> dict:
-    """Load crop labels from JSON file"""
-    try:
-        with open(LABELS_JSON_PATH, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"Warning: {LABELS_JSON_PATH} not found.")
-        return {}
-    except json.JSONDecodeError as e:
-        print(f"Error parsing {LABELS_JSON_PATH}: {e}")
-        return {}
-    except Exception as e:
-        print(f"Error loading labels: {e}")
-        return {}
+def get_taxonomy() -> CompiledTaxonomy:
+    """Get the current compiled label taxonomy"""
+    return TAXONOMY.get()
 
-LABELS = load_labels()
+def load_labels() -> dict:
+    """Load crop labels from JSON file (hot-reloaded when it changes)"""
+    return get_taxonomy().labels
 
 def get_crop_names() -> List[str]:
     """Get list of available crop names"""
-    return list(LABELS.keys()) if LABELS else []
+    return get_taxonomy().crop_names
 
 def get_issue_names(crop_name: str) -> List[str]:
     """Get list of issue names for a specific crop"""
-    if not LABELS or crop_name not in LABELS:
-        return []
-    return list(LABELS[crop_name].values())
+    return get_taxonomy().get_issue_names(crop_name)
 
 def get_issue_name_by_id(crop_name: str, issue_id: str) -> str:
     """Get issue name by crop and ID"""
-    if not LABELS or crop_name not in LABELS:
-        return ""
-    return LABELS[crop_name].get(issue_id, "")
+    return get_taxonomy().get_issue_name_by_id(crop_name, issue_id)
+
+def get_review_filename(image_path: str) -> str:
+    """Get review filename for an image, disambiguated if it collides with another image"""
+    return ANNOTATION_STORE.get_index().get_review_filename(image_path)
+
+# Review storage: per-image JSON files, an indexed SQLite database, or an append-only review log
+REVIEW_STORE = create_review_backend(OUTPUT_DIR, REVIEW_DB_PATH, emit_json=REVIEW_DB_EMIT_JSON,
+                                     filename_fn=get_review_filename, durability=REVIEW_DURABILITY,
+                                     flush_interval=REVIEW_GROUP_COMMIT_INTERVAL,
+                                     max_batch=REVIEW_GROUP_COMMIT_MAX_BATCH, layout=REVIEW_OUTPUT_LAYOUT,
+                                     log_dir=REVIEW_LOG_DIR)
+# Queued reviews are flushed when the server shuts down
+atexit.register(REVIEW_STORE.close)
+
+def close_review_store_on_signal(signum, frame):
+    """SIGTERM/SIGINT handler: flush queued reviews (atexit does not run on SIGTERM), then stop as before"""
+    REVIEW_STORE.close()
+    previous = PREVIOUS_SIGNAL_HANDLERS.get(signum)
+    if callable(previous):
+        previous(signum, frame)
+    elif previous != signal.SIG_IGN:
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
 
+PREVIOUS_SIGNAL_HANDLERS = {}
+if threading.current_thread() is threading.main_thread():
+    for shutdown_signal in (signal.SIGTERM, signal.SIGINT):
+        PREVIOUS_SIGNAL_HANDLERS[shutdown_signal] = signal.signal(shutdown_signal, close_review_store_on_signal)
+
+def get_review_write_error() -> Optional[str]:
+    """Error of the review writer while queued reviews keep failing to be written, else None"""
+    return REVIEW_STORE.get_write_error() if hasattr(REVIEW_STORE, "get_write_error") else None
+
+@METRICS.timed("review_app_operation", operation="check_review_exists")
 def check_review_exists(image_path: str) -> dict:
     """Check if a review exists for the given image path"""
     try:
-        # Create the expected JSON filename
-        safe_filename = image_path.replace("/", "_").replace("\\", "_")
-        if safe_filename.endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff')):
-            safe_filename = safe_filename.rsplit('.', 1)[0]
-        json_filename = f"{safe_filename}.json"
-        json_path = os.path.join(OUTPUT_DIR, json_filename)
+        review_data = REVIEW_STORE.get_review(image_path)
         
-        if os.path.exists(json_path):
-            # Load the review data
-            with open(json_path, 'r') as f:
-                review_data = json.load(f)
-            
+        if review_data is not None:
             return {
                 'exists': True,
                 'reviewer': review_data.get('reviewer_username', 'Unknown'),
@@ -99,49 +163,87 @@ def check_review_exists(image_path: str) -> dict:
         return {'exists': False, 'error': str(e)}
 
 # Session management
-active_sessions = {}
+SESSION_STORE = create_session_backend(SESSION_DB_PATH, SESSION_TTL_SECONDS, SESSION_MAX_COUNT)
 
 def authenticate(username: str, password: str) -> bool:
-    """Simple authentication function"""
-    if not USERS:
-        return False
-    return username in USERS and USERS[username] == password
+    """Verify credentials against the hashed users.json entries"""
+    return USER_STORE.authenticate(username, password)
 
 def create_session(username: str) -> str:
-    """Create a new session for authenticated user"""
+    """Create a new session for authenticated user, resuming their last position"""
     session_token = secrets.token_urlsafe(32)
-    active_sessions[session_token] = {
+    last_index = SESSION_STORE.get_last_position(username)
+    SESSION_STORE.create(session_token, {
         "username": username,
-        "current_index": 0
-    }
+        "current_index": last_index if last_index is not None else 0
+    })
+    # The new session may have pushed the least recently used one out
+    release_dropped_sessions()
     return session_token
 
 def verify_session(session_token: str) -> Optional[dict]:
     """Verify session token and return session data"""
-    return active_sessions.get(session_token)
+    session = SESSION_STORE.get(session_token) if session_token else None
+    # After get(), so a session it just found expired is released right away
+    release_dropped_sessions()
+    return session
 
-def load_annotations() -> pd.DataFrame:
-    """Load annotations from CSV file"""
-    try:
-        df = pd.read_csv(CSV_FILE_PATH)
-        return df
-    except Exception as e:
-        print(f"Error loading CSV: {e}")
-        return pd.DataFrame()
+def save_session(session_token: str, session: dict):
+    """Persist changes made to session data (e.g. current_index)"""
+    SESSION_STORE.update(session_token, session)
 
-def parse_labels(label_str: str) -> List[str]:
-    """Parse label string to list of labels"""
-    try:
-        # Handle different label formats
-        if isinstance(label_str, str):
-            # Remove brackets and quotes, split by comma
-            cleaned = label_str.strip("[]'\"")
-            if cleaned:
-                labels = [label.strip().strip("'\"") for label in cleaned.split(",")]
-                return [label for label in labels if label]
-        return []
-    except:
-        return []
+def release_expired_sessions(session_tokens: List[str]):
+    """Drop prefetch work and assignment leases held by expired sessions"""
+    scheduler = assignment_scheduler[1]
+    for session_token in session_tokens:
+        PREFETCHER.forget_session(session_token)
+        if scheduler is not None:
+            scheduler.release_session(session_token)
+        else:
+            # Leases taken before a restart can outlive the scheduler that granted them
+            LEASE_STORE.release_session(session_token)
+
+def release_dropped_sessions():
+    """Release sessions the store swept, found expired or evicted since the last check"""
+    dropped = SESSION_STORE.sweep_if_due()
+    if dropped:
+        release_expired_sessions(dropped)
+
+# Shared annotation store: the CSV is parsed once and reloaded only when it changes
+ANNOTATION_STORE = AnnotationStore(ANNOTATION_ARROW_PATH or CSV_FILE_PATH, lambda: get_taxonomy().normalizer)
+
+def record_pool_wait(pool: str, seconds: float):
+    """Queue wait of one pool task, for the saturation histogram"""
+    METRICS.observe("review_app_pool_wait_seconds", (("pool", pool),), seconds)
+
+# Blocking work of async handlers runs here, bounded, so a slow NFS read only delays its own request
+IO_POOL = BoundedPool("io", IO_POOL_WORKERS, IO_POOL_MAX_QUEUED, on_wait=record_pool_wait)
+IMAGE_POOL = BoundedPool("image", IMAGE_POOL_WORKERS, on_wait=record_pool_wait)
+
+# Persistent thumbnail cache shared by all sessions
+THUMBNAIL_CACHE = ThumbnailCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES)
+IMAGE_PYRAMID = ImagePyramid(IMAGE_PYRAMID_DIR) if IMAGE_PYRAMID_DIR else None
+# Pre-flight image checks, reloaded when image_index.py rewrites the sidecar
+IMAGE_INDEX = ImageIndexStore(IMAGE_INDEX_PATH) if IMAGE_INDEX_PATH else None
+
+def get_image_record(image_path: str) -> Optional[dict]:
+    """Pre-flight status, dimensions and size of an image, or None if there is no index entry"""
+    return IMAGE_INDEX.get().get(image_path) if IMAGE_INDEX is not None else None
+
+def get_image_problem(image_path: str) -> Optional[str]:
+    """Why an image cannot be shown (from the image index when it has the image, else a stat), or None"""
+    record = get_image_record(image_path)
+    if record is None:
+        return None if os.path.exists(image_path) else "missing"
+    if record["status"] not in BROKEN_STATUSES:
+        return None
+    problem = record["status"].replace("_", " ")
+    return f"{problem}: {record['error']}" if record["error"] else problem
+
+@METRICS.timed("review_app_operation", operation="load_annotations")
+def load_annotations() -> pd.DataFrame:
+    """Load annotations from the shared in-memory store"""
+    return ANNOTATION_STORE.get_dataframe()
 
 def format_labels_for_display(labels: List[str]) -> str:
     """Format labels for display"""
@@ -149,33 +251,202 @@ def format_labels_for_display(labels: List[str]) -> str:
         return "No labels"
     return ", ".join(labels)
 
-def resize_image(image_path: str, max_size: int = 640) -> str:
-    """Resize image to keep longest side at max_size pixels"""
+@METRICS.timed("review_app_operation", operation="resize_image")
+def resize_image(image_path: str, max_size: int = DISPLAY_IMAGE_SIZE) -> str:
+    """Resize image to keep longest side at max_size pixels (pre-generated pyramid, else the thumbnail cache)"""
     try:
-        if not os.path.exists(image_path):
+        record = get_image_record(image_path)
+        if record is None:
+            if not os.path.exists(image_path):
+                return None
+        elif record["status"] in BROKEN_STATUSES:
             return None
-        
-        with Image.open(image_path) as img:
-            # Calculate new size maintaining aspect ratio
-            width, height = img.size
-            if width > height:
-                new_width = max_size
-                new_height = int((height * max_size) / width)
-            else:
-                new_height = max_size
-                new_width = int((width * max_size) / height)
-            
-            # Resize image
-            resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Save to temp file
-            temp_path = f"/tmp/resized_{os.path.basename(image_path)}"
-            resized_img.save(temp_path)
-            return temp_path
-            
+        elif max(record["width"], record["height"]) <= max_size and record["size_bytes"] <= IMAGE_ORIGINAL_MAX_BYTES:
+            # Already display-sized: served as is, without a stat or decode
+            return image_path
+        if IMAGE_PYRAMID is not None:
+            rendition = IMAGE_PYRAMID.get(image_path, max_size)
+            if rendition is not None:
+                return rendition
+        cached = THUMBNAIL_CACHE.get_cached(image_path, max_size)
+        if cached is not None:
+            return cached
+        # Decoding and resizing is CPU-bound: bounded by the image pool, not by the number of callers
+        return IMAGE_POOL.call(THUMBNAIL_CACHE.get, image_path, max_size, timeout=HANDLER_TIMEOUT_SECONDS)
     except Exception as e:
         print(f"Error resizing image {image_path}: {e}")
-        return image_path  # Return original path if resize fails
+        # Fall back to the original only if it is small enough to send to the browser
+        try:
+            if os.path.getsize(image_path) <= IMAGE_ORIGINAL_MAX_BYTES:
+                return image_path
+        except OSError:
+            pass
+        return None
+
+# Review status warmed by the prefetcher, consumed once by load_annotation_data; oldest first
+prefetched_review_status = OrderedDict()
+prefetched_review_status_lock = threading.Lock()
+
+def get_prefetch_key(index: int) -> tuple:
+    """What warming an index covers: the image at that row of the current CSV version"""
+    return ANNOTATION_STORE.version, ANNOTATION_STORE.get_index().get_image_path(index)
+
+def warm_annotation(index: int):
+    """Warm thumbnail and review status for an annotation ahead of navigation"""
+    df = load_annotations()
+    if index >= len(df):
+        return
+    image_path = df.iloc[index]["image_path"]
+    resize_image(image_path)
+    status = check_review_exists(image_path)
+    now = time.time()
+    with prefetched_review_status_lock:
+        prefetched_review_status[image_path] = (now, status)
+        prefetched_review_status.move_to_end(image_path)
+        # Statuses nobody navigated to: drop the expired ones and anything over the cap
+        while prefetched_review_status:
+            warmed_at = next(iter(prefetched_review_status.values()))[0]
+            if (len(prefetched_review_status) <= PREFETCHED_REVIEW_STATUS_MAX
+                    and now - warmed_at < PREFETCHED_REVIEW_STATUS_TTL):
+                break
+            prefetched_review_status.popitem(last=False)
+
+def get_review_status(image_path: str) -> dict:
+    """Return review status, using a fresh prefetched result if available"""
+    with prefetched_review_status_lock:
+        prefetched = prefetched_review_status.pop(image_path, None)
+    if prefetched and time.time() - prefetched[0] < PREFETCHED_REVIEW_STATUS_TTL:
+        return prefetched[1]
+    return check_review_exists(image_path)
+
+def forget_prefetched_review_status(image_path: Optional[str] = None):
+    """Drop the prefetched status of an image (or of every image) after its review changed"""
+    with prefetched_review_status_lock:
+        if image_path is None:
+            prefetched_review_status.clear()
+        else:
+            prefetched_review_status.pop(image_path, None)
+    PREFETCHER.invalidate(None if image_path is None else (ANNOTATION_STORE.version, image_path))
+
+def create_prefetcher() -> Prefetcher:
+    """Prefetcher for the configured annotation source"""
+    return Prefetcher(warm_annotation, ahead=PREFETCH_AHEAD, behind=PREFETCH_BEHIND,
+                      max_workers=PREFETCH_WORKERS, max_warmed=PREFETCHED_REVIEW_STATUS_MAX,
+                      key_fn=get_prefetch_key, max_age=PREFETCHED_REVIEW_STATUS_TTL)
+
+PREFETCHER = create_prefetcher()
+
+def collect_cache_metrics():
+    """Prefetcher and review store stats, sampled at scrape time"""
+    samples = [("review_app_prefetch_events", "Prefetcher counters and queue depth", "gauge",
+                {(("stat", name),): value for name, value in PREFETCHER.get_stats().items()})]
+    if hasattr(REVIEW_STORE, "get_stats"):
+        samples.append(("review_app_review_writer", "Review writer counters (write-behind queue or review log)", "gauge",
+                        {(("stat", name),): value for name, value in REVIEW_STORE.get_stats().items()}))
+    return samples
+
+METRICS.add_collector(collect_cache_metrics)
+
+def collect_pool_metrics():
+    """Worker pool load, sampled at scrape time"""
+    samples = []
+    for metric, help_text, stat in (
+        ("review_app_pool_workers", "Worker threads per pool", "workers"),
+        ("review_app_pool_active", "Pool workers currently busy", "active"),
+        ("review_app_pool_queued", "Tasks waiting for a pool worker", "queued"),
+        ("review_app_pool_saturation", "Busy workers / workers", "saturation"),
+        ("review_app_pool_timeouts", "Pool calls that hit their timeout", "timeouts"),
+        ("review_app_pool_rejected", "Pool calls turned away because the queue was full", "rejected"),
+    ):
+        samples.append((metric, help_text, "gauge",
+                        {(("pool", pool.name),): pool.get_stats()[stat] for pool in (IO_POOL, IMAGE_POOL)}))
+    return samples
+
+METRICS.add_collector(collect_pool_metrics)
+
+def offload(fn, timeout: float = HANDLER_TIMEOUT_SECONDS):
+    """Async version of a blocking handler: runs it on the I/O pool with a per-request timeout"""
+    @functools.wraps(fn)
+    async def handler(*args):
+        try:
+            return await IO_POOL.run(fn, *args, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise gr.Error(f"The server did not respond within {timeout:g}s. Please try again.")
+        except PoolSaturated:
+            raise gr.Error("The server is busy. Please try again in a moment.")
+    return handler
+
+# Filtered-navigation work queue as (CSV version, queue, label matrices, image index), rebuilt when the CSV changes
+work_queue = (None, None, None, None)
+work_queue_lock = threading.Lock()
+
+@METRICS.timed("review_app_operation", operation="get_work_queue")
+def get_work_queue() -> WorkQueue:
+    """Get the filtered-navigation work queue for the current CSV version"""
+    global work_queue
+    df = load_annotations()
+    version = ANNOTATION_STORE.version
+    label_matrices = ANNOTATION_STORE.get_label_matrices()
+    image_index = IMAGE_INDEX.get() if IMAGE_INDEX is not None else None
+    with work_queue_lock:
+        if work_queue[0] != version:
+            broken = image_index.broken_mask(df["image_path"]) if image_index is not None else None
+            queue = WorkQueue(df, ANNOTATION_STORE.get_index(), REVIEW_STORE.iter_reviewed_images(),
+                              label_matrices, broken)
+            work_queue = (version, queue, label_matrices, image_index)
+        else:
+            if work_queue[2] is not label_matrices:
+                # labels.json was reloaded: recompute disagreements, keep review state and leases
+                work_queue[1].refresh_labels(df, label_matrices)
+            if work_queue[3] is not image_index:
+                # The image index was rebuilt: update which rows are skipped as broken
+                work_queue[1].refresh_broken(image_index.broken_mask(df["image_path"]))
+            work_queue = (version, work_queue[1], label_matrices, image_index)
+        return work_queue[1]
+
+# Assignment leases, in the session database when there is one so every worker shares them
+LEASE_STORE = create_lease_backend(SESSION_DB_PATH)
+
+# Lease-based assignment of unreviewed annotations as (work queue, scheduler)
+assignment_scheduler = (None, None)
+
+def get_assignment_scheduler() -> AssignmentScheduler:
+    """Get the assignment scheduler for the current work queue"""
+    global assignment_scheduler
+    queue = get_work_queue()
+    with work_queue_lock:
+        if assignment_scheduler[0] is not queue:
+            scheduler = AssignmentScheduler(queue, ASSIGNMENT_BATCH_SIZE, ASSIGNMENT_LEASE_SECONDS, LEASE_STORE,
+                                            REVIEW_STORE.get_review)
+            assignment_scheduler = (queue, scheduler)
+        return assignment_scheduler[1]
+
+def get_navigation_modes() -> List[str]:
+    """Get navigation mode choices for the Next/Previous buttons"""
+    modes = ["All", "Assigned to me", "Unreviewed", "Disagreeing (unreviewed)"]
+    if IMAGE_INDEX is not None:
+        modes.append("Broken images")
+    modes += [f"Crop: {crop}" for crop in get_crop_names()]
+    modes += [f"Reviewer: {username}" for username in load_users()]
+    return modes
+
+def parse_navigation_mode(navigation_mode: str) -> Tuple[str, Optional[str]]:
+    """Parse a navigation mode choice into (mode, filter value)"""
+    if not navigation_mode or navigation_mode == "All":
+        return MODE_ALL, None
+    if navigation_mode == "Assigned to me":
+        return MODE_ASSIGNED, None
+    if navigation_mode == "Unreviewed":
+        return MODE_UNREVIEWED, None
+    if navigation_mode.startswith("Disagreeing"):
+        return MODE_DISAGREEING, None
+    if navigation_mode == "Broken images":
+        return MODE_BROKEN, None
+    if navigation_mode.startswith("Crop: "):
+        return MODE_CROP, navigation_mode[len("Crop: "):]
+    if navigation_mode.startswith("Reviewer: "):
+        return MODE_REVIEWER, navigation_mode[len("Reviewer: "):]
+    return MODE_ALL, None
 
 def get_current_annotation(df: pd.DataFrame, index: int) -> dict:
     """Get current annotation data"""
@@ -183,15 +454,17 @@ def get_current_annotation(df: pd.DataFrame, index: int) -> dict:
         return {}
     
     row = df.iloc[index]
+    label1, label2 = ANNOTATION_STORE.get_labels(df, index)
     return {
         "image_path": row["image_path"],
         "crop1": row["crop1"],
-        "label1": parse_labels(row["label1"]),
+        "label1": label1,
         "crop2": row["crop2"],
-        "label2": parse_labels(row["label2"]),
+        "label2": label2,
         "index": index
     }
 
+@METRICS.timed("review_app_operation", operation="save_reviewed_annotation")
 def save_reviewed_annotation(df: pd.DataFrame, index: int, selected_annotation: str, 
                            reviewer_crop: str, reviewer_label: str, comments: str, session_token: str) -> str:
     """Save reviewed annotation as JSON file for the specific image"""
@@ -200,19 +473,29 @@ def save_reviewed_annotation(df: pd.DataFrame, index: int, selected_annotation:
         if not session:
             return "Session expired. Please login again."
         
-        # Create output directory if it doesn't exist
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        
         # Get the current annotation data
         row = df.iloc[index]
         image_path = row["image_path"]
         
-        # Create filename from image path (replace / with _ and remove extension)
-        safe_filename = image_path.replace("/", "_").replace("\\", "_")
-        if safe_filename.endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff')):
-            safe_filename = safe_filename.rsplit('.', 1)[0]
-        json_filename = f"{safe_filename}.json"
-        json_path = os.path.join(OUTPUT_DIR, json_filename)
+        # Reject saves on annotations leased to another reviewer
+        leased_queue, scheduler = assignment_scheduler
+        if scheduler is not None and leased_queue is work_queue[1]:
+            holder = scheduler.get_lease_holder(index)
+            if holder is not None and holder != session_token:
+                return "This annotation is assigned to another reviewer. Please move to another annotation."
+        
+        # Detect a review saved by someone else since this annotation was loaded
+        merged_with = None
+        existing = check_review_exists(image_path)
+        if existing['exists'] and existing['timestamp'] != session.get("loaded_review_timestamp"):
+            same_decision = (
+                existing['reviewer_crop'] == reviewer_crop
+                and sorted(existing['reviewer_labels'].split(", ")) == sorted(reviewer_label.split(", "))
+            )
+            if not same_decision:
+                return (f"Conflict: {existing['reviewer']} saved a different review for this annotation "
+                        f"at {existing['timestamp']}. Reload the annotation before saving.")
+            merged_with = existing['reviewer']
         
         # Prepare the annotation data
         annotation_data = {
@@ -229,35 +512,120 @@ def save_reviewed_annotation(df: pd.DataFrame, index: int, selected_annotation:
             "selected_annotation": selected_annotation
         }
         
-        # Save as JSON file
-        with open(json_path, 'w') as f:
-            json.dump(annotation_data, f, indent=2)
+        # Save through the configured review store
+        json_filename = REVIEW_STORE.save_review(annotation_data)
+        forget_prefetched_review_status(image_path)
+        
+        session["loaded_review_timestamp"] = annotation_data["review_timestamp"]
+        save_session(session_token, session)
         
+        # Keep the filtered-navigation queue current without rebuilding it
+        version, queue, _, _ = work_queue
+        if queue is not None and version == ANNOTATION_STORE.version:
+            queue.mark_reviewed(index, session["username"])
+            if scheduler is not None and leased_queue is queue:
+                scheduler.complete(index)
+        
+        if merged_with:
+            return f"Review saved by {session['username']} to {json_filename} (matches existing review by {merged_with})"
         return f"Review saved successfully by {session['username']} to {json_filename}"
         
     except Exception as e:
         return f"Error saving annotation: {str(e)}"
 
+def accept_agreeing_annotations(session_token: str, policy: str, dry_run: bool) -> str:
+    """Admin bulk action: accept round 1 for every unreviewed annotation whose two rounds agree"""
+    session = verify_session(session_token)
+    if not session:
+        return "Session expired. Please login again."
+    if session["username"] not in ADMIN_USERS:
+        return "Bulk review is only available to admin users."
+    
+    df = load_annotations()
+    if df.empty:
+        return "No annotations loaded."
+    
+    # Leave rows that are currently assigned to a reviewer alone
+    leased_queue, scheduler = assignment_scheduler
+    leased = scheduler.leased_rows() if scheduler is not None and leased_queue is work_queue[1] else []
+    try:
+        result = bulk_accept(df, REVIEW_STORE, policy or BULK_ACCEPT_POLICY, get_taxonomy().normalizer,
+                             reviewer=session["username"], dry_run=dry_run, exclude_rows=leased)
+    except Exception as e:
+        return f"Error accepting agreeing annotations: {str(e)}"
+    
+    if not dry_run and result["written"]:
+        forget_prefetched_review_status()
+        version, queue, _, _ = work_queue
+        if queue is not None and version == ANNOTATION_STORE.version:
+            queue.mark_reviewed_rows(result["rows"], session["username"])
+        METRICS.inc(USER_EVENTS_METRIC, (("event", "auto_accept"), ("user", session["username"])),
+                    result["written"])
+    
+    message = format_bulk_result(result)
+    if dry_run and result["preview"]:
+        message += "\n\n" + "\n".join(f"- {review['image_path']}: {review['reviewer_crop']} / "
+                                       f"{review['reviewer_labels']}" for review in result["preview"])
+    return message
+
+@METRICS.timed("review_app_handler", handler="preview_bulk_accept")
+def preview_bulk_accept(session_token: str, policy: str):
+    """Count and list the annotations a bulk accept would write"""
+    return accept_agreeing_annotations(session_token, policy, dry_run=True)
+
+@METRICS.timed("review_app_handler", handler="run_bulk_accept")
+def run_bulk_accept(session_token: str, policy: str):
+    """Write reviews for every agreeing annotation"""
+    return accept_agreeing_annotations(session_token, policy, dry_run=False)
+
+def get_server_status(session_token: str) -> str:
+    """Admin view of worker pool saturation and the review writer queue"""
+    session = verify_session(session_token)
+    if not session:
+        return "Session expired. Please login again."
+    if session["username"] not in ADMIN_USERS:
+        return "Server load is only available to admin users."
+    
+    lines = ["| Pool | Busy | Waiting | Saturation | Timeouts | Rejected |", "|---|---|---|---|---|---|"]
+    for pool in (IO_POOL, IMAGE_POOL):
+        stats = pool.get_stats()
+        lines.append(f"| {stats['name']} | {stats['active']}/{stats['workers']} | {stats['queued']} | "
+                     f"{stats['saturation']:.0%} | {stats['timeouts']} | {stats['rejected']} |")
+    if hasattr(REVIEW_STORE, "get_stats"):
+        lines.append(f"\nReview writer queue: {REVIEW_STORE.get_stats().get('pending', 0)} pending")
+    write_error = get_review_write_error()
+    if write_error:
+        lines.append(f"\n⚠️ **Review writes are failing:** {write_error}")
+    if IMAGE_INDEX is not None:
+        counts = IMAGE_INDEX.get().status_counts()
+        lines.append("\nImage index: " + (", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+                                           or "not built yet"))
+    return "\n".join(lines)
+
 # Gradio Interface Functions
+@METRICS.timed("review_app_handler", handler="login_interface")
 def login_interface(username: str, password: str):
     """Handle login"""
-    if not USERS:
+    if not load_users():
         return (
             gr.update(visible=True),   # Keep login visible
             gr.update(visible=False),  # Hide main interface
             "",
             "Error: No users configured. Please check users.json file.",
-            gr.update(value="**User:** Not logged in")
+            gr.update(value="**User:** Not logged in"),
+            gr.update()
         )
     
     if authenticate(username, password):
         session_token = create_session(username)
+        resume_index = verify_session(session_token)["current_index"]
         return (
             gr.update(visible=False),  # Hide login
             gr.update(visible=True),   # Show main interface
             session_token,
             f"Welcome, {username}!",
-            gr.update(value=f"**User:** {username}")
+            gr.update(value=f"**User:** {username}"),
+            gr.update(value=resume_index + 1)  # Resume where the reviewer stopped (1-based)
         )
     else:
         return (
@@ -265,25 +633,24 @@ def login_interface(username: str, password: str):
             gr.update(visible=False),  # Hide main interface
             "",
             "Invalid credentials. Please try again.",
-            gr.update(value="**User:** Not logged in")
+            gr.update(value="**User:** Not logged in"),
+            gr.update()
         )
 
-def load_annotation_data(session_token: str, index: int):
-    """Load and display annotation data"""
-    session = verify_session(session_token)
-    if not session:
-        return "Session expired. Please login again.", None, None, None, None, None, None
-    
-    df = load_annotations()
-    if df.empty:
-        return "No annotations found.", None, None, None, None, None, None
-    
-    # Convert natural number (1-based) to 0-based index
-    actual_index = index - 1
-    
-    if actual_index < 0 or actual_index >= len(df):
-        return f"Index {index} out of range. Total annotations: {len(df)}", None, None, None, None, None, None
-    
+# Choices of the annotation selector never change, so views only reset its value
+ANNOTATION_CHOICES = ["Annotation Round 1", "Annotation Round 2"]
+
+def get_display_size(image_size: Optional[int]) -> int:
+    """Longest image side to serve: the reviewer's chosen size if it is one on offer, else DISPLAY_IMAGE_SIZE"""
+    try:
+        image_size = int(image_size)
+    except (TypeError, ValueError):
+        return DISPLAY_IMAGE_SIZE
+    return image_size if image_size in ZOOM_IMAGE_SIZES else DISPLAY_IMAGE_SIZE
+
+def build_annotation_view(session_token: str, session: dict, df: pd.DataFrame, actual_index: int,
+                          image_size: Optional[int] = None) -> tuple:
+    """Render the 13 view outputs for a 0-based index and make it the session's current annotation"""
     annotation = get_current_annotation(df, actual_index)
     if not annotation:
         return "Error loading annotation.", None, None, None, None, None, None
@@ -291,34 +658,101 @@ def load_annotation_data(session_token: str, index: int):
     # Update session with current index (store 0-based for internal use)
     session["current_index"] = actual_index
     
-    # Display image if it exists (resized)
+    PREFETCHER.record_access(actual_index)
+    
+    # Display image if it exists and decodes (resized); otherwise say why not
     image_display = None
-    if os.path.exists(annotation["image_path"]):
-        image_display = resize_image(annotation["image_path"])
+    image_problem = get_image_problem(annotation["image_path"])
+    if image_problem is None:
+        image_display = resize_image(annotation["image_path"], get_display_size(image_size))
+        if image_display is None:
+            image_problem = "could not be displayed"
     
     # Check if review exists for this image
-    review_info = check_review_exists(annotation["image_path"])
+    review_info = get_review_status(annotation["image_path"])
+    session["loaded_review_timestamp"] = review_info.get('timestamp') if review_info['exists'] else None
+    save_session(session_token, session)
+    
+    # Viewing an assigned annotation keeps its lease alive
+    scheduler = assignment_scheduler[1]
+    if scheduler is not None:
+        scheduler.renew(session_token, actual_index)
+    
+    # Warm the neighbouring annotations while the reviewer looks at this one
+    PREFETCHER.schedule(session_token, actual_index, len(df))
     if review_info['exists']:
         review_status_text = f"✅ **Review exists**\n**Reviewed by:** {review_info['reviewer']}\n**Date:** {review_info['timestamp'][:10] if review_info['timestamp'] else 'Unknown'}\n**Selected:** {review_info['selected_annotation']}"
     else:
         review_status_text = "❌ **No review found**"
+    if image_problem:
+        review_status_text += f"\n⚠️ **Image {image_problem}**"
     
+    label1 = format_labels_for_display(annotation["label1"])
     return (
-        f"Annotation {index + 1} of {len(df)}",
+        f"Annotation {actual_index + 1} of {len(df)}",
         review_status_text,
         image_display,
         annotation["crop1"],
-        format_labels_for_display(annotation["label1"]),
+        label1,
         annotation["crop2"],
         format_labels_for_display(annotation["label2"]),
-        gr.update(choices=["Annotation Round 1", "Annotation Round 2"], value="Annotation Round 1"),
+        gr.update(value=ANNOTATION_CHOICES[0]),
         annotation["crop1"],  # current_crop_display
-        format_labels_for_display(annotation["label1"]),  # current_label_display
+        label1,  # current_label_display
         annotation["crop1"],  # reviewer_crop (hidden)
-        format_labels_for_display(annotation["label1"]).split(", ") if format_labels_for_display(annotation["label1"]) else [],  # reviewer_label (hidden)
+        label1.split(", ") if label1 else [],  # reviewer_label (hidden)
         ""  # comments (hidden)
     )
 
+@METRICS.timed("review_app_handler", handler="load_annotation_data")
+def load_annotation_data(session_token: str, index: int, image_size: Optional[int] = None):
+    """Load and display annotation data"""
+    session = verify_session(session_token)
+    if not session:
+        return "Session expired. Please login again.", None, None, None, None, None, None
+    
+    df = load_annotations()
+    if df.empty:
+        return "No annotations found.", None, None, None, None, None, None
+    
+    # Convert natural number (1-based) to 0-based index
+    actual_index = index - 1
+    
+    if actual_index < 0 or actual_index >= len(df):
+        return f"Index {index} out of range. Total annotations: {len(df)}", None, None, None, None, None, None
+    
+    return build_annotation_view(session_token, session, df, actual_index, image_size)
+
+@METRICS.timed("review_app_handler", handler="load_annotation_view")
+def load_annotation_view(session_token: str, index: int, image_size: Optional[int] = None):
+    """Load button: load_annotation_data plus the client's new navigation baseline (see navigate)"""
+    view = load_annotation_data(session_token, index, image_size)
+    if len(view) < VIEW_OUTPUTS:
+        # Error message only: later navigation re-sends everything
+        return tuple(view) + tuple(gr.update() for _ in range(VIEW_OUTPUTS - len(view))) + (None,)
+    return tuple(view) + (get_diffable_view(view),)
+
+@METRICS.timed("review_app_handler", handler="change_image_size")
+def change_image_size(session_token: str, image_size: Optional[int], shown_view: Optional[list] = None):
+    """Image size control: re-serve the current image at the chosen size; returns it and the new baseline"""
+    session = verify_session(session_token)
+    if not session:
+        return gr.update(), shown_view
+    df = load_annotations()
+    index = session.get("current_index", 0)
+    if df.empty or index >= len(df):
+        return gr.update(), shown_view
+    image_path = df.iloc[index]["image_path"]
+    if get_image_problem(image_path) is not None:
+        return gr.update(), shown_view
+    image_display = resize_image(image_path, get_display_size(image_size))
+    if image_display is None:
+        return gr.update(), shown_view
+    if shown_view:
+        shown_view = list(shown_view[:2]) + [image_display] + list(shown_view[3:])
+    return image_display, shown_view
+
+@METRICS.timed("review_app_handler", handler="on_annotation_selection_change")
 def on_annotation_selection_change(selected_annotation: str, session_token: str):
     """Handle annotation selection change"""
     session = verify_session(session_token)
@@ -380,6 +814,7 @@ def exit_edit_mode():
         gr.update(visible=False)   # Hide comments
     )
 
+@METRICS.timed("review_app_handler", handler="update_issue_dropdown")
 def update_issue_dropdown(crop_name: str):
     """Update issue dropdown based on selected crop"""
     if not crop_name:
@@ -388,6 +823,7 @@ def update_issue_dropdown(crop_name: str):
     issue_choices = get_issue_names(crop_name)
     return gr.update(choices=issue_choices, value=[])
 
+@METRICS.timed("review_app_handler", handler="save_annotation_review")
 def save_annotation_review(selected_annotation: str, reviewer_crop: str, reviewer_label: list, comments: str, session_token: str,):
     """Save the annotation review"""
     session = verify_session(session_token)
@@ -412,10 +848,58 @@ def save_annotation_review(selected_annotation: str, reviewer_crop: str, reviewe
         return "Please provide both crop name and at least one issue."
     
     result = save_reviewed_annotation(df, index, selected_annotation, reviewer_crop, reviewer_label_str, comments, session_token,)
+    if result.startswith("Review saved"):
+        METRICS.record_user_event(session["username"], "save")
+    elif result.startswith("Error"):
+        METRICS.record_user_event(session["username"], "error")
+    else:
+        # Lease or concurrent-edit conflict
+        METRICS.record_user_event(session["username"], "save_rejected")
+    
+    # Flag custom issues that are not part of the taxonomy for this crop
+    taxonomy = get_taxonomy()
+    if taxonomy.labels and result.startswith("Review saved"):
+        unknown = [label for label in reviewer_label_str.split(", ")
+                   if not taxonomy.is_valid_issue(reviewer_crop, label)]
+        if unknown:
+            result += f" (not in labels.json for {reviewer_crop}: {', '.join(unknown)})"
+    
+    # Group commit acknowledges saves before writing them: warn while writing keeps failing
+    write_error = get_review_write_error()
+    if write_error and result.startswith("Review saved"):
+        result += (f"\n\n⚠️ Reviews are queued but could not be written to storage ({write_error}). "
+                   f"They are retried automatically; tell an admin if this message persists.")
     return result
 
-def next_annotation(session_token: str):
-    """Move to next annotation"""
+def find_navigation_target(session_token: str, session: dict, df: pd.DataFrame, navigation_mode: str,
+                           direction: int) -> Tuple[Optional[int], str]:
+    """Return the 0-based index to move to (or None) and a status message"""
+    current_index = session["current_index"]  # 0-based
+    mode, value = parse_navigation_mode(navigation_mode)
+    if direction > 0:
+        if mode == MODE_ALL:
+            return min(current_index + 1, len(df) - 1), ""
+        if mode == MODE_ASSIGNED:
+            # Moving on releases the annotation being left, saved or not
+            target = get_assignment_scheduler().next_assigned(session_token, current_index)
+            if target is None:
+                return None, "No unassigned annotations left to review"
+            return target, ""
+        target = get_work_queue().find_next(current_index, mode, value)
+        if target is None:
+            return None, f"No more {navigation_mode} annotations after {current_index + 1}"
+        return target, ""
+    
+    if mode in (MODE_ALL, MODE_ASSIGNED):
+        return max(current_index - 1, 0), ""
+    target = get_work_queue().find_previous(current_index, mode, value)
+    if target is None:
+        return None, f"No more {navigation_mode} annotations before {current_index + 1}"
+    return target, ""
+
+@METRICS.timed("review_app_handler", handler="next_annotation")
+def next_annotation(session_token: str, navigation_mode: str = "All"):
+    """Move to next annotation, optionally skipping to the next one matching the navigation mode"""
     session = verify_session(session_token)
     if not session:
         return 1, "Session expired."
@@ -424,14 +908,17 @@ def next_annotation(session_token: str):
     if df.empty:
         return 1, "No annotations loaded."
     
-    current_index = session["current_index"]  # 0-based
-    next_index = min(current_index + 1, len(df) - 1)
+    next_index, message = find_navigation_target(session_token, session, df, navigation_mode, 1)
+    if next_index is None:
+        return session["current_index"] + 1, message
     session["current_index"] = next_index
+    save_session(session_token, session)
     
     return next_index + 1, f"Moved to annotation {next_index + 1}"  # Return 1-based for display
 
-def previous_annotation(session_token: str):
-    """Move to previous annotation"""
+@METRICS.timed("review_app_handler", handler="previous_annotation")
+def previous_annotation(session_token: str, navigation_mode: str = "All"):
+    """Move to previous annotation, optionally skipping to the previous one matching the navigation mode"""
     session = verify_session(session_token)
     if not session:
         return 1, "Session expired."
@@ -440,15 +927,122 @@ def previous_annotation(session_token: str):
     if df.empty:
         return 1, "No annotations loaded."
     
-    current_index = session["current_index"]  # 0-based
-    prev_index = max(current_index - 1, 0)
+    prev_index, message = find_navigation_target(session_token, session, df, navigation_mode, -1)
+    if prev_index is None:
+        return session["current_index"] + 1, message
     session["current_index"] = prev_index
+    save_session(session_token, session)
     
     return prev_index + 1, f"Moved to annotation {prev_index + 1}"  # Return 1-based for display
 
+# Outputs of a rendered view, and the read-only ones among them that only navigation changes;
+# the rest can be edited in the browser and are always sent
+VIEW_OUTPUTS = 13
+DIFFABLE_VIEW_OUTPUTS = 7
+
+def get_diffable_view(view: tuple) -> list:
+    """Values of the read-only view outputs, as kept in the client's navigation baseline"""
+    return [value if isinstance(value, (str, int, float, type(None))) else None
+            for value in view[:DIFFABLE_VIEW_OUTPUTS]]
+
+def with_status(shown_view: Optional[list], message: str) -> Optional[list]:
+    """Navigation baseline after only the status line changed to message"""
+    if not shown_view:
+        return shown_view
+    return [message] + list(shown_view[1:])
+
+def navigate(session_token: str, navigation_mode: str, direction: int, shown_view: Optional[list] = None,
+             image_size: Optional[int] = None) -> tuple:
+    """
+    Move to the next/previous annotation and return the rendered view in one round trip.
+    
+    Returns index_input, the 13 load_annotation_data outputs and the new
+    navigation baseline. shown_view is the baseline the client holds in a
+    gr.State: the read-only outputs it currently shows. Outputs identical to
+    it are sent as no-op updates. The baseline round-trips through the
+    client, so a response that never arrived (timeout, another tab) is
+    never assumed to be on screen. image_size is the reviewer's chosen image
+    size (see get_display_size).
+    """
+    unchanged = tuple(gr.update() for _ in range(VIEW_OUTPUTS + 1))
+    session = verify_session(session_token)
+    if not session:
+        message = "Session expired. Please login again."
+        return (gr.update(), message) + unchanged[2:] + (with_status(shown_view, message),)
+    
+    df = load_annotations()
+    if df.empty:
+        message = "No annotations loaded."
+        return (gr.update(), message) + unchanged[2:] + (with_status(shown_view, message),)
+    
+    target, message = find_navigation_target(session_token, session, df, navigation_mode, direction)
+    if target is None:
+        # Nothing moves: only the status line changes
+        return (gr.update(), message) + unchanged[2:] + (with_status(shown_view, message),)
+    
+    view = build_annotation_view(session_token, session, df, target, image_size)
+    if len(view) < VIEW_OUTPUTS:
+        # Error message only
+        return (target + 1, view[0]) + unchanged[2:] + (with_status(shown_view, view[0]),)
+    diffable = get_diffable_view(view)
+    previous = shown_view or [None] * DIFFABLE_VIEW_OUTPUTS
+    
+    outputs = [target + 1]  # index_input, 1-based
+    for i, value in enumerate(view):
+        if i < DIFFABLE_VIEW_OUTPUTS and diffable[i] is not None and diffable[i] == previous[i]:
+            outputs.append(gr.update())
+        else:
+            outputs.append(value)
+    outputs.append(diffable)
+    return tuple(outputs)
+
+@METRICS.timed("review_app_handler", handler="navigate_next")
+def navigate_next(session_token: str, navigation_mode: str = "All", shown_view: Optional[list] = None,
+                  image_size: Optional[int] = None):
+    """Next button / shortcut: move and render in a single call"""
+    return navigate(session_token, navigation_mode, 1, shown_view, image_size)
+
+@METRICS.timed("review_app_handler", handler="navigate_previous")
+def navigate_previous(session_token: str, navigation_mode: str = "All", shown_view: Optional[list] = None,
+                      image_size: Optional[int] = None):
+    """Previous button / shortcut: move and render in a single call"""
+    return navigate(session_token, navigation_mode, -1, shown_view, image_size)
+
+@METRICS.timed("review_app_handler", handler="submit_review")
+def submit_review(selected_annotation: str, reviewer_crop: str, reviewer_label: list, comments: str,
+                  session_token: str):
+    """Submit button / shortcut: save and leave edit mode in a single call"""
+    return (save_annotation_review(selected_annotation, reviewer_crop, reviewer_label, comments, session_token),
+            *exit_edit_mode())
+
+# Keyboard shortcuts click the same buttons, so they take the same single-call path.
+# Arrow keys are ignored while typing in a field.
+KEYBOARD_SHORTCUTS_HEAD = """
+<script>
+document.addEventListener("keydown", (event) => {
+    const target = event.target;
+    const typing = target && (target.tagName === "INPUT" || target.tagName === "TEXTAREA" || target.isContentEditable);
+    let buttonId = null;
+    if ((event.ctrlKey || event.metaKey) && event.key === "Enter") {
+        buttonId = "submit-review-btn";
+    } else if (!typing && !event.altKey && !event.ctrlKey && !event.metaKey) {
+        if (event.key === "ArrowRight") buttonId = "next-annotation-btn";
+        if (event.key === "ArrowLeft") buttonId = "prev-annotation-btn";
+    }
+    if (!buttonId) return;
+    const element = document.getElementById(buttonId);
+    const button = element && (element.tagName === "BUTTON" ? element : element.querySelector("button"));
+    if (button && button.offsetParent !== null) {
+        event.preventDefault();
+        button.click();
+    }
+});
+</script>
+"""
+
 # Create Gradio Interface
 def create_interface():
-    with gr.Blocks(title="Annotation Review Tool", theme=gr.themes.Soft()) as app:
+    with gr.Blocks(title="Annotation Review Tool", theme=gr.themes.Soft(), head=KEYBOARD_SHORTCUTS_HEAD) as app:
         with gr.Row():
             with gr.Column(scale=4):
                 gr.Markdown("# 🌾 PDSA Annotation Review Tool", elem_classes="center-align")
@@ -458,6 +1052,8 @@ def create_interface():
         
         # Session token (hidden)
         session_token = gr.State("")
+        # What this browser tab currently shows, so navigation only re-sends what changed
+        shown_view = gr.State(None)
         
         # Login Interface
         with gr.Row(visible=True) as login_row:
@@ -477,6 +1073,12 @@ def create_interface():
             with gr.Column(scale=2):
                 gr.Markdown("## Image and Annotations")
                 image_display = gr.Image(label="Image", type="filepath")
+                image_size = gr.Radio(
+                    choices=[(f"{size} px", size) for size in [DISPLAY_IMAGE_SIZE] + ZOOM_IMAGE_SIZES],
+                    value=DISPLAY_IMAGE_SIZE,
+                    label="Image size",
+                    visible=bool(ZOOM_IMAGE_SIZES)
+                )
                 
                 with gr.Row():
                     with gr.Column():
@@ -494,18 +1096,24 @@ def create_interface():
                 current_status = gr.Markdown("")
                 review_status = gr.Markdown("", elem_classes="review-status")
                 
+                navigation_mode = gr.Dropdown(
+                    choices=get_navigation_modes(),
+                    label="Navigation Mode",
+                    value="All"
+                )
+                
                 with gr.Row():
-                    prev_btn = gr.Button("← Previous", variant="secondary")
-                    next_btn = gr.Button("Next →", variant="secondary")
+                    prev_btn = gr.Button("← Previous", variant="secondary", elem_id="prev-annotation-btn")
+                    next_btn = gr.Button("Next →", variant="secondary", elem_id="next-annotation-btn")
                 
                 index_input = gr.Number(label="Go to Index", value=1, precision=0, minimum=1)
                 load_btn = gr.Button("Load Annotation", variant="primary")
                 
                 gr.Markdown("## Review")
                 annotation_selector = gr.Radio(
-                    choices=["Annotation Round 1", "Annotation Round 2"], 
+                    choices=ANNOTATION_CHOICES, 
                     label="Select Annotation Set",
-                    value="Annotation Round 1"
+                    value=ANNOTATION_CHOICES[0]
                 )
                 
                 edit_btn = gr.Button("Edit Annotations", variant="secondary")
@@ -546,79 +1154,115 @@ def create_interface():
                     visible=False
                 )
                 
-                submit_btn = gr.Button("Submit Review", variant="primary")
+                submit_btn = gr.Button("Submit Review", variant="primary", elem_id="submit-review-btn")
+                gr.Markdown("Shortcuts: ← / → previous / next, Ctrl+Enter submit")
                 save_status = gr.Markdown("")
+                
+                with gr.Accordion("Bulk review (admin)", open=False):
+                    bulk_policy = gr.Dropdown(
+                        choices=list(POLICIES),
+                        label="Agreement rule",
+                        value=BULK_ACCEPT_POLICY
+                    )
+                    with gr.Row():
+                        bulk_preview_btn = gr.Button("Preview", variant="secondary")
+                        bulk_accept_btn = gr.Button("Accept all agreeing", variant="stop")
+                    bulk_status = gr.Markdown("")
+                
+                with gr.Accordion("Server load (admin)", open=False):
+                    server_status_btn = gr.Button("Refresh", variant="secondary")
+                    server_status = gr.Markdown("")
         
         # Event Handlers
         login_btn.click(
-            login_interface,
+            offload(login_interface),
             inputs=[username_input, password_input],
-            outputs=[login_row, main_row, session_token, login_status, username_display]
+            outputs=[login_row, main_row, session_token, login_status, username_display, index_input]
         )
         
         load_btn.click(
-            load_annotation_data,
-            inputs=[session_token, index_input],
+            offload(load_annotation_view),
+            inputs=[session_token, index_input, image_size],
             outputs=[current_status, review_status, image_display, crop1_display, label1_display, 
                     crop2_display, label2_display, annotation_selector, current_crop_display, 
-                    current_label_display, reviewer_crop, reviewer_label, comments]
+                    current_label_display, reviewer_crop, reviewer_label, comments, shown_view]
         )
         
         annotation_selector.change(
-            on_annotation_selection_change,
+            offload(on_annotation_selection_change),
             inputs=[annotation_selector, session_token],
             outputs=[save_status, current_crop_display, current_label_display, reviewer_crop, reviewer_label, comments]
         )
         
         reviewer_crop.change(
-            update_issue_dropdown,
+            offload(update_issue_dropdown),
             inputs=[reviewer_crop],
             outputs=[reviewer_label]
         )
         
         edit_btn.click(
-            enter_edit_mode,
+            offload(enter_edit_mode),
             inputs=[current_crop_display, current_label_display],
             outputs=[current_crop_display, current_label_display, reviewer_crop, reviewer_label, comments]
         )
         
         submit_btn.click(
-            save_annotation_review,
+            offload(submit_review),
             inputs=[annotation_selector, reviewer_crop, reviewer_label, comments, session_token],
-            outputs=[save_status]
-        ).then(
-            exit_edit_mode,
-            inputs=[],
-            outputs=[current_crop_display, current_label_display, reviewer_crop, reviewer_label, comments]
+            outputs=[save_status, current_crop_display, current_label_display, reviewer_crop, reviewer_label, comments]
         )
         
-        prev_btn.click(
-            previous_annotation,
+        navigation_outputs = [index_input, current_status, review_status, image_display, crop1_display,
+                              label1_display, crop2_display, label2_display, annotation_selector,
+                              current_crop_display, current_label_display, reviewer_crop, reviewer_label, comments,
+                              shown_view]
+        
+        image_size.change(
+            offload(change_image_size),
+            inputs=[session_token, image_size, shown_view],
+            outputs=[image_display, shown_view]
+        )
+        
+        bulk_preview_btn.click(
+            offload(preview_bulk_accept, BULK_TIMEOUT_SECONDS),
+            inputs=[session_token, bulk_policy],
+            outputs=[bulk_status],
+            concurrency_limit=1
+        )
+        
+        bulk_accept_btn.click(
+            offload(run_bulk_accept, BULK_TIMEOUT_SECONDS),
+            inputs=[session_token, bulk_policy],
+            outputs=[bulk_status],
+            concurrency_limit=1
+        )
+        
+        server_status_btn.click(
+            offload(get_server_status),
             inputs=[session_token],
-            outputs=[index_input, current_status]
-        ).then(
-            load_annotation_data,
-            inputs=[session_token, index_input],
-            outputs=[current_status, review_status, image_display, crop1_display, label1_display, 
-                    crop2_display, label2_display, annotation_selector, current_crop_display, 
-                    current_label_display, reviewer_crop, reviewer_label, comments]
+            outputs=[server_status]
+        )
+        
+        prev_btn.click(
+            offload(navigate_previous),
+            inputs=[session_token, navigation_mode, shown_view, image_size],
+            outputs=navigation_outputs
         )
         
         next_btn.click(
-            next_annotation,
-            inputs=[session_token],
-            outputs=[index_input, current_status]
-        ).then(
-            load_annotation_data,
-            inputs=[session_token, index_input],
-            outputs=[current_status, review_status, image_display, crop1_display, label1_display, 
-                    crop2_display, label2_display, annotation_selector, current_crop_display, 
-                    current_label_display, reviewer_crop, reviewer_label, comments]
+            offload(navigate_next),
+            inputs=[session_token, navigation_mode, shown_view, image_size],
+            outputs=navigation_outputs
         )
     
+    # Handlers wait on the I/O pool, so let as many events run at once as it has threads
+    app.queue(default_concurrency_limit=IO_POOL_WORKERS, max_size=QUEUE_MAX_SIZE)
     return app
 
 if __name__ == "__main__":
+    if METRICS_ENABLED:
+        start_metrics_server(METRICS, METRICS_PORT, METRICS_HOST)
+        print(f"Serving metrics at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
     app = create_interface()
     app.launch(
         server_name="0.0.0.0",
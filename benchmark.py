@@ -0,0 +1,633 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmarks for the review flow.
+
+``generate`` builds a synthetic batch shaped like
+``assets/double_annotations_for_review.csv``: an annotations CSV (10k to
+millions of rows, crops and labels drawn from ``assets/labels.json``), PNG
+images for the rows the benchmark visits, and an output directory of
+existing reviews.
+
+``run`` points the real app handlers at that batch and times them
+headlessly: ``load_annotation_data``, ``next_annotation`` and
+``save_annotation_review`` per session (optionally many sessions at once,
+awaited through ``offload`` on the I/O pool, as Gradio runs them), then
+``stitch_reviews_to_csv`` and ``get_review_summary``. Every session count
+gets its own copy of the reviews and fresh app state, so a run never
+benefits from the caches an earlier one warmed. Results are written to JSON; ``compare`` prints the
+latency change between two result files. ``login`` times logins at several
+password hash costs, including a burst of reviewers logging in at once.
+
+    python benchmark.py generate --rows 100000 --data-dir ./bench_data
+    python benchmark.py run --data-dir ./bench_data --sessions 1,8 --output results.json
+    python benchmark.py compare baseline.json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from review_store import LAYOUTS, JsonDirectoryReviewBackend
+
+DEFAULT_LABELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "labels.json")
+DATASET_MANIFEST = "dataset.json"
+BENCH_PASSWORD = "bench"
+BENCH_HASH_ITERATIONS = 1000
+
+
+def format_label_list(first: pd.Series, second: pd.Series) -> pd.Series:
+    """Render one or two labels per row as the CSV's "['a', 'b']" strings"""
+    two = second.notna()
+    rendered = "['" + first + "']"
+    rendered[two] = "['" + first[two] + "', '" + second[two] + "']"
+    return rendered
+
+
+def generate_annotations(rows: int, labels: dict, image_dir: str, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic annotations with the real CSV's shape.
+
+    Round 2 usually agrees on the crop, often differs only in label case
+    (Fall_armyworm vs Fall_Armyworm) and sometimes picks different labels.
+    """
+    rng = np.random.default_rng(seed)
+    crops = np.array([crop for crop, issues in labels.items() if issues])
+    crop1 = crops[rng.integers(0, len(crops), rows)]
+    crop2 = crop1.copy()
+    switched = rng.random(rows) < 0.05
+    crop2[switched] = crops[rng.integers(0, len(crops), int(switched.sum()))]
+
+    def pick_labels(crop_column):
+        """One label per row, plus a second label for ~20% of rows"""
+        first = np.empty(rows, dtype=object)
+        second = np.full(rows, None, dtype=object)
+        for crop in crops:
+            mask = crop_column == crop
+            names = np.array(list(labels[crop].values()), dtype=object)
+            first[mask] = names[rng.integers(0, len(names), int(mask.sum()))]
+            extra = mask & (rng.random(rows) < 0.2)
+            second[extra] = names[rng.integers(0, len(names), int(extra.sum()))]
+        return pd.Series(first), pd.Series(second)
+
+    first1, second1 = pick_labels(crop1)
+    first2, second2 = pick_labels(crop2)
+    # Keep round 1's labels for ~60% of rows, with a case change on half of those
+    same = (rng.random(rows) < 0.6) & (crop1 == crop2)
+    first2[same], second2[same] = first1[same], second1[same]
+    recased = same & (rng.random(rows) < 0.5)
+    first2[recased] = first2[recased].str.capitalize()
+
+    image_paths = (image_dir + "/" + pd.Series(crop1) + "/IMG_"
+                   + pd.Series(np.arange(rows)).astype(str).str.zfill(7) + ".png")
+    return pd.DataFrame({
+        "image_path": image_paths,
+        "crop1": crop1,
+        "label1": format_label_list(first1, second1),
+        "crop2": crop2,
+        "label2": format_label_list(first2, second2),
+    })
+
+
+def _write_images(args):
+    """Write a chunk of synthetic PNGs (runs in a worker process)"""
+    paths, image_size, seed = args
+    rng = np.random.default_rng(seed)
+    width, height = image_size, image_size * 3 // 4
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    for path in paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Smooth colour gradient plus noise: compresses like a photo, not like a flat fill
+        base = gradient * rng.random(3, dtype=np.float32)
+        noise = rng.normal(0, 8, (height, width, 3)).astype(np.float32)
+        pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+        Image.fromarray(pixels).save(path)
+    return len(paths)
+
+
+def _write_reviews(args):
+    """Write a chunk of synthetic review JSON files (runs in a worker process)"""
+    records, output_dir, layout = args
+    backend = JsonDirectoryReviewBackend(output_dir, layout=layout)
+    for record in records:
+        backend.save_review(record)
+    return len(records)
+
+
+def generate_dataset(data_dir: str, rows: int, images: int = 500, reviewed: float = 0.3, image_size: int = 1024,
+                     seed: int = 0, layout: str = "flat", labels_path: str = DEFAULT_LABELS_PATH,
+                     workers: int = None) -> dict:
+    """
+    Write a synthetic review batch to data_dir.
+
+    Args:
+        data_dir: Output directory (annotations.csv, imgs/, output/, dataset.json)
+        rows: Number of annotation rows
+        images: Image files to create, for the first rows (the ones the benchmark visits)
+        reviewed: Fraction of rows that already have a review
+        image_size: Width of the generated images in pixels
+        seed: Random seed; the same seed always produces the same batch
+        layout: Review output layout ("flat" or "sharded")
+        labels_path: labels.json to draw crops and labels from
+        workers: Worker processes for images and reviews (default: CPU count)
+
+    Returns:
+        dict: The dataset manifest
+    """
+    with open(labels_path, "r") as f:
+        labels = json.load(f)
+    data_dir = os.path.abspath(data_dir)
+    image_dir = os.path.join(data_dir, "imgs")
+    output_dir = os.path.join(data_dir, "output")
+    csv_path = os.path.join(data_dir, "annotations.csv")
+    os.makedirs(data_dir, exist_ok=True)
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    start = time.perf_counter()
+    df = generate_annotations(rows, labels, image_dir, seed)
+    df.to_csv(csv_path, index=False)
+    print(f"Wrote {rows} annotations to {csv_path} ({time.perf_counter() - start:.1f}s)")
+
+    images = min(images, rows)
+    rng = np.random.default_rng(seed + 1)
+    reviewed_rows = np.flatnonzero(rng.random(rows) < reviewed)
+    base_time = pd.Timestamp("2024-01-01T08:00:00")
+    review_records = [
+        {
+            "image_path": df.at[row, "image_path"],
+            "crop1": df.at[row, "crop1"],
+            "label1": df.at[row, "label1"],
+            "crop2": df.at[row, "crop2"],
+            "label2": df.at[row, "label2"],
+            "reviewer_crop": df.at[row, "crop1"],
+            "reviewer_labels": df.at[row, "label1"].strip("[]").replace("'", ""),
+            "comments": "",
+            "reviewer_username": f"reviewer{row % 5}",
+            "review_timestamp": (base_time + pd.Timedelta(seconds=int(row) * 7)).isoformat(),
+            "selected_annotation": "Annotation Round 1" if row % 3 else "Annotation Round 2",
+        }
+        for row in reviewed_rows
+    ]
+
+    start = time.perf_counter()
+    image_paths = df["image_path"].iloc[:images].tolist()
+    chunk = 50
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        image_tasks = [(image_paths[i:i + chunk], image_size, seed + i) for i in range(0, images, chunk)]
+        written_images = sum(pool.map(_write_images, image_tasks))
+        review_chunk = 2000
+        review_tasks = [(review_records[i:i + review_chunk], output_dir, layout)
+                        for i in range(0, len(review_records), review_chunk)]
+        written_reviews = sum(pool.map(_write_reviews, review_tasks))
+    print(f"Wrote {written_images} images and {written_reviews} reviews ({time.perf_counter() - start:.1f}s)")
+
+    manifest = {
+        "rows": rows,
+        "images": images,
+        "reviews": written_reviews,
+        "reviewed_fraction": reviewed,
+        "image_size": image_size,
+        "seed": seed,
+        "layout": layout,
+        "csv_path": csv_path,
+        "output_dir": output_dir,
+        "labels_path": os.path.abspath(labels_path),
+        "generated_at": datetime.now().isoformat(),
+    }
+    with open(os.path.join(data_dir, DATASET_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def summarize_timings(durations) -> dict:
+    """Latency statistics in milliseconds for one operation"""
+    if not durations:
+        return {"count": 0}
+    ms = np.asarray(durations) * 1000
+    return {
+        "count": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "total_s": round(float(ms.sum() / 1000), 3),
+    }
+
+
+def copy_batch(manifest: dict):
+    """
+    Fresh work directory holding a copy of the batch's reviews.
+
+    Returns:
+        tuple: (work directory, manifest pointing at the copied output directory)
+    """
+    work_dir = tempfile.mkdtemp(prefix="review-bench-")
+    run_output = os.path.join(work_dir, "output")
+    shutil.copytree(manifest["output_dir"], run_output)
+    return work_dir, dict(manifest, output_dir=run_output)
+
+
+def configure_app(manifest: dict, work_dir: str, durability: str):
+    """Import app.py and point it at the synthetic batch with fresh stores, caches and prefetcher"""
+    import app
+    from annotation_store import AnnotationStore
+    from label_taxonomy import TaxonomyStore
+    from review_store import create_review_backend
+    from session_store import InMemorySessionBackend
+    from thumbnails import ThumbnailCache
+    from user_store import UserStore, hash_password, write_users
+    from work_queue import create_lease_backend
+
+    app.TAXONOMY = TaxonomyStore(manifest["labels_path"], app.LABEL_ALIASES)
+    app.ANNOTATION_STORE = AnnotationStore(manifest["csv_path"], lambda: app.get_taxonomy().normalizer)
+    app.REVIEW_STORE = create_review_backend(manifest["output_dir"], filename_fn=app.get_review_filename,
+                                             durability=durability, layout=manifest.get("layout"))
+    app.THUMBNAIL_CACHE = ThumbnailCache(os.path.join(work_dir, "thumbnail_cache"), app.THUMBNAIL_CACHE_MAX_BYTES)
+    app.IMAGE_PYRAMID = None
+    app.SESSION_STORE = InMemorySessionBackend(app.SESSION_TTL_SECONDS, app.SESSION_MAX_COUNT)
+    app.LEASE_STORE = create_lease_backend(None)
+    app.PREFETCHER = app.create_prefetcher()
+    # Cheap hashes: `run` times the review flow, `login` times password hashing
+    users_path = os.path.join(work_dir, "users.json")
+    bench_hash = hash_password(BENCH_PASSWORD, BENCH_HASH_ITERATIONS)
+    write_users(users_path, {f"bench{i}": bench_hash for i in range(1024)})
+    app.USER_STORE = UserStore(users_path)
+    app.work_queue = (None, None, None, None)
+    app.assignment_scheduler = (None, None)
+    app.forget_prefetched_review_status()
+    return app
+
+
+async def call_handler(app, fn, *args):
+    """Run a handler the way the UI does: on the I/O pool, with the per-request timeout"""
+    return await app.offload(fn)(*args)
+
+
+async def run_session(app, username: str, start_row: int, iterations: int, navigation_mode: str, save_every: int,
+                      timings: dict, navigation: str = "merged"):
+    """
+    One reviewer: navigate, load and periodically save, recording per-call latency.
+
+    navigation "merged" times the single-call navigate_next handler the UI
+    uses; "chained" times the older next_annotation + load_annotation_data pair.
+    Latencies include the wait for an I/O pool thread.
+    """
+    local = {"login_interface": [], "load_annotation_data": [], "save_annotation_review": []}
+    started = time.perf_counter()
+    session_token = (await call_handler(app, app.login_interface, username, BENCH_PASSWORD))[2]
+    local["login_interface"].append(time.perf_counter() - started)
+
+    t = time.perf_counter()
+    result = await call_handler(app, app.load_annotation_data, session_token, start_row + 1)
+    local["load_annotation_data"].append(time.perf_counter() - t)
+    crop, label = result[3], result[4]
+    # The navigation baseline the browser keeps in a gr.State
+    shown_view = app.get_diffable_view(result)
+    for i in range(iterations):
+        if navigation == "merged":
+            t = time.perf_counter()
+            result = await call_handler(app, app.navigate_next, session_token, navigation_mode, shown_view)
+            shown_view = result[-1]
+            elapsed = time.perf_counter() - t
+            local.setdefault("navigate_next", []).append(elapsed)
+            local.setdefault("navigation_step", []).append(elapsed)
+            # Unchanged outputs come back as no-op updates
+            crop = result[4] if isinstance(result[4], str) else crop
+            label = result[5] if isinstance(result[5], str) else label
+        else:
+            step = t = time.perf_counter()
+            index, _ = await call_handler(app, app.next_annotation, session_token, navigation_mode)
+            local.setdefault("next_annotation", []).append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            result = await call_handler(app, app.load_annotation_data, session_token, index)
+            local["load_annotation_data"].append(time.perf_counter() - t)
+            # Both calls together, comparable with navigate_next
+            local.setdefault("navigation_step", []).append(time.perf_counter() - step)
+            crop, label = result[3], result[4]
+
+        if save_every and i % save_every == 0:
+            labels = [item for item in (label or "").split(", ") if item] or ["Healthy"]
+            t = time.perf_counter()
+            await call_handler(app, app.save_annotation_review, "Annotation Round 1", crop or "maize", labels,
+                               "benchmark", session_token)
+            local["save_annotation_review"].append(time.perf_counter() - t)
+    for name, values in local.items():
+        timings.setdefault(name, []).extend(values)
+
+
+def run_load(app, sessions: int, iterations: int, images: int, navigation_mode: str, save_every: int,
+             navigation: str = "merged") -> dict:
+    """Run `sessions` concurrent reviewers over disjoint slices of the imaged rows, on one event loop"""
+    timings = {}
+    span = max(images // sessions, 1)
+
+    async def run_all():
+        await asyncio.gather(*(
+            run_session(app, f"bench{k}", (k * span) % max(images, 1), iterations, navigation_mode,
+                        save_every, timings, navigation)
+            for k in range(sessions)
+        ))
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    wall = time.perf_counter() - start
+    handler_calls = sum(len(values) for name, values in timings.items() if name != "navigation_step")
+    return {
+        "sessions": sessions,
+        "iterations_per_session": iterations,
+        "navigation_mode": navigation_mode,
+        "navigation": navigation,
+        "wall_seconds": round(wall, 3),
+        "handler_calls_per_second": round(handler_calls / wall, 2) if wall else 0.0,
+        "operations": {name: summarize_timings(values) for name, values in sorted(timings.items())},
+    }
+
+
+def get_git_revision() -> str:
+    """Current commit of the code under test, if available"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def run_benchmarks(data_dir: str, sessions=(1,), iterations: int = 200, navigation_mode: str = "All",
+                   save_every: int = 5, stitch_repeats: int = 3, durability: str = "group",
+                   navigation: str = "merged") -> dict:
+    """
+    Time the real handlers and stitch functions against a generated batch.
+
+    Each session count runs against its own copy of the batch's output
+    directory with fresh stores, thumbnail cache and prefetcher, so runs do not
+    share warmed caches or saved reviews and repeated runs start from the same
+    state.
+
+    Returns:
+        dict: Benchmark results (see README)
+    """
+    with open(os.path.join(data_dir, DATASET_MANIFEST), "r") as f:
+        batch = json.load(f)
+
+    import combine_reviews
+    results = {"load": []}
+    cold_loads, index_builds = [], []
+    for count in sessions:
+        work_dir, manifest = copy_batch(batch)
+        try:
+            app = configure_app(manifest, work_dir, durability)
+            start = time.perf_counter()
+            df = app.load_annotations()
+            cold_loads.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            app.ANNOTATION_STORE.get_index()
+            index_builds.append(time.perf_counter() - start)
+            print(f"Loaded {len(df)} annotations in {cold_loads[-1]:.3f}s")
+
+            run = run_load(app, count, iterations, manifest["images"], navigation_mode, save_every, navigation)
+            # Let in-flight warm-ups finish before their cache directory is removed
+            app.PREFETCHER.shutdown()
+            results["load"].append(run)
+            print(f"{count} session(s): {run['handler_calls_per_second']} handler calls/s, "
+                  f"navigation step p50 {run['operations']['navigation_step']['p50_ms']} ms")
+            app.REVIEW_STORE.close()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    results["load_annotations_cold"] = summarize_timings(cold_loads)
+    results["annotation_index_build"] = summarize_timings(index_builds)
+
+    # Stitching reads a fresh copy of the batch's reviews, independent of the runs above
+    work_dir, manifest = copy_batch(batch)
+    run_output = manifest["output_dir"]
+    try:
+        output_csv = os.path.join(work_dir, "final_annotations.csv")
+        stitch, summary = [], []
+        for _ in range(stitch_repeats):
+            start = time.perf_counter()
+            combine_reviews.stitch_reviews_to_csv(run_output, output_csv)
+            stitch.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            combine_reviews.get_review_summary(run_output)
+            summary.append(time.perf_counter() - start)
+        results["stitch_reviews_to_csv"] = summarize_timings(stitch)
+        results["get_review_summary"] = summarize_timings(summary)
+        print(f"stitch_reviews_to_csv p50 {results['stitch_reviews_to_csv']['p50_ms']} ms, "
+              f"get_review_summary p50 {results['get_review_summary']['p50_ms']} ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": get_git_revision(),
+            "python": sys.version.split()[0],
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": {
+                "sessions": list(sessions),
+                "iterations": iterations,
+                "navigation_mode": navigation_mode,
+                "navigation": navigation,
+                "save_every": save_every,
+                "stitch_repeats": stitch_repeats,
+                "durability": durability,
+            },
+        },
+        "dataset": {key: manifest[key] for key in ("rows", "images", "reviews", "reviewed_fraction", "seed", "layout")},
+        "results": results,
+    }
+
+
+def run_login_benchmark(costs=(100_000, 300_000, 600_000), concurrency: int = 50) -> dict:
+    """
+    Login latency per password hash cost.
+
+    For each PBKDF2 iteration count: one cold login, a burst of `concurrency`
+    simultaneous cold logins (everyone arriving at shift start), and the same
+    users logging in again from the verified-credential cache.
+
+    Returns:
+        dict: Benchmark results (see README)
+    """
+    from user_store import UserStore, hash_password, write_users
+
+    work_dir = tempfile.mkdtemp(prefix="login-bench-")
+    results = {"login": []}
+    try:
+        for cost in costs:
+            # Every user shares one hash; verification cost does not depend on the salt
+            users_path = os.path.join(work_dir, f"users-{cost}.json")
+            bench_hash = hash_password(BENCH_PASSWORD, cost)
+            usernames = [f"bench{i}" for i in range(concurrency)]
+            write_users(users_path, {username: bench_hash for username in usernames})
+
+            store = UserStore(users_path)
+            start = time.perf_counter()
+            store.authenticate(usernames[0], BENCH_PASSWORD)
+            single = [time.perf_counter() - start]
+
+            store = UserStore(users_path)
+            burst, cached = [], []
+            lock = threading.Lock()
+            barrier = threading.Barrier(concurrency)
+
+            def login(username, timings):
+                barrier.wait()
+                t = time.perf_counter()
+                ok = store.authenticate(username, BENCH_PASSWORD)
+                elapsed = time.perf_counter() - t
+                if not ok:
+                    raise RuntimeError(f"Benchmark login failed for {username}")
+                with lock:
+                    timings.append(elapsed)
+
+            walls = {}
+            for name, timings in (("burst", burst), ("cached", cached)):
+                threads = [threading.Thread(target=login, args=(username, timings)) for username in usernames]
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                walls[name] = round(time.perf_counter() - start, 3)
+
+            run = {
+                "iterations": cost,
+                "concurrency": concurrency,
+                "burst_wall_seconds": walls["burst"],
+                "operations": {
+                    "cold_login": summarize_timings(single),
+                    "burst_login": summarize_timings(burst),
+                    "cached_login": summarize_timings(cached),
+                },
+            }
+            results["login"].append(run)
+            print(f"{cost} iterations: cold {run['operations']['cold_login']['p50_ms']} ms, "
+                  f"{concurrency} at once all in after {walls['burst']}s "
+                  f"(p99 {run['operations']['burst_login']['p99_ms']} ms), "
+                  f"cached p50 {run['operations']['cached_login']['p50_ms']} ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": get_git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": {"costs": list(costs), "concurrency": concurrency},
+        },
+        "results": results,
+    }
+
+
+def flatten_results(results: dict) -> dict:
+    """{operation key: stats} across every section of a results file"""
+    flat = {}
+    for name, value in results["results"].items():
+        if name == "load":
+            for run in value:
+                for operation, stats in run["operations"].items():
+                    flat[f"{run['sessions']} session(s) / {operation}"] = stats
+        elif name == "login":
+            for run in value:
+                for operation, stats in run["operations"].items():
+                    flat[f"{run['iterations']} iterations / {operation}"] = stats
+        else:
+            flat[name] = value
+    return flat
+
+
+def compare_results(baseline_path: str, candidate_path: str, metric: str = "p50_ms") -> str:
+    """Table of a latency metric in two result files and the relative change"""
+    with open(baseline_path, "r") as f:
+        baseline = flatten_results(json.load(f))
+    with open(candidate_path, "r") as f:
+        candidate = flatten_results(json.load(f))
+    lines = [f"{'operation':<50} {'baseline':>12} {'candidate':>12} {'change':>9}"]
+    for key in sorted(set(baseline) | set(candidate)):
+        before = baseline.get(key, {}).get(metric)
+        after = candidate.get(key, {}).get(metric)
+        if before is None or after is None:
+            change = "n/a"
+        else:
+            change = f"{(after - before) / before:+.1%}" if before else "n/a"
+        lines.append(f"{key:<50} {before if before is not None else '-':>12} "
+                     f"{after if after is not None else '-':>12} {change:>9}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the annotation review flow")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Generate a synthetic review batch")
+    generate_parser.add_argument("--data-dir", default="./bench_data", help="Output directory for the batch")
+    generate_parser.add_argument("--rows", type=int, default=10000, help="Annotation rows (e.g. 10000 to 5000000)")
+    generate_parser.add_argument("--images", type=int, default=500, help="Image files to create for the first rows")
+    generate_parser.add_argument("--reviewed", type=float, default=0.3, help="Fraction of rows already reviewed")
+    generate_parser.add_argument("--image-size", type=int, default=1024, help="Image width in pixels")
+    generate_parser.add_argument("--layout", choices=LAYOUTS, default="flat", help="Review output layout")
+    generate_parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    generate_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+
+    run_parser = subparsers.add_parser("run", help="Time the review flow against a generated batch")
+    run_parser.add_argument("--data-dir", default="./bench_data", help="Directory written by generate")
+    run_parser.add_argument("--sessions", default="1", help="Comma-separated concurrent session counts, e.g. 1,8,32")
+    run_parser.add_argument("--iterations", type=int, default=200, help="Navigation steps per session")
+    run_parser.add_argument("--navigation-mode", default="All", help="Navigation mode label, e.g. All or Unreviewed")
+    run_parser.add_argument("--navigation", choices=("merged", "chained"), default="merged",
+                            help="Time the single-call navigation handler or the old two-call chain")
+    run_parser.add_argument("--save-every", type=int, default=5, help="Save a review every N steps (0 disables)")
+    run_parser.add_argument("--stitch-repeats", type=int, default=3, help="Runs of each stitch function")
+    run_parser.add_argument("--durability", choices=("sync", "group"), default="group", help="Review write mode")
+    run_parser.add_argument("--output", default="benchmark_results.json", help="Results JSON file")
+
+    login_parser = subparsers.add_parser("login", help="Time logins at several password hash costs")
+    login_parser.add_argument("--costs", default="100000,300000,600000",
+                              help="Comma-separated PBKDF2 iteration counts")
+    login_parser.add_argument("--concurrency", type=int, default=50, help="Reviewers logging in at once")
+    login_parser.add_argument("--output", default="login_results.json", help="Results JSON file")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two results files")
+    compare_parser.add_argument("baseline", help="Baseline results JSON")
+    compare_parser.add_argument("candidate", help="Candidate results JSON")
+    compare_parser.add_argument("--metric", default="p50_ms", help="Statistic to compare (e.g. p50_ms, p99_ms)")
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        generate_dataset(args.data_dir, args.rows, args.images, args.reviewed, args.image_size, args.seed,
+                         args.layout, workers=args.workers)
+    elif args.command == "run":
+        session_counts = [int(count) for count in args.sessions.split(",") if count.strip()]
+        results = run_benchmarks(args.data_dir, session_counts, args.iterations, args.navigation_mode,
+                                 args.save_every, args.stitch_repeats, args.durability, args.navigation)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote results to {args.output}")
+    elif args.command == "login":
+        costs = [int(cost) for cost in args.costs.split(",") if cost.strip()]
+        results = run_login_benchmark(costs, args.concurrency)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote results to {args.output}")
+    elif args.command == "compare":
+        print(compare_results(args.baseline, args.candidate, args.metric))
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Bulk review: accept every annotation whose two rounds already agree.
+
+Agreement is checked for the whole batch at once, as NumPy ops over the crop
+columns and the multi-hot label matrices: crops equal, label sets equal and
+non-empty. How strictly "equal" is meant is set by the normalization policy:
+
+- ``exact``: crop and label text must match exactly (label order is ignored)
+- ``case``: case, whitespace and hyphens are ignored
+- ``aliases``: like ``case``, plus the label aliases configured for the
+  taxonomy (the same rule filtered navigation uses for disagreements)
+
+Images that already have a review are never touched: besides the scan up
+front, each image is re-checked as its review is written, so a reviewer who
+saves while the batch runs keeps their review. Accepted rows are saved
+through the review store in one batch as round 1, with ``auto_accepted`` set.
+Use ``--dry-run`` (or ``dry_run=True``) to preview the counts first.
+"""
+
+import argparse
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from annotation_store import AnnotationStore
+from label_taxonomy import (LabelMatrix, LabelNormalizer, TaxonomyStore, encode_label_columns,
+                            parse_label_column, split_label_column)
+from review_store import ReviewBackend, create_review_backend
+from work_queue import normalize_crops
+
+POLICY_EXACT = "exact"
+POLICY_CASE = "case"
+POLICY_ALIASES = "aliases"
+POLICIES = (POLICY_EXACT, POLICY_CASE, POLICY_ALIASES)
+
+AUTO_ACCEPT_REVIEWER = "auto-accept"
+AUTO_ACCEPT_SELECTION = "Annotation Round 1"
+PREVIEW_ROWS = 10
+
+
+def encode_exact_label_columns(columns: List[pd.Series]) -> List[LabelMatrix]:
+    """Like encode_label_columns, but each distinct label spelling gets its own id"""
+    exploded = [split_label_column(column) for column in columns]
+    ids, names = pd.factorize(pd.concat([tokens for tokens in exploded], ignore_index=True))
+    encoded, offset = [], 0
+    for tokens in exploded:
+        encoded.append((tokens.index.to_numpy(dtype=np.int64), ids[offset:offset + len(tokens)]))
+        offset += len(tokens)
+    return [
+        LabelMatrix.from_ids(rows, label_ids, len(column), len(names))
+        for column, (rows, label_ids) in zip(columns, encoded)
+    ]
+
+
+def encode_unique_label_columns(columns: List[pd.Series], encode_fn) -> List[LabelMatrix]:
+    """
+    Run encode_fn over the distinct values of each label column only, then
+    expand back to one row per annotation. Label columns repeat a small set of
+    strings, so this parses thousands of strings instead of millions.
+    """
+    factorized = [pd.factorize(column.to_numpy(), use_na_sentinel=False) for column in columns]
+    matrices = encode_fn([pd.Series(uniques, dtype="object") for _, uniques in factorized])
+    return [LabelMatrix(matrix.packed[codes], matrix.n_labels) for (codes, _), matrix in zip(factorized, matrices)]
+
+
+def find_agreeing_rows(df: pd.DataFrame, policy: str = POLICY_ALIASES,
+                       normalizer: Optional[LabelNormalizer] = None,
+                       reviewed_images: Iterable[str] = ()) -> np.ndarray:
+    """
+    Rows whose two annotation rounds agree under a normalization policy.
+
+    Args:
+        df: Annotation DataFrame (or memory-mapped AnnotationTable)
+        policy: One of POLICIES
+        normalizer: Taxonomy label normalizer, used by the aliases policy
+        reviewed_images: Image paths that already have a review; their rows are skipped
+
+    Returns:
+        np.ndarray: Sorted row positions, one per image (its first row)
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown normalization policy: {policy}")
+    if df.empty:
+        return np.array([], dtype=np.int64)
+
+    columns = [df["label1"], df["label2"]]
+    if policy == POLICY_EXACT:
+        labels1, labels2 = encode_unique_label_columns(columns, encode_exact_label_columns)
+        crops_agree = (df["crop1"].astype(str).str.strip().to_numpy()
+                       == df["crop2"].astype(str).str.strip().to_numpy())
+    else:
+        # Case-insensitive keys only, unless the taxonomy aliases are wanted too
+        normalizer = normalizer if policy == POLICY_ALIASES and normalizer else LabelNormalizer({})
+        labels1, labels2 = encode_unique_label_columns(
+            columns, lambda uniques: encode_label_columns(uniques, normalizer)
+        )
+        crops_agree = normalize_crops(df["crop1"]) == normalize_crops(df["crop2"])
+
+    image_paths = df["image_path"]
+    agree = (
+        crops_agree
+        & df["crop1"].notna().to_numpy()
+        & labels1.equals(labels2)
+        & ~labels1.is_empty()
+        & ~image_paths.duplicated().to_numpy()
+        & ~image_paths.isin(set(reviewed_images)).to_numpy()
+    )
+    return np.flatnonzero(agree)
+
+
+def build_auto_reviews(df: pd.DataFrame, rows: np.ndarray, reviewer: str, policy: str,
+                       timestamp: Optional[str] = None) -> List[dict]:
+    """Review records accepting round 1 for each row, in the format save_reviewed_annotation writes"""
+    timestamp = timestamp or pd.Timestamp.now().isoformat()
+    selected = pd.DataFrame({name: df[name].to_numpy()[rows]
+                             for name in ("image_path", "crop1", "label1", "crop2", "label2")})
+    accepted_labels = parse_label_column(selected["label1"])
+    return [
+        {
+            "image_path": image_path,
+            "crop1": crop1,
+            "label1": label1,
+            "crop2": crop2,
+            "label2": label2,
+            "reviewer_crop": crop1,
+            "reviewer_labels": ", ".join(labels),
+            "comments": f"Auto-accepted: both rounds agree ({policy})",
+            "reviewer_username": reviewer,
+            "review_timestamp": timestamp,
+            "selected_annotation": AUTO_ACCEPT_SELECTION,
+            "auto_accepted": True,
+            "auto_accept_policy": policy,
+        }
+        for image_path, crop1, label1, crop2, label2, labels in zip(
+            selected["image_path"].tolist(), selected["crop1"].astype(str).tolist(), selected["label1"].tolist(),
+            selected["crop2"].astype(str).tolist(), selected["label2"].tolist(), accepted_labels
+        )
+    ]
+
+
+def bulk_accept(df: pd.DataFrame, review_store: ReviewBackend, policy: str = POLICY_ALIASES,
+                normalizer: Optional[LabelNormalizer] = None, reviewer: str = AUTO_ACCEPT_REVIEWER,
+                dry_run: bool = True, exclude_rows: Iterable[int] = (), limit: Optional[int] = None) -> dict:
+    """
+    Accept every unreviewed agreeing pair in one batch.
+
+    Args:
+        df: Annotation DataFrame (or memory-mapped AnnotationTable)
+        review_store: Review backend the reviews are written through
+        policy: One of POLICIES
+        normalizer: Taxonomy label normalizer, used by the aliases policy
+        reviewer: reviewer_username recorded on the reviews
+        dry_run: Only count and preview, write nothing
+        exclude_rows: Rows to leave alone (e.g. leased to a reviewer)
+        limit: Accept at most this many rows
+
+    Returns:
+        dict: rows (accepted row positions), candidates, written, skipped (reviewed meanwhile),
+            by_crop counts and preview records
+    """
+    reviewed_images = (image_path for image_path, _ in review_store.iter_reviewed_images())
+    rows = find_agreeing_rows(df, policy, normalizer, reviewed_images)
+    exclude_rows = np.fromiter(exclude_rows, dtype=np.int64)
+    if len(exclude_rows):
+        rows = rows[~np.isin(rows, exclude_rows)]
+    if limit is not None:
+        rows = rows[:limit]
+
+    crops = pd.Series(df["crop1"].to_numpy()[rows]).astype(str)
+    result = {
+        "policy": policy,
+        "dry_run": dry_run,
+        "rows": rows,
+        "candidates": len(rows),
+        "written": 0,
+        "skipped": 0,
+        "by_crop": crops.value_counts().to_dict(),
+        "preview": build_auto_reviews(df, rows[:PREVIEW_ROWS], reviewer, policy),
+    }
+    if not dry_run and len(rows):
+        # Conditional write: images reviewed since the scan above are skipped, not overwritten
+        written = review_store.save_new_reviews(build_auto_reviews(df, rows, reviewer, policy))
+        written_paths = {review["image_path"] for review in written}
+        accepted = np.fromiter((image_path in written_paths for image_path in df["image_path"].to_numpy()[rows]),
+                               dtype=bool, count=len(rows))
+        result["rows"] = rows[accepted]
+        result["written"] = len(written)
+        result["skipped"] = len(rows) - len(written)
+        result["by_crop"] = crops[accepted].value_counts().to_dict()
+    return result
+
+
+def format_bulk_result(result: dict) -> str:
+    """One-paragraph human-readable summary of a bulk_accept result"""
+    action = "Would accept" if result["dry_run"] else "Accepted"
+    count = result["candidates"] if result["dry_run"] else result["written"]
+    text = f"{action} {count} agreeing annotations (policy: {result['policy']})"
+    if result["by_crop"]:
+        text += ": " + ", ".join(f"{crop} {n}" for crop, n in result["by_crop"].items())
+    if result.get("skipped"):
+        text += f". Skipped {result['skipped']} reviewed while the batch ran"
+    return text
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accept every annotation whose two rounds agree")
+    parser.add_argument("--csv", default="double_annotations_for_review.csv",
+                        help="Annotations CSV (or Arrow file from annotation_store.py convert)")
+    parser.add_argument("--output-dir", default="./output", help="Directory containing JSON review files")
+    parser.add_argument("--review-db", default=None, help="SQLite review database (instead of --output-dir)")
+    parser.add_argument("--review-log", default=None, help="Review log directory (instead of --output-dir)")
+    parser.add_argument("--labels", default=None, help="labels.json, for the aliases policy")
+    parser.add_argument("--alias", action="append", default=[], metavar="ALIAS=LABEL",
+                        help="Extra label spelling for the aliases policy (repeatable)")
+    parser.add_argument("--policy", choices=POLICIES, default=POLICY_ALIASES, help="Normalization policy")
+    parser.add_argument("--reviewer", default=AUTO_ACCEPT_REVIEWER, help="reviewer_username for the reviews")
+    parser.add_argument("--limit", type=int, default=None, help="Accept at most this many annotations")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be accepted")
+    args = parser.parse_args()
+
+    aliases = dict(alias.split("=", 1) for alias in args.alias)
+    normalizer = TaxonomyStore(args.labels, aliases).get().normalizer if args.labels else LabelNormalizer({}, aliases)
+    annotations = AnnotationStore(args.csv).get_dataframe()
+    # With --review-db or --review-log, JSON files are mirrored into --output-dir as the app does by default
+    store = create_review_backend(args.output_dir, args.review_db, emit_json=True, log_dir=args.review_log)
+    try:
+        result = bulk_accept(annotations, store, args.policy, normalizer, args.reviewer, args.dry_run,
+                             limit=args.limit)
+    finally:
+        store.close()
+    print(format_bulk_result(result))
+    for review in result["preview"]:
+        print(f"  {review['image_path']}: {review['reviewer_crop']} / {review['reviewer_labels']}")
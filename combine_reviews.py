@@ -4,148 +4,836 @@ Script to stitch all JSON review files into a final annotation CSV.
 This script reads all JSON files from the output directory and creates a comprehensive CSV file.
 """
 
+import argparse
 import json
+import numpy as np
 import pandas as pd
 import os
-import glob
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
 
-def get_image_filename_from_path(image_path):
-    """Convert image path to safe filename (same logic as in app.py)"""
-    safe_filename = image_path.replace("/", "_").replace("\\", "_")
-    if safe_filename.endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff')):
-        safe_filename = safe_filename.rsplit('.', 1)[0]
-    return f"{safe_filename}.json"
+from annotation_store import AnnotationStore
+from label_taxonomy import normalize_label_keys, split_label_column
+from metrics import METRICS
+from review_store import create_review_backend, get_image_filename_from_path, iter_review_files, iter_review_log
 
-def stitch_reviews_to_csv(output_dir="./output", output_csv="final_annotations.csv"):
+def load_annotation_index(annotations_csv):
+    """Load the row/image_path/review filename index for the annotations CSV"""
+    store = AnnotationStore(annotations_csv)
+    store.get_dataframe()
+    return store.get_index()
+
+# Columns written by the stitcher, in output order
+OUTPUT_COLUMNS = [
+    'image_path', 'original_crop1', 'original_label1', 'original_crop2', 'original_label2',
+    'reviewer_crop', 'reviewer_labels', 'comments', 'reviewer_username', 'review_timestamp',
+    'selected_annotation', 'auto_accepted', 'json_filename'
+]
+
+def review_to_csv_row(json_filename, review_data):
+    """Flatten one review JSON into an output row"""
+    return {
+        'image_path': review_data.get('image_path', ''),
+        'original_crop1': review_data.get('crop1', ''),
+        'original_label1': review_data.get('label1', ''),
+        'original_crop2': review_data.get('crop2', ''),
+        'original_label2': review_data.get('label2', ''),
+        'reviewer_crop': review_data.get('reviewer_crop', ''),
+        'reviewer_labels': review_data.get('reviewer_labels', ''),
+        'comments': review_data.get('comments', ''),
+        'reviewer_username': review_data.get('reviewer_username', ''),
+        'review_timestamp': review_data.get('review_timestamp', ''),
+        'selected_annotation': review_data.get('selected_annotation', ''),
+        'auto_accepted': bool(review_data.get('auto_accepted', False)),
+        'json_filename': json_filename
+    }
+
+# Parquet column types of the output; every other column is a nullable string
+PARQUET_BOOL_COLUMNS = ('auto_accepted',)
+
+# A checkpointed export re-reads this far behind the newest review it exported, so
+# reviews saved late (write-behind, slow saves) are not missed; repeats are dropped
+CHECKPOINT_OVERLAP_SECONDS = 600
+
+def parse_window_time(value):
+    """Parse an ISO date or datetime into naive local time, the format of review_timestamp"""
+    if value is None or isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(value)
+    if parsed is not None and parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def filter_review_window(df, since=None, until=None, reviewers=None, crops=None):
+    """
+    Keep the output rows inside a review window.
+    
+    Args:
+        df (DataFrame): Output rows from load_reviews
+        since (datetime): Keep reviews at or after this time
+        until (datetime): Keep reviews before this time
+        reviewers (list): Keep reviews by these reviewer usernames
+        crops (list): Keep reviews whose reviewer_crop is one of these (case-insensitive)
+    
+    Returns:
+        DataFrame: Matching rows
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if since is not None or until is not None:
+        timestamps = parse_review_timestamps(df['review_timestamp'])
+        if since is not None:
+            mask &= (timestamps >= since).to_numpy()
+        if until is not None:
+            mask &= (timestamps < until).to_numpy()
+    if reviewers is not None:
+        mask &= df['reviewer_username'].isin(list(reviewers)).to_numpy()
+    if crops is not None:
+        wanted = [crop.strip().lower() for crop in crops]
+        mask &= df['reviewer_crop'].astype(str).str.strip().str.lower().isin(wanted).to_numpy()
+    return df[mask].reset_index(drop=True)
+
+@METRICS.timed("review_stitch", function="load_reviews")
+def load_reviews(output_dir="./output", review_db=None, since=None, until=None, reviewers=None, crops=None,
+                 review_log=None, filename_fn=None):
+    """
+    Parse every stored review once into a DataFrame of output rows.
+    
+    The result can be passed to stitch_reviews_to_csv, get_review_summary and
+    build_review_report so the review files are only read once per run.
+    
+    With a window (since, until, reviewers or crops) only matching reviews are
+    returned, and review files last modified before since are not opened.
+    
+    Args:
+        output_dir (str): Directory containing JSON review files
+        review_db (str): Optional SQLite review database to read instead of output_dir
+        since (datetime): Only reviews at or after this time
+        until (datetime): Only reviews before this time
+        reviewers (list): Only reviews by these reviewer usernames
+        crops (list): Only reviews whose reviewer_crop is one of these
+        review_log (str): Optional review log directory to read the latest versions from instead
+        filename_fn (callable): Maps an image path to its review filename for the review log, as the app's
+            store does (default: the plain filename, without collision disambiguation)
+    
+    Returns:
+        tuple: (DataFrame of output rows, number of review files read)
+    """
+    store = create_review_backend(output_dir, review_db, filename_fn=filename_fn, log_dir=review_log)
+    windowed = any(value is not None for value in (since, until, reviewers, crops))
+    total_files = 0
+    
+    # List to store all review data
+    all_reviews = []
+    
+    # Process each stored review
+    source = store.iter_reviews_window(since, until, reviewers) if windowed else store.iter_reviews()
+    for json_filename, review_data in source:
+        total_files += 1
+        try:
+            # Extract data for CSV
+            all_reviews.append(review_to_csv_row(json_filename, review_data))
+        except Exception as e:
+            print(f"Error processing {json_filename}: {e}")
+            continue
+    store.close()
+    
+    df = pd.DataFrame(all_reviews, columns=OUTPUT_COLUMNS)
+    if windowed:
+        df = filter_review_window(df, since, until, reviewers, crops)
+    return df, total_files
+
+@METRICS.timed("review_stitch", function="stitch_reviews_to_csv")
+def stitch_reviews_to_csv(output_dir="./output", output_csv="final_annotations.csv", review_db=None,
+                          annotations_csv=None, reviews=None, review_log=None):
     """
     Stitch all JSON review files into a final annotation CSV.
     
     Args:
         output_dir (str): Directory containing JSON review files
         output_csv (str): Output CSV filename
+        review_db (str): Optional SQLite review database to read instead of output_dir
+        annotations_csv (str): Optional annotations CSV; adds each review's original row index
+        reviews (tuple): Optional result of load_reviews to reuse instead of re-reading the reviews
+        review_log (str): Optional review log directory to read instead of output_dir
     
     Returns:
         str: Status message
     """
     try:
-        # Get all JSON files from output directory
-        json_pattern = os.path.join(output_dir, "*.json")
-        json_files = glob.glob(json_pattern)
+        if reviews is None:
+            reviews = load_reviews(output_dir, review_db, review_log=review_log)
+        df, total_files = reviews
         
-        if not json_files:
-            return f"No JSON files found in {output_dir}"
+        if not total_files:
+            return f"No JSON files found in {review_db or review_log or output_dir}"
         
-        # List to store all review data
-        all_reviews = []
-        
-        # Process each JSON file
-        for json_file in json_files:
-            try:
-                with open(json_file, 'r') as f:
-                    review_data = json.load(f)
-                
-                # Extract data for CSV
-                csv_row = {
-                    'image_path': review_data.get('image_path', ''),
-                    'original_crop1': review_data.get('crop1', ''),
-                    'original_label1': review_data.get('label1', ''),
-                    'original_crop2': review_data.get('crop2', ''),
-                    'original_label2': review_data.get('label2', ''),
-                    'reviewer_crop': review_data.get('reviewer_crop', ''),
-                    'reviewer_labels': review_data.get('reviewer_labels', ''),
-                    'comments': review_data.get('comments', ''),
-                    'reviewer_username': review_data.get('reviewer_username', ''),
-                    'review_timestamp': review_data.get('review_timestamp', ''),
-                    'selected_annotation': review_data.get('selected_annotation', ''),
-                    'json_filename': os.path.basename(json_file)
-                }
-                
-                all_reviews.append(csv_row)
-                
-            except Exception as e:
-                print(f"Error processing {json_file}: {e}")
-                continue
-        
-        if not all_reviews:
+        if df.empty:
             return "No valid review data found"
         
-        # Create DataFrame and save to CSV
-        df = pd.DataFrame(all_reviews)
+        if annotations_csv:
+            index = load_annotation_index(annotations_csv)
+            rows = pd.Series(index.get_rows(df['image_path']), index=df.index)
+            df = df.assign(index=rows.where(rows >= 0).astype('Int64'))
+            unmatched = int(df['index'].isna().sum())
+            if unmatched:
+                print(f"Warning: {unmatched} reviews refer to images not in {annotations_csv}")
         
-        # Sort by image path for consistency
-        df = df.sort_values('image_path')
+        # Sort by image path for consistency (stable, so history versions stay in order)
+        df = df.sort_values('image_path', kind='stable')
         
         # Save to CSV
         df.to_csv(output_csv, index=False)
         
-        return f"Successfully created {output_csv} with {len(all_reviews)} reviews from {len(json_files)} JSON files"
+        return f"Successfully created {output_csv} with {len(df)} reviews from {total_files} JSON files"
+        
+    except Exception as e:
+        return f"Error creating CSV: {str(e)}"
+
+@METRICS.timed("review_stitch", function="load_review_history")
+def load_review_history(review_log, since=None, until=None, reviewers=None, crops=None, filename_fn=None):
+    """
+    Parse every saved version in a review log into output rows, oldest first.
+    
+    Adds a per-image ``version`` number (1 for the first review) and
+    ``is_latest``, so changed decisions can be audited.
+    
+    Args:
+        review_log (str): Review log directory
+        since (datetime or str): Only versions saved at or after this time
+        until (datetime or str): Only versions saved before this time
+        reviewers (list): Only versions by these reviewer usernames
+        crops (list): Only versions whose reviewer_crop is one of these
+        filename_fn (callable): Maps an image path to its review filename, as for load_reviews
+    
+    Returns:
+        tuple: (DataFrame of output rows plus version and is_latest, number of versions read)
+    """
+    filename_fn = filename_fn or get_image_filename_from_path
+    rows = [review_to_csv_row(filename_fn(review_data.get('image_path', '')), review_data)
+            for review_data in iter_review_log(review_log)]
+    df = pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+    versions = df.groupby('image_path', sort=False).cumcount() + 1
+    df['version'] = versions
+    df['is_latest'] = versions == df.groupby('image_path', sort=False)['image_path'].transform('size')
+    df = filter_review_window(df, parse_window_time(since), parse_window_time(until), reviewers, crops)
+    return df, len(rows)
+
+def parse_review_files(json_files):
+    """Parse a chunk of review JSON files into output rows (runs in a worker process)"""
+    rows = []
+    for json_file in json_files:
+        try:
+            with open(json_file, 'r') as f:
+                review_data = json.load(f)
+            rows.append(review_to_csv_row(os.path.basename(json_file), review_data))
+        except Exception as e:
+            print(f"Error processing {json_file}: {e}")
+    return rows
+
+def scan_review_files(output_dir):
+    """
+    Stat every review file in output_dir (flat or sharded layout).
+    
+    Returns:
+        tuple: ({relative path: (mtime_ns, size)}, {relative path: path})
+    """
+    entries = {}
+    paths = {}
+    for entry in iter_review_files(output_dir):
+        stat = entry.stat()
+        relpath = os.path.relpath(entry.path, output_dir)
+        entries[relpath] = (stat.st_mtime_ns, stat.st_size)
+        paths[relpath] = entry.path
+    return entries, paths
+
+def select_review_files(entries):
+    """
+    Pick one file per review filename from a {relative path: (mtime_ns, size)} scan.
+    
+    A half-finished layout migration can leave the same review in both the flat
+    and the sharded location; the most recently written copy is used.
+    
+    Returns:
+        dict: {json_filename: relative path}
+    """
+    selected = {}
+    for relpath, (mtime_ns, _) in entries.items():
+        name = os.path.basename(relpath)
+        chosen = selected.get(name)
+        if chosen is None or (mtime_ns, relpath) > (entries[chosen][0], chosen):
+            selected[name] = relpath
+    return selected
+
+def load_manifest(manifest_path):
+    """Load the {relative path: (mtime_ns, size)} manifest of the previous run"""
+    try:
+        with open(manifest_path, 'r') as f:
+            return {name: tuple(sig) for name, sig in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error reading manifest {manifest_path}, rebuilding from scratch: {e}")
+        return {}
+
+def write_manifest(manifest_path, entries):
+    """Atomically write the manifest for this run"""
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(entries, f)
+    os.replace(temp_path, manifest_path)
+
+def to_parquet_frame(df):
+    """Output rows with Parquet-ready values: bools for PARQUET_BOOL_COLUMNS, strings elsewhere, nulls kept"""
+    def as_bool(value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return None
+        if isinstance(value, str):
+            # Outputs written before typed Parquet stored "True" / "False"
+            return value.strip().lower() == 'true'
+        return bool(value)
+    
+    def as_str(value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return None
+        return value if isinstance(value, str) else str(value)
+    
+    return pd.DataFrame({
+        name: df[name].map(as_bool if name in PARQUET_BOOL_COLUMNS else as_str).astype(object)
+        for name in df.columns
+    })
+
+class ChunkWriter:
+    """Append DataFrame chunks to a CSV or Parquet file"""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.is_parquet = path.endswith('.parquet')
+        self._parquet_writer = None
+        self._wrote_header = False
+
+    def write(self, df):
+        df = df.reindex(columns=self.columns)
+        if self.is_parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([(name, pa.bool_() if name in PARQUET_BOOL_COLUMNS else pa.string())
+                                for name in self.columns])
+            table = pa.Table.from_pandas(to_parquet_frame(df), schema=schema, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, schema)
+            self._parquet_writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='a' if self._wrote_header else 'w',
+                      header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        elif not self._wrote_header and not self.is_parquet:
+            pd.DataFrame(columns=self.columns).to_csv(self.path, index=False)
+
+def iter_output_chunks(path, chunk_size):
+    """Yield an existing CSV or Parquet output in DataFrame chunks"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False)
+
+@METRICS.timed("review_stitch", function="load_stitched_output")
+def load_stitched_output(output_path, chunk_size=5000):
+    """
+    Read the output of stitch_reviews_streaming back as output rows.
+    
+    Lets the summary and report of a streaming run read the one stitched file
+    instead of parsing every review file a second time.
+    
+    Args:
+        output_path (str): CSV or Parquet output of stitch_reviews_streaming
+        chunk_size (int): Rows per read
+    
+    Returns:
+        tuple: (DataFrame of output rows, number of reviews), like load_reviews
+    """
+    if not os.path.exists(output_path):
+        return pd.DataFrame(columns=OUTPUT_COLUMNS), 0
+    chunks = list(iter_output_chunks(output_path, chunk_size))
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=OUTPUT_COLUMNS)
+    df = df.reindex(columns=OUTPUT_COLUMNS)
+    return df, len(df)
+
+@METRICS.timed("review_stitch", function="stitch_reviews_streaming")
+def stitch_reviews_streaming(output_dir="./output", output_path="final_annotations.csv", workers=None,
+                             chunk_size=5000, manifest_path=None):
+    """
+    Incrementally stitch JSON review files into a CSV or Parquet file.
+    
+    Review files are parsed across a process pool and written in chunks, so
+    memory stays bounded. A manifest of (relative path, mtime, size) is kept
+    next to the output; re-runs only parse new or changed files and merge them
+    into the existing output. Each review filename is written once, even if a
+    half-finished layout migration left it in two places. Rows are not sorted
+    in this mode. Parquet output keeps nulls and stores auto_accepted as a bool.
+    
+    Args:
+        output_dir (str): Directory containing JSON review files
+        output_path (str): Output file; a .parquet suffix writes Parquet (requires pyarrow)
+        workers (int): Number of parser processes (default: CPU count)
+        chunk_size (int): Review files per parse task and rows per write
+        manifest_path (str): Manifest location (default: <output_path>.manifest.json)
+    
+    Returns:
+        str: Status message
+    """
+    try:
+        manifest_path = manifest_path or f"{output_path}.manifest.json"
+        current, current_paths = scan_review_files(output_dir)
+        if not current:
+            return f"No JSON files found in {output_dir}"
+        
+        selected = select_review_files(current)
+        previous = load_manifest(manifest_path) if os.path.exists(output_path) else {}
+        previous_selected = select_review_files(previous)
+        # A review changed if its file changed, or another copy of it is now the newest
+        changed = [name for name, relpath in selected.items()
+                   if previous_selected.get(name) != relpath or previous.get(relpath) != current[relpath]]
+        removed = [name for name in previous_selected if name not in selected]
+        if not changed and not removed:
+            return f"{output_path} is up to date ({len(selected)} reviews)"
+        
+        stale = set(changed) | set(removed)
+        temp_path = f"{output_path}.tmp"
+        if output_path.endswith('.parquet'):
+            temp_path += '.parquet'
+        writer = ChunkWriter(temp_path, OUTPUT_COLUMNS)
+        kept = 0
+        written = 0
+        try:
+            # Carry over unchanged rows from the previous output
+            if previous:
+                for chunk in iter_output_chunks(output_path, chunk_size):
+                    chunk = chunk[~chunk['json_filename'].isin(stale)]
+                    if len(chunk):
+                        writer.write(chunk)
+                        kept += len(chunk)
+            
+            # Parse new and changed review files in parallel, writing as results arrive
+            paths = [current_paths[selected[name]] for name in changed]
+            tasks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for rows in pool.map(parse_review_files, tasks):
+                    if rows:
+                        writer.write(pd.DataFrame(rows, columns=OUTPUT_COLUMNS))
+                        written += len(rows)
+        finally:
+            writer.close()
+        
+        os.replace(temp_path, output_path)
+        write_manifest(manifest_path, current)
+        
+        return (f"Updated {output_path}: {written} new or changed reviews, {len(removed)} removed, "
+                f"{kept} unchanged")
+        
+    except Exception as e:
+        return f"Error creating output: {str(e)}"
+
+def load_checkpoint(checkpoint_path):
+    """Load the checkpoint of the previous windowed export, or {} for the first run"""
+    try:
+        with open(checkpoint_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error reading checkpoint {checkpoint_path}, exporting the full window: {e}")
+        return {}
+
+def write_checkpoint(checkpoint_path, checkpoint):
+    """Atomically write the checkpoint for the next windowed export"""
+    temp_path = f"{checkpoint_path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(temp_path, checkpoint_path)
+
+def advance_checkpoint(checkpoint, df):
+    """
+    Move a checkpoint past the reviews just exported.
+    
+    The next run resumes CHECKPOINT_OVERLAP_SECONDS before the newest exported
+    review; the (json_filename, review_timestamp) keys exported inside that
+    overlap are kept so they are not exported twice.
+    
+    Args:
+        checkpoint (dict): Checkpoint of the previous run ({} for the first run)
+        df (DataFrame): Output rows exported by this run
+    
+    Returns:
+        dict: The new checkpoint
+    """
+    keys = [tuple(key) for key in checkpoint.get('exported', [])]
+    keys += zip(df['json_filename'], df['review_timestamp'].astype(str))
+    timestamps = parse_review_timestamps(pd.Series([timestamp for _, timestamp in keys], dtype=object))
+    newest = timestamps.max()
+    if pd.isna(newest):
+        return checkpoint
+    resume = newest - timedelta(seconds=CHECKPOINT_OVERLAP_SECONDS)
+    return {
+        'since': resume.isoformat(),
+        'newest_review': newest.isoformat(),
+        'exported': sorted({key for key, parsed in zip(keys, timestamps) if parsed >= resume}),
+        'updated_at': datetime.now().isoformat(),
+    }
+
+def load_review_window(output_dir="./output", review_db=None, since=None, until=None, reviewers=None, crops=None,
+                       checkpoint_path=None, review_log=None, filename_fn=None):
+    """
+    Load the reviews of a window, or only those newer than the last checkpointed export.
+    
+    Args:
+        output_dir (str): Directory containing JSON review files
+        review_db (str): Optional SQLite review database to read instead of output_dir
+        since (datetime): Only reviews at or after this time
+        until (datetime): Only reviews before this time
+        reviewers (list): Only reviews by these reviewer usernames
+        crops (list): Only reviews whose reviewer_crop is one of these
+        checkpoint_path (str): Checkpoint written by the previous export; the window
+            starts where it left off and reviews it already exported are dropped
+        review_log (str): Optional review log directory to read instead of output_dir
+        filename_fn (callable): Maps an image path to its review filename, as for load_reviews
+    
+    Returns:
+        tuple: (DataFrame of output rows, number of review files read), as load_reviews
+    """
+    since, until = parse_window_time(since), parse_window_time(until)
+    checkpoint = load_checkpoint(checkpoint_path) if checkpoint_path else {}
+    if checkpoint.get('since'):
+        resume = datetime.fromisoformat(checkpoint['since'])
+        since = max(since, resume) if since is not None else resume
+    
+    df, total_files = load_reviews(output_dir, review_db, since, until, reviewers, crops, review_log, filename_fn)
+    exported = {tuple(key) for key in checkpoint.get('exported', [])}
+    if exported and not df.empty:
+        keys = zip(df['json_filename'], df['review_timestamp'].astype(str))
+        df = df[[key not in exported for key in keys]].reset_index(drop=True)
+    return df, total_files
+
+@METRICS.timed("review_stitch", function="export_review_window")
+def export_review_window(output_dir="./output", output_csv="final_annotations.csv", review_db=None,
+                         annotations_csv=None, since=None, until=None, reviewers=None, crops=None,
+                         checkpoint_path=None, reviews=None, review_log=None):
+    """
+    Stitch only the reviews of a time range, reviewer or crop into a CSV.
+    
+    With a checkpoint, each run exports the reviews saved since the previous
+    run and then advances the checkpoint, so a daily export reads new review
+    files only. The CSV is written (with just a header) even when there is
+    nothing new, so downstream jobs always find it.
+    
+    Args:
+        output_dir (str): Directory containing JSON review files
+        output_csv (str): Output CSV filename
+        review_db (str): Optional SQLite review database to read instead of output_dir
+        annotations_csv (str): Optional annotations CSV; adds each review's original row index
+        since (datetime or str): Only reviews at or after this time (ISO, local time)
+        until (datetime or str): Only reviews before this time (ISO, local time)
+        reviewers (list): Only reviews by these reviewer usernames
+        crops (list): Only reviews whose reviewer_crop is one of these
+        checkpoint_path (str): Checkpoint file to resume from and advance
+        reviews (tuple): Optional result of load_review_window to reuse instead of re-reading the reviews
+        review_log (str): Optional review log directory to read instead of output_dir
+    
+    Returns:
+        str: Status message
+    """
+    try:
+        if reviews is None:
+            reviews = load_review_window(output_dir, review_db, since, until, reviewers, crops, checkpoint_path,
+                                         review_log)
+        df, total_files = reviews
+        
+        if df.empty:
+            columns = OUTPUT_COLUMNS + ['index'] if annotations_csv else OUTPUT_COLUMNS
+            pd.DataFrame(columns=columns).to_csv(output_csv, index=False)
+            result = f"No new reviews in the window ({total_files} review files read); wrote an empty {output_csv}"
+        else:
+            result = stitch_reviews_to_csv(output_dir, output_csv, annotations_csv=annotations_csv,
+                                           reviews=(df, total_files))
+            if result.startswith("Error"):
+                return result
+        
+        if checkpoint_path:
+            write_checkpoint(checkpoint_path, advance_checkpoint(load_checkpoint(checkpoint_path), df))
+        return result
         
     except Exception as e:
         return f"Error creating CSV: {str(e)}"
 
-def get_review_summary(output_dir="./output"):
+@METRICS.timed("review_stitch", function="get_review_summary")
+def get_review_summary(output_dir="./output", review_db=None, reviews=None, review_log=None):
     """
     Get summary of reviews in the output directory.
     
     Args:
         output_dir (str): Directory containing JSON review files
+        review_db (str): Optional SQLite review database to read instead of output_dir
+        reviews (tuple): Optional result of load_reviews to reuse instead of re-reading the reviews
+        review_log (str): Optional review log directory to read instead of output_dir
     
     Returns:
         dict: Summary statistics
     """
     try:
-        json_pattern = os.path.join(output_dir, "*.json")
-        json_files = glob.glob(json_pattern)
+        if reviews is None:
+            reviews = load_reviews(output_dir, review_db, review_log=review_log)
+        df, total_files = reviews
         
         summary = {
-            'total_reviews': len(json_files),
-            'reviewed_images': [os.path.basename(f) for f in json_files],
-            'reviewers': set(),
+            'total_reviews': total_files,
+            'reviewed_images': df['json_filename'].tolist(),
+            'reviewers': [r for r in df['reviewer_username'].dropna().unique().tolist() if r],
             'latest_review': None
         }
         
-        latest_timestamp = None
-        
-        for json_file in json_files:
-            try:
-                with open(json_file, 'r') as f:
-                    review_data = json.load(f)
-                
-                # Collect reviewer names
-                reviewer = review_data.get('reviewer_username', '')
-                if reviewer:
-                    summary['reviewers'].add(reviewer)
-                
-                # Find latest review
-                timestamp = review_data.get('review_timestamp', '')
-                if timestamp and (latest_timestamp is None or timestamp > latest_timestamp):
-                    latest_timestamp = timestamp
-                    summary['latest_review'] = {
-                        'image': review_data.get('image_path', ''),
-                        'reviewer': reviewer,
-                        'timestamp': timestamp
-                    }
-                    
-            except Exception as e:
-                print(f"Error processing {json_file}: {e}")
-                continue
-        
-        summary['reviewers'] = list(summary['reviewers'])
+        # Find latest review
+        timestamps = df['review_timestamp'].fillna('').astype(str)
+        if (timestamps != '').any():
+            latest = df.loc[timestamps.idxmax()]
+            summary['latest_review'] = {
+                'image': latest['image_path'],
+                'reviewer': latest['reviewer_username'],
+                'timestamp': latest['review_timestamp']
+            }
+        
         return summary
         
     except Exception as e:
         return {'error': str(e)}
 
+# Annotation sources compared in the agreement report: (name, crop column, labels column)
+AGREEMENT_SOURCES = [
+    ('round1', 'original_crop1', 'original_label1'),
+    ('round2', 'original_crop2', 'original_label2'),
+    ('reviewer', 'reviewer_crop', 'reviewer_labels'),
+]
+
+def normalize_label_sets(labels):
+    """Normalize a Series of label strings to sorted, lower-cased, comma-joined label sets"""
+    keys = normalize_label_keys(split_label_column(labels))
+    keys = keys.rename_axis('row').reset_index(name='key').drop_duplicates().sort_values(['row', 'key'])
+    joined = keys.groupby('row')['key'].agg(", ".join)
+    return pd.Series(joined.reindex(range(len(labels)), fill_value='').to_numpy(), index=labels.index)
+
+def parse_review_timestamps(timestamps):
+    """Parse ISO review timestamps (with or without microseconds); invalid values become NaT"""
+    try:
+        return pd.to_datetime(timestamps, errors='coerce', format='ISO8601')
+    except (TypeError, ValueError):
+        # pandas < 2.0 has no 'ISO8601' format but infers ISO strings per element
+        return pd.to_datetime(timestamps, errors='coerce')
+
+def cohens_kappa(a, b):
+    """Cohen's kappa between two categorical Series"""
+    table = pd.crosstab(a, b)
+    if table.empty:
+        return None
+    categories = table.index.union(table.columns)
+    counts = table.reindex(index=categories, columns=categories, fill_value=0).to_numpy(dtype=float)
+    n = counts.sum()
+    observed = np.trace(counts) / n
+    expected = (counts.sum(axis=1) @ counts.sum(axis=0)) / (n * n)
+    if expected >= 1:
+        return 1.0
+    return float((observed - expected) / (1 - expected))
+
+@METRICS.timed("review_stitch", function="build_review_report")
+def build_review_report(reviews):
+    """
+    Build throughput and inter-annotator agreement statistics in one pass over loaded reviews.
+    
+    Args:
+        reviews (tuple): Result of load_reviews
+    
+    Returns:
+        dict: Report with 'reviewers', 'selection_share', 'kappa', 'crop_confusion'
+              and 'label_agreement' sections
+    """
+    df, _ = reviews
+    if df.empty:
+        return {'total_reviews': 0, 'reviewers': [], 'selection_share': {}, 'kappa': {},
+                'crop_confusion': [], 'label_agreement': []}
+    
+    crops = {name: df[crop].fillna('').astype(str).str.lower() for name, crop, _ in AGREEMENT_SOURCES}
+    label_sets = {name: normalize_label_sets(df[labels]) for name, _, labels in AGREEMENT_SOURCES}
+    pairs = [(a[0], b[0]) for i, a in enumerate(AGREEMENT_SOURCES) for b in AGREEMENT_SOURCES[i + 1:]]
+    
+    # Per-reviewer throughput
+    timestamps = parse_review_timestamps(df['review_timestamp'])
+    grouped = df.assign(_ts=timestamps, _hour=timestamps.dt.floor('h')).groupby('reviewer_username')
+    throughput = grouped.agg(
+        reviews=('image_path', 'size'),
+        first_review=('_ts', 'min'),
+        last_review=('_ts', 'max'),
+        active_hours=('_hour', 'nunique'),
+    )
+    throughput['reviews_per_active_hour'] = throughput['reviews'] / throughput['active_hours'].where(
+        throughput['active_hours'] > 0)
+    selection = pd.crosstab(df['reviewer_username'], df['selected_annotation'], normalize='index')
+    throughput = throughput.join(selection.add_prefix('share_'))
+    
+    # Crop confusion and kappa for every pair of sources
+    crop_confusion = []
+    kappa = {}
+    for a, b in pairs:
+        table = pd.crosstab(crops[a], crops[b]).stack()
+        for (crop_a, crop_b), count in table[table > 0].items():
+            crop_confusion.append({'pair': f"{a}_vs_{b}", 'crop_a': crop_a, 'crop_b': crop_b, 'count': int(count)})
+        kappa[f"{a}_vs_{b}"] = {
+            'crop': cohens_kappa(crops[a], crops[b]),
+            'labels': cohens_kappa(label_sets[a], label_sets[b]),
+        }
+    
+    # Per-label agreement (both / only a / only b) for every pair of sources
+    memberships = []
+    for name, _, _ in AGREEMENT_SOURCES:
+        exploded = label_sets[name].str.split(', ').explode()
+        exploded = exploded[exploded != '']
+        memberships.append(pd.DataFrame({
+            'row': exploded.index, 'crop': crops['reviewer'].loc[exploded.index].to_numpy(),
+            'label': exploded.to_numpy(), 'source': name,
+        }))
+    membership = pd.concat(memberships, ignore_index=True)
+    multi_hot = (membership.assign(present=True)
+                 .pivot_table(index=['row', 'crop', 'label'], columns='source', values='present',
+                              aggfunc='any', fill_value=False)
+                 .reindex(columns=[name for name, _, _ in AGREEMENT_SOURCES], fill_value=False)
+                 .astype(bool))
+    label_agreement = []
+    for a, b in pairs:
+        stats = pd.DataFrame({
+            'both': multi_hot[a] & multi_hot[b],
+            f'only_{a}': multi_hot[a] & ~multi_hot[b],
+            f'only_{b}': ~multi_hot[a] & multi_hot[b],
+        }).groupby(level=['crop', 'label']).sum()
+        for (crop, label), counts in stats.iterrows():
+            label_agreement.append({
+                'pair': f"{a}_vs_{b}", 'crop': crop, 'label': label,
+                'both': int(counts['both']), 'only_a': int(counts[f'only_{a}']),
+                'only_b': int(counts[f'only_{b}']),
+            })
+    
+    reviewers = throughput.reset_index()
+    for column in ('first_review', 'last_review'):
+        reviewers[column] = reviewers[column].astype(str)
+    return {
+        'total_reviews': len(df),
+        'reviewers': reviewers.to_dict(orient='records'),
+        'selection_share': df['selected_annotation'].value_counts(normalize=True).to_dict(),
+        'kappa': kappa,
+        'crop_confusion': crop_confusion,
+        'label_agreement': label_agreement,
+    }
+
+def write_review_report(report, output_prefix):
+    """
+    Write a review report as <prefix>.json plus CSV tables.
+    
+    Args:
+        report (dict): Result of build_review_report
+        output_prefix (str): Path prefix for the report files
+    
+    Returns:
+        str: Status message
+    """
+    with open(f"{output_prefix}.json", 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    pd.DataFrame(report['reviewers']).to_csv(f"{output_prefix}_reviewers.csv", index=False)
+    pd.DataFrame(report['crop_confusion']).to_csv(f"{output_prefix}_crop_confusion.csv", index=False)
+    pd.DataFrame(report['label_agreement']).to_csv(f"{output_prefix}_label_agreement.csv", index=False)
+    kappa_rows = [{'pair': pair, **values} for pair, values in report['kappa'].items()]
+    pd.DataFrame(kappa_rows).to_csv(f"{output_prefix}_kappa.csv", index=False)
+    return f"Wrote review report to {output_prefix}.json and {output_prefix}_*.csv"
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stitch JSON review files into a final annotation CSV")
+    parser.add_argument("--output-dir", default="./output", help="Directory containing JSON review files")
+    parser.add_argument("--output-csv", default="final_annotations.csv", help="Output CSV filename")
+    parser.add_argument("--review-db", default=None, help="SQLite review database (read instead of --output-dir)")
+    parser.add_argument("--review-log", default=None, help="Review log directory (read instead of --output-dir)")
+    parser.add_argument("--history", action="store_true",
+                        help="With --review-log, export every saved version instead of the latest per image")
+    parser.add_argument("--annotations-csv", default=None, help="Annotations CSV used to add the original row index (and, with --review-log, to name "
+                             "review files of colliding images as the app does)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Incremental, parallel stitching with a manifest (CSV, or Parquet for .parquet output)")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes for --stream (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Files per parse task and rows per write for --stream")
+    parser.add_argument("--since", default=None, metavar="TIME",
+                        help="Only reviews at or after this ISO date/time (local time, like review_timestamp)")
+    parser.add_argument("--until", default=None, metavar="TIME", help="Only reviews before this ISO date/time")
+    parser.add_argument("--reviewer", action="append", default=None,
+                        help="Only reviews by this reviewer (repeatable)")
+    parser.add_argument("--crop", action="append", default=None, help="Only reviews with this final crop (repeatable)")
+    parser.add_argument("--checkpoint", default=None, metavar="FILE",
+                        help="Export only reviews newer than the previous run recorded in FILE, then update it")
+    parser.add_argument("--report", default=None, metavar="PREFIX",
+                        help="Write throughput/agreement report to PREFIX.json and PREFIX_*.csv")
+    parser.add_argument("--metrics", default=None, metavar="FILE",
+                        help="Write stitch timings to FILE in Prometheus text format")
+    args = parser.parse_args()
+    if args.metrics:
+        METRICS.enabled = True
+        METRICS.describe("review_stitch_seconds", "Latency of review stitching and reporting steps")
+    
     # Run the stitching process
     print("Stitching JSON reviews to CSV...")
-    result = stitch_reviews_to_csv()
+    reviews = None
+    windowed = any(value is not None for value in (args.since, args.until, args.reviewer, args.crop, args.checkpoint))
+    if windowed and args.stream:
+        parser.error("--stream cannot be combined with --since, --until, --reviewer, --crop or --checkpoint")
+    if args.history and (not args.review_log or args.stream or args.checkpoint):
+        parser.error("--history needs --review-log and cannot be combined with --stream or --checkpoint")
+    if args.stream and (args.review_db or args.review_log):
+        parser.error("--stream reads the JSON files in --output-dir only")
+    # Review log entries carry no filename; name colliding images the way the app's store does
+    filename_fn = (load_annotation_index(args.annotations_csv).get_review_filename
+                   if args.review_log and args.annotations_csv else None)
+    if args.history:
+        # Every version; the summary and report count versions, not images
+        reviews = load_review_history(args.review_log, args.since, args.until, args.reviewer, args.crop,
+                                      filename_fn)
+        result = stitch_reviews_to_csv(args.output_dir, args.output_csv, annotations_csv=args.annotations_csv,
+                                       reviews=reviews)
+        reviews = (reviews[0], len(reviews[0]))
+    elif args.stream:
+        result = stitch_reviews_streaming(args.output_dir, args.output_csv, args.workers, args.chunk_size)
+        # The summary and report read the stitched output instead of every review file again
+        reviews = load_stitched_output(args.output_csv, args.chunk_size)
+    elif windowed:
+        # Only the window is read; the summary and report describe the exported reviews
+        reviews = load_review_window(args.output_dir, args.review_db, args.since, args.until, args.reviewer,
+                                     args.crop, args.checkpoint, args.review_log, filename_fn)
+        result = export_review_window(args.output_dir, args.output_csv, args.review_db, args.annotations_csv,
+                                      checkpoint_path=args.checkpoint, reviews=reviews)
+        reviews = (reviews[0], len(reviews[0]))
+    else:
+        # Parse once; the summary and report reuse the same reviews
+        reviews = load_reviews(args.output_dir, args.review_db, review_log=args.review_log, filename_fn=filename_fn)
+        result = stitch_reviews_to_csv(args.output_dir, args.output_csv, args.review_db, args.annotations_csv,
+                                       reviews=reviews)
     print(result)
     
+    if args.report:
+        if reviews is None:
+            reviews = load_reviews(args.output_dir, args.review_db, review_log=args.review_log)
+        print(write_review_report(build_review_report(reviews), args.report))
+    
     # Show summary
     print("\nReview Summary:")
-    summary = get_review_summary()
+    summary = get_review_summary(args.output_dir, args.review_db, reviews=reviews, review_log=args.review_log)
     if 'error' not in summary:
         print(f"Total reviews: {summary['total_reviews']}")
         print(f"Reviewers: {', '.join(summary['reviewers'])}")
@@ -153,3 +841,7 @@ if __name__ == "__main__":
             print(f"Latest review: {summary['latest_review']['image']} by {summary['latest_review']['reviewer']}")
     else:
         print(f"Error getting summary: {summary['error']}")
+    
+    if args.metrics:
+        METRICS.write_textfile(args.metrics)
+        print(f"Wrote metrics to {args.metrics}")
@@ -0,0 +1,116 @@
+"""
+Bounded worker pools for blocking handler work.
+
+``BoundedPool`` is a thread pool with a cap on queued tasks and live
+saturation counters (workers busy, tasks waiting, queue wait time, timeouts,
+rejections). ``BoundedPool.run`` awaits a blocking call from async code with a
+per-call timeout, so the event loop never blocks on disk or image work and a
+slow NFS read only holds up the request that made it.
+
+A timed-out call cannot be interrupted; its worker finishes in the background
+and stays counted as active until it does, which is what saturation should
+show.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Optional
+
+
+class PoolSaturated(RuntimeError):
+    """Raised when a pool's queue is full"""
+
+
+class BoundedPool:
+    """Thread pool with a bounded queue and saturation statistics"""
+
+    def __init__(self, name: str, max_workers: int, max_queued: Optional[int] = None,
+                 on_wait: Optional[Callable[[str, float], None]] = None):
+        """
+        Args:
+            name: Pool name, used in thread names and statistics
+            max_workers: Worker threads
+            max_queued: Tasks allowed to wait for a worker before submit() raises PoolSaturated
+                (None: unbounded)
+            on_wait: Called with (pool name, seconds queued) as each task starts (e.g. a histogram)
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.on_wait = on_wait
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._stats = {"active": 0, "queued": 0, "completed": 0, "errors": 0, "timeouts": 0, "rejected": 0,
+                       "max_queued_seen": 0}
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs), raising PoolSaturated if the queue is full"""
+        with self._lock:
+            if self.max_queued is not None and self._stats["queued"] >= self.max_queued:
+                self._stats["rejected"] += 1
+                raise PoolSaturated(f"{self.name} pool is saturated ({self._stats['queued']} tasks waiting)")
+            self._stats["queued"] += 1
+            self._stats["max_queued_seen"] = max(self._stats["max_queued_seen"], self._stats["queued"])
+        submitted = time.perf_counter()
+
+        def task():
+            with self._lock:
+                self._stats["queued"] -= 1
+                self._stats["active"] += 1
+            if self.on_wait is not None:
+                self.on_wait(self.name, time.perf_counter() - submitted)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self._stats["errors"] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._stats["active"] -= 1
+                    self._stats["completed"] += 1
+            return result
+
+        try:
+            return self._executor.submit(task)
+        except Exception:
+            with self._lock:
+                self._stats["queued"] -= 1
+            raise
+
+    def call(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """Run fn on the pool and wait for it from a (non-pool) thread; raises TimeoutError after timeout seconds"""
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """Await fn on the pool from async code; raises asyncio.TimeoutError after timeout seconds"""
+        future = asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+        try:
+            # shield: on timeout stop waiting, but let the worker finish (threads cannot be cancelled)
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise
+
+    def get_stats(self) -> dict:
+        """Current load: busy workers, waiting tasks, saturation (busy / workers) and counters"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["name"] = self.name
+        stats["workers"] = self.max_workers
+        stats["saturation"] = round(stats["active"] / self.max_workers, 3) if self.max_workers else 0.0
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work and optionally wait for running tasks"""
+        self._executor.shutdown(wait=wait)
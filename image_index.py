@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Image integrity pre-flight for a review batch.
+
+``python image_index.py`` walks every ``image_path`` in the annotations CSV
+across all cores and checks that the file exists, is not empty and decodes,
+recording its dimensions, format and file size. The results go to a sidecar
+CSV (``<csv>.images.csv`` by default) with one row per image:
+
+    image_path,status,size_bytes,mtime_ns,width,height,format,full_decode,error
+
+Re-runs only stat images whose (mtime, size) is unchanged since the previous
+index and decode just the new or changed ones (plus those a ``--quick`` run
+only verified, when decoding in full).
+
+The app loads the sidecar through ``ImageIndexStore`` (reloaded when it
+changes) to flag broken rows and keep them out of the work queues, and to
+serve small originals as they are, all without touching the image files.
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+STATUS_OK = "ok"
+STATUS_MISSING = "missing"  # No such file
+STATUS_UNREADABLE = "unreadable"  # Exists but cannot be opened (permissions, I/O error)
+STATUS_EMPTY = "empty"  # Zero bytes
+STATUS_CORRUPT = "corrupt"  # Not a decodable image, or truncated
+STATUS_TOO_LARGE = "too_large"  # Refused by Pillow's decompression bomb limit
+BROKEN_STATUSES = (STATUS_MISSING, STATUS_UNREADABLE, STATUS_EMPTY, STATUS_CORRUPT, STATUS_TOO_LARGE)
+
+INDEX_COLUMNS = ["image_path", "status", "size_bytes", "mtime_ns", "width", "height", "format", "full_decode",
+                 "error"]
+
+
+def default_index_path(csv_path: str) -> str:
+    """Sidecar index path for an annotations CSV"""
+    return f"{csv_path}.images.csv"
+
+
+def check_image(image_path: str, full_decode: bool = True) -> dict:
+    """
+    Check one image (runs in a worker process).
+
+    Args:
+        image_path: Image to check
+        full_decode: Decode all pixel data, which catches truncated files;
+            otherwise only the header and structure are verified
+
+    Returns:
+        dict: One index row (INDEX_COLUMNS)
+    """
+    record = {"image_path": image_path, "status": STATUS_OK, "size_bytes": 0, "mtime_ns": 0,
+              "width": 0, "height": 0, "format": "", "full_decode": full_decode, "error": ""}
+    try:
+        stat = os.stat(image_path)
+    except FileNotFoundError:
+        record["status"] = STATUS_MISSING
+        return record
+    except OSError as e:
+        record.update(status=STATUS_UNREADABLE, error=str(e))
+        return record
+    record["size_bytes"] = stat.st_size
+    record["mtime_ns"] = stat.st_mtime_ns
+    if stat.st_size == 0:
+        record["status"] = STATUS_EMPTY
+        return record
+
+    try:
+        with Image.open(image_path) as img:
+            record.update(width=img.width, height=img.height, format=img.format or "")
+            if full_decode:
+                # JPEGs decode at 1/8 scale, which still reads every byte of the stream
+                img.draft("RGB", (1, 1))
+                img.load()
+            else:
+                img.verify()
+    except Image.DecompressionBombError as e:
+        record.update(status=STATUS_TOO_LARGE, error=str(e))
+    except PermissionError as e:
+        record.update(status=STATUS_UNREADABLE, error=str(e))
+    except Exception as e:
+        record.update(status=STATUS_CORRUPT, error=f"{type(e).__name__}: {e}")
+    return record
+
+
+def _check_chunk(args) -> List[Optional[dict]]:
+    """
+    Check a chunk of images (runs in a worker process).
+
+    Images whose (mtime_ns, size) matches the previous index are only stat'ed;
+    None is returned for them so the previous row is kept.
+    """
+    items, full_decode = args
+    results = []
+    for image_path, previous in items:
+        if previous is not None:
+            try:
+                stat = os.stat(image_path)
+            except OSError:
+                stat = None
+            if stat is not None and (stat.st_mtime_ns, stat.st_size) == previous:
+                results.append(None)
+                continue
+        results.append(check_image(image_path, full_decode))
+    return results
+
+
+def read_index(index_path: str) -> pd.DataFrame:
+    """Read a sidecar index, or an empty one if it does not exist"""
+    if not os.path.exists(index_path):
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    return pd.read_csv(index_path, dtype={"image_path": str, "status": str, "format": str, "error": str},
+                       keep_default_na=False)
+
+
+def write_index(index_path: str, df: pd.DataFrame):
+    """Atomically write a sidecar index"""
+    directory = os.path.dirname(os.path.abspath(index_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".csv")
+    try:
+        with os.fdopen(fd, "w") as f:
+            df.to_csv(f, columns=INDEX_COLUMNS, index=False)
+        os.replace(temp_path, index_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def build_image_index(csv_path: str, index_path: Optional[str] = None, full_decode: bool = True,
+                      rescan: bool = False, workers: Optional[int] = None, chunk_size: int = 64,
+                      progress_interval: float = 5.0) -> dict:
+    """
+    Check every image referenced by the annotations CSV and write the sidecar index.
+
+    Args:
+        csv_path: Annotations CSV with an image_path column
+        index_path: Sidecar index to write (default: <csv_path>.images.csv)
+        full_decode: Decode all pixel data (see check_image)
+        rescan: Re-check every image, even ones unchanged since the previous index
+        workers: Number of worker processes (default: CPU count)
+        chunk_size: Images per worker task
+        progress_interval: Seconds between progress lines
+
+    Returns:
+        dict: Counts per status plus checked (decoded this run), unchanged and elapsed seconds
+    """
+    index_path = index_path or default_index_path(csv_path)
+    image_paths = pd.read_csv(csv_path, usecols=["image_path"])["image_path"].dropna().unique().tolist()
+    previous_df = read_index(index_path) if not rescan else pd.DataFrame(columns=INDEX_COLUMNS)
+    previous_df = previous_df.drop_duplicates("image_path", keep="last").set_index("image_path", drop=False)
+    # Only healthy rows are reused (a broken image may have been fixed without changing its mtime),
+    # and a full decode does not trust rows a quick run only verified
+    reusable = previous_df["status"] == STATUS_OK
+    if full_decode:
+        reusable &= previous_df["full_decode"].astype(str) == "True"
+    signatures = {
+        image_path: (int(mtime_ns), int(size_bytes))
+        for image_path, mtime_ns, size_bytes in zip(previous_df["image_path"][reusable],
+                                                    previous_df["mtime_ns"][reusable],
+                                                    previous_df["size_bytes"][reusable])
+    }
+
+    total = len(image_paths)
+    items = [(image_path, signatures.get(image_path)) for image_path in image_paths]
+    tasks = [(items[i:i + chunk_size], full_decode) for i in range(0, total, chunk_size)]
+    counts = {status: 0 for status in (STATUS_OK,) + BROKEN_STATUSES}
+    counts.update(checked=0, unchanged=0)
+    records = []
+    unchanged = []
+    start = time.monotonic()
+    next_report = start + progress_interval
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for (chunk, _), results in zip(tasks, pool.map(_check_chunk, tasks)):
+            for (image_path, _), record in zip(chunk, results):
+                if record is None:
+                    # Only healthy rows are reused, so the previous row is "ok"
+                    unchanged.append(image_path)
+                    counts["unchanged"] += 1
+                    counts[STATUS_OK] += 1
+                else:
+                    records.append(record)
+                    counts["checked"] += 1
+                    counts[record["status"]] += 1
+            done += len(results)
+            now = time.monotonic()
+            if now >= next_report or done == total:
+                rate = done / max(now - start, 1e-9)
+                eta = (total - done) / rate if rate else 0
+                broken = sum(counts[status] for status in BROKEN_STATUSES)
+                print(f"{done}/{total} images ({done / total:.1%}), {rate:.1f} img/s, ETA {eta:.0f}s - "
+                      f"{counts['checked']} checked, {counts['unchanged']} unchanged, {broken} broken", flush=True)
+                next_report = now + progress_interval
+
+    index = pd.concat([previous_df.loc[unchanged, INDEX_COLUMNS], pd.DataFrame(records, columns=INDEX_COLUMNS)],
+                      ignore_index=True)
+    write_index(index_path, index)
+    counts["elapsed_seconds"] = round(time.monotonic() - start, 2)
+    return counts
+
+
+class ImageIndex:
+    """Lookups into one loaded sidecar index"""
+
+    def __init__(self, df: Optional[pd.DataFrame] = None):
+        df = df if df is not None else pd.DataFrame(columns=INDEX_COLUMNS)
+        df = df.drop_duplicates("image_path", keep="last").reset_index(drop=True)
+        # A pandas Index hashes millions of paths far more compactly than a dict
+        self._paths = pd.Index(df["image_path"].astype(str))
+        self._status = df["status"].astype(str).to_numpy()
+        self._broken = np.isin(self._status, BROKEN_STATUSES)
+        self._width = df["width"].fillna(0).astype(np.int64).to_numpy()
+        self._height = df["height"].fillna(0).astype(np.int64).to_numpy()
+        self._size_bytes = df["size_bytes"].fillna(0).astype(np.int64).to_numpy()
+        self._error = df["error"].astype(str).to_numpy()
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def get(self, image_path: str) -> Optional[dict]:
+        """Return {status, width, height, size_bytes, error} for an image, or None if it is not indexed"""
+        position = self._paths.get_indexer([image_path])[0]
+        if position < 0:
+            return None
+        return {
+            "status": self._status[position],
+            "width": int(self._width[position]),
+            "height": int(self._height[position]),
+            "size_bytes": int(self._size_bytes[position]),
+            "error": self._error[position],
+        }
+
+    def broken_mask(self, image_paths: Sequence[str]) -> np.ndarray:
+        """Boolean mask over image_paths of images known to be broken (unindexed images count as fine)"""
+        positions = self._paths.get_indexer(pd.Index(image_paths).astype(str))
+        mask = np.zeros(len(positions), dtype=bool)
+        found = positions >= 0
+        mask[found] = self._broken[positions[found]]
+        return mask
+
+    def status_counts(self) -> dict:
+        """Number of images per status"""
+        statuses, counts = np.unique(self._status, return_counts=True)
+        return {str(status): int(count) for status, count in zip(statuses, counts)}
+
+
+class ImageIndexStore:
+    """Holds the loaded sidecar index and swaps in a new one when the file changes"""
+
+    def __init__(self, index_path: str, check_interval: float = 2.0):
+        self.index_path = index_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature = ()  # Never matches a real signature, so the first get() loads
+        self._next_check = 0.0
+        self._index = ImageIndex()
+        self.get()
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        """Return (mtime_ns, size) of the index, or None if missing"""
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self) -> ImageIndex:
+        """Return the current index, reloading it if the file changed on disk"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._index
+
+        with self._lock:
+            if now < self._next_check:
+                return self._index
+            self._next_check = now + self.check_interval
+            signature = self._file_signature()
+            if signature == self._signature:
+                return self._index
+            if signature is None:
+                print(f"Warning: image index {self.index_path} not found; run image_index.py to create it.")
+                self._signature = None
+                return self._index
+            try:
+                index = ImageIndex(read_index(self.index_path))
+            except Exception as e:
+                print(f"Error loading image index {self.index_path}: {e}")
+                return self._index
+            if self._signature:
+                print(f"Reloaded image index from {self.index_path}")
+            self._signature = signature
+            self._index = index
+            return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that every image in an annotations CSV exists and decodes")
+    parser.add_argument("--csv", default="double_annotations_for_review.csv", help="Annotations CSV")
+    parser.add_argument("--index", default=None, help="Sidecar index to write (default: <csv>.images.csv)")
+    parser.add_argument("--quick", action="store_true",
+                        help="Verify headers and structure only instead of decoding every pixel")
+    parser.add_argument("--rescan", action="store_true", help="Re-check images unchanged since the previous index")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Images per worker task")
+    parser.add_argument("--show", type=int, default=20, help="Broken images to list at the end")
+    args = parser.parse_args()
+
+    index_path = args.index or default_index_path(args.csv)
+    print(f"Checking images in {args.csv} into {index_path}...")
+    result = build_image_index(args.csv, index_path, not args.quick, args.rescan, args.workers, args.chunk_size)
+    broken = {status: result[status] for status in BROKEN_STATUSES if result[status]}
+    print(f"Done in {result['elapsed_seconds']}s: {result[STATUS_OK]} ok, "
+          f"{', '.join(f'{n} {status}' for status, n in broken.items()) or 'none broken'} "
+          f"({result['checked']} checked, {result['unchanged']} unchanged)")
+    if broken and args.show:
+        index = read_index(index_path)
+        for _, row in index[index["status"].isin(BROKEN_STATUSES)].head(args.show).iterrows():
+            print(f"  {row['status']}: {row['image_path']} {row['error']}".rstrip())
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Offline multi-resolution image pyramid for a review batch.
+
+``python image_pyramid.py`` reads the annotations CSV and pre-generates
+WebP or JPEG renditions of every image at several sizes (longest side in
+pixels), across all cores. Each image is decoded once per run and every
+smaller size is scaled down from the previous one. Renditions are keyed by
+source path and mtime and written atomically, so an interrupted run can be
+restarted and only does the work that is left, and an edited image is
+regenerated.
+
+Images are never upscaled. Sizes at or above an image's own longest side
+collapse into a single full-resolution rendition stored under the smallest
+such size.
+
+The app uses ``ImagePyramid.get`` to serve the closest pre-generated size
+directly, falling back to the on-demand thumbnail cache for images the
+pyramid does not cover.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import pandas as pd
+from PIL import Image
+
+from thumbnails import compute_resized_size
+
+DEFAULT_SIZES = (320, 640, 1280, 2048)
+FORMAT_EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg"}
+MANIFEST_NAME = "pyramid.json"
+
+
+def rendition_relpath(image_path: str, mtime_ns: int, size: int, image_format: str) -> str:
+    """Path of one rendition relative to the pyramid directory"""
+    key = f"{os.path.abspath(image_path)}|{mtime_ns}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(str(size), digest[:2], digest + FORMAT_EXTENSIONS[image_format])
+
+
+def get_target_sizes(width: int, height: int, sizes: Sequence[int]) -> List[Tuple[int, int]]:
+    """
+    Sizes to generate for an image, largest first.
+
+    Returns:
+        list: (configured size, actual longest side) pairs; the full-resolution
+            rendition is stored under the smallest size that would upscale
+    """
+    longest = max(width, height)
+    targets = [(size, size) for size in sorted(sizes) if size < longest]
+    larger = [size for size in sorted(sizes) if size >= longest]
+    if larger:
+        targets.append((larger[0], longest))
+    return targets[::-1]
+
+
+def _save_atomic(img: Image.Image, path: str, image_format: str, quality: int):
+    """Write an image to a temp file next to path, then rename it into place"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if image_format == "jpeg":
+                img.convert("RGB").save(f, format="JPEG", quality=quality, optimize=True)
+            else:
+                if img.mode not in ("RGB", "RGBA"):
+                    img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+                img.save(f, format="WEBP", quality=quality, method=4)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def generate_renditions(image_path: str, pyramid_dir: str, sizes: Sequence[int], image_format: str = "webp",
+                        quality: int = 80) -> Tuple[str, int]:
+    """
+    Generate the missing renditions of one image (runs in a worker process).
+
+    Returns:
+        tuple: (status, renditions written) where status is "generated",
+            "skipped" (all renditions already exist), "missing" or "error"
+    """
+    try:
+        mtime_ns = os.stat(image_path).st_mtime_ns
+    except OSError:
+        return "missing", 0
+
+    try:
+        with Image.open(image_path) as img:
+            targets = get_target_sizes(img.width, img.height, sizes)
+            paths = {size: os.path.join(pyramid_dir, rendition_relpath(image_path, mtime_ns, size, image_format))
+                     for size, _ in targets}
+            todo = [(size, longest) for size, longest in targets if not os.path.exists(paths[size])]
+            if not todo:
+                return "skipped", 0
+
+            # Let the JPEG decoder downscale by a power of two while decoding
+            largest = todo[0][1]
+            img.draft("RGB", compute_resized_size(img.width, img.height, largest))
+            current = img.copy() if img.mode != "P" else img.convert("RGBA")
+
+        written = 0
+        for size, longest in todo:
+            new_size = compute_resized_size(current.width, current.height, longest)
+            if new_size != current.size:
+                current = current.resize(new_size, Image.Resampling.LANCZOS)
+            _save_atomic(current, paths[size], image_format, quality)
+            written += 1
+        return "generated", written
+    except Exception as e:
+        print(f"Error generating renditions for {image_path}: {e}")
+        return "error", 0
+
+
+def _generate_chunk(args) -> List[Tuple[str, int]]:
+    """Process a chunk of images (runs in a worker process)"""
+    image_paths, pyramid_dir, sizes, image_format, quality = args
+    return [generate_renditions(path, pyramid_dir, sizes, image_format, quality) for path in image_paths]
+
+
+def write_pyramid_manifest(pyramid_dir: str, sizes: Sequence[int], image_format: str):
+    """Record the sizes and format of a pyramid so the app knows what to look for"""
+    os.makedirs(pyramid_dir, exist_ok=True)
+    manifest_path = os.path.join(pyramid_dir, MANIFEST_NAME)
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"sizes": sorted(sizes), "format": image_format}, f)
+    os.replace(temp_path, manifest_path)
+
+
+def build_pyramid(csv_path: str, pyramid_dir: str, sizes: Sequence[int] = DEFAULT_SIZES,
+                  image_format: str = "webp", quality: int = 80, workers: Optional[int] = None,
+                  chunk_size: int = 64, progress_interval: float = 5.0) -> dict:
+    """
+    Pre-generate renditions for every image referenced by the annotations CSV.
+
+    Args:
+        csv_path: Annotations CSV with an image_path column
+        pyramid_dir: Output directory for renditions
+        sizes: Longest-side sizes to generate
+        image_format: "webp" or "jpeg"
+        quality: Encoder quality (1-100)
+        workers: Number of worker processes (default: CPU count)
+        chunk_size: Images per worker task
+        progress_interval: Seconds between progress lines
+
+    Returns:
+        dict: Counts per status plus renditions written and elapsed seconds
+    """
+    if image_format not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Unknown image format: {image_format}")
+    image_paths = pd.read_csv(csv_path, usecols=["image_path"])["image_path"].dropna().unique().tolist()
+    write_pyramid_manifest(pyramid_dir, sizes, image_format)
+
+    total = len(image_paths)
+    counts = {"generated": 0, "skipped": 0, "missing": 0, "error": 0, "renditions": 0}
+    tasks = [(image_paths[i:i + chunk_size], pyramid_dir, list(sizes), image_format, quality)
+             for i in range(0, total, chunk_size)]
+    start = time.monotonic()
+    next_report = start + progress_interval
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(_generate_chunk, tasks):
+            for status, written in results:
+                counts[status] += 1
+                counts["renditions"] += written
+            done += len(results)
+            now = time.monotonic()
+            if now >= next_report or done == total:
+                rate = done / max(now - start, 1e-9)
+                eta = (total - done) / rate if rate else 0
+                print(f"{done}/{total} images ({done / total:.1%}), {rate:.1f} img/s, "
+                      f"ETA {eta:.0f}s - {counts['generated']} generated, {counts['skipped']} already done, "
+                      f"{counts['missing']} missing, {counts['error']} errors", flush=True)
+                next_report = now + progress_interval
+    counts["elapsed_seconds"] = round(time.monotonic() - start, 2)
+    return counts
+
+
+class ImagePyramid:
+    """Looks up the closest pre-generated rendition of an image"""
+
+    def __init__(self, pyramid_dir: str):
+        self.pyramid_dir = pyramid_dir
+        self.sizes = []
+        self.image_format = "webp"
+        try:
+            with open(os.path.join(pyramid_dir, MANIFEST_NAME), "r") as f:
+                manifest = json.load(f)
+            self.sizes = sorted(int(size) for size in manifest["sizes"])
+            self.image_format = manifest.get("format", "webp")
+        except FileNotFoundError:
+            print(f"Warning: no image pyramid found in {pyramid_dir}; images are resized on demand.")
+        except Exception as e:
+            print(f"Error reading image pyramid manifest in {pyramid_dir}: {e}")
+
+    def get(self, image_path: str, max_size: int = 640) -> Optional[str]:
+        """
+        Return the rendition closest to max_size, or None if there is none.
+
+        The smallest rendition at least max_size wins; otherwise the largest
+        smaller one (e.g. the full-resolution rendition of a small image).
+        """
+        if not self.sizes:
+            return None
+        try:
+            mtime_ns = os.stat(image_path).st_mtime_ns
+        except OSError:
+            return None
+        larger = [size for size in self.sizes if size >= max_size]
+        smaller = [size for size in self.sizes if size < max_size][::-1]
+        for size in larger + smaller:
+            path = os.path.join(self.pyramid_dir, rendition_relpath(image_path, mtime_ns, size, self.image_format))
+            if os.path.exists(path):
+                return path
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate multi-resolution renditions of review images")
+    parser.add_argument("--csv", default="double_annotations_for_review.csv", help="Annotations CSV")
+    parser.add_argument("--pyramid-dir", default="./image_pyramid", help="Output directory for renditions")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated longest-side sizes in pixels")
+    parser.add_argument("--format", choices=sorted(FORMAT_EXTENSIONS), default="webp", help="Rendition format")
+    parser.add_argument("--quality", type=int, default=80, help="Encoder quality (1-100)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Images per worker task")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    print(f"Generating {args.format} renditions at {sizes} into {args.pyramid_dir}...")
+    result = build_pyramid(args.csv, args.pyramid_dir, sizes, args.format, args.quality, args.workers,
+                           args.chunk_size)
+    print(f"Done in {result['elapsed_seconds']}s: {result['generated']} images processed "
+          f"({result['renditions']} renditions), {result['skipped']} already complete, "
+          f"{result['missing']} missing, {result['error']} errors")
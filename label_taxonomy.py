@@ -0,0 +1,259 @@
+"""
+Column-wise label parsing and normalization against ``assets/labels.json``.
+
+Label columns in the annotation CSV hold Python-list-like strings such as
+``['Fall_armyworm']``. They are parsed once per CSV load with vectorized
+pandas string ops, normalized case-insensitively (plus optional aliases) to
+integer label ids, and packed into a compact multi-hot bit matrix so
+agreement checks, filtering and counts run as NumPy ops.
+
+``TaxonomyStore`` keeps a compiled, lookup-ready view of labels.json and
+swaps in a new one when the file changes on disk, so taxonomy edits do not
+need a server restart.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_label_key(label: str) -> str:
+    """Normalization key for a label name: case-, whitespace- and hyphen-insensitive"""
+    return "_".join(label.strip().lower().replace("-", " ").split())
+
+
+def normalize_label_keys(labels: pd.Series) -> pd.Series:
+    """Vectorized normalize_label_key over a Series of label names"""
+    return labels.str.strip().str.lower().str.replace("-", " ", regex=False).str.split().str.join("_")
+
+
+def split_label_column(labels: pd.Series) -> pd.Series:
+    """
+    Explode a column of label strings into one label per entry.
+
+    The result is indexed by row position (0..n-1), with the same cleaning
+    rules as ``parse_labels``: outer brackets/quotes stripped, comma split,
+    per-label whitespace and quotes stripped, empties dropped.
+    """
+    text = pd.Series(labels.to_numpy(), dtype="object")
+    text = text.where(text.map(lambda value: isinstance(value, str)))
+    tokens = text.str.strip("[]'\"").str.split(",").explode()
+    tokens = tokens.str.strip().str.strip("'\"")
+    return tokens[tokens.notna() & (tokens != "")]
+
+
+def parse_label_column(labels: pd.Series) -> List[List[str]]:
+    """Parse a whole label column into per-row label lists in one vectorized pass"""
+    tokens = split_label_column(labels)
+    parsed = [[] for _ in range(len(labels))]
+    for row, label in zip(tokens.index, tokens.to_numpy()):
+        parsed[row].append(label)
+    return parsed
+
+
+class LabelNormalizer:
+    """Maps label names to integer ids, case-insensitively and through aliases"""
+
+    def __init__(self, labels: dict, aliases: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            labels: Crop labels as loaded from labels.json ({crop: {id: name}})
+            aliases: Optional {alias: canonical label name} mapping
+        """
+        self.names = []  # label id -> canonical name
+        self.id_by_key = {}
+        for issues in labels.values():
+            for name in issues.values():
+                self._add(name)
+        self.known_count = len(self.names)
+        for alias, target in (aliases or {}).items():
+            target_id = self.id_by_key.get(normalize_label_key(target))
+            if target_id is None:
+                target_id = self._add(target)
+            self.id_by_key[normalize_label_key(alias)] = target_id
+
+    def _add(self, name: str) -> int:
+        """Register a label name and return its id"""
+        key = normalize_label_key(name)
+        label_id = self.id_by_key.get(key)
+        if label_id is None:
+            label_id = len(self.names)
+            self.names.append(name)
+            self.id_by_key[key] = label_id
+        return label_id
+
+    def copy(self) -> "LabelNormalizer":
+        """Independent copy that unknown labels can be registered on without touching this one"""
+        clone = LabelNormalizer.__new__(LabelNormalizer)
+        clone.names = list(self.names)
+        clone.id_by_key = dict(self.id_by_key)
+        clone.known_count = self.known_count
+        return clone
+
+    def encode(self, tokens: pd.Series) -> np.ndarray:
+        """
+        Map a Series of label names to ids; labels missing from labels.json get new ids.
+
+        New ids are registered on this normalizer, so only call it on a private
+        copy (see encode_label_columns), never on a shared taxonomy's normalizer.
+        """
+        keys = normalize_label_keys(tokens)
+        missing = ~keys.isin(self.id_by_key.keys())
+        if missing.any():
+            for name in tokens[missing].drop_duplicates().to_numpy():
+                self._add(name)
+        return keys.map(self.id_by_key).to_numpy(dtype=np.int64)
+
+    @property
+    def unknown_labels(self) -> List[str]:
+        """Labels registered beyond labels.json: alias targets, and labels seen by encode on this copy"""
+        return self.names[self.known_count:]
+
+
+class LabelMatrix:
+    """Compact multi-hot label matrix: one bit per (row, label id), packed 8 per byte"""
+
+    def __init__(self, packed: np.ndarray, n_labels: int):
+        self.packed = packed
+        self.n_labels = n_labels
+
+    @classmethod
+    def from_ids(cls, rows: np.ndarray, label_ids: np.ndarray, n_rows: int, n_labels: int) -> "LabelMatrix":
+        """Build from parallel arrays of row positions and label ids"""
+        packed = np.zeros((n_rows, max((n_labels + 7) // 8, 1)), dtype=np.uint8)
+        bits = (np.uint8(0x80) >> (label_ids & 7).astype(np.uint8)).astype(np.uint8)
+        np.bitwise_or.at(packed, (rows, label_ids >> 3), bits)
+        return cls(packed, n_labels)
+
+    def has_label(self, label_id: int) -> np.ndarray:
+        """Boolean mask of rows carrying a label"""
+        return ((self.packed[:, label_id >> 3] >> (7 - (label_id & 7))) & 1).astype(bool)
+
+    def equals(self, other: "LabelMatrix") -> np.ndarray:
+        """Boolean mask of rows whose label sets are identical in both matrices"""
+        return (self.packed == other.packed).all(axis=1)
+
+    def is_empty(self) -> np.ndarray:
+        """Boolean mask of rows with no labels"""
+        return ~self.packed.any(axis=1)
+
+    def label_counts(self) -> np.ndarray:
+        """Number of rows carrying each label id"""
+        return np.unpackbits(self.packed, axis=1)[:, :self.n_labels].sum(axis=0)
+
+
+def encode_label_columns(columns: List[pd.Series], normalizer: LabelNormalizer) -> List[LabelMatrix]:
+    """
+    Encode several label columns into LabelMatrix objects sharing one id space.
+
+    Labels missing from the taxonomy get ids in a private copy of the
+    normalizer, so the shared one is never modified and concurrent callers
+    cannot hand out the same id twice.
+    """
+    normalizer = normalizer.copy()
+    exploded = [split_label_column(column) for column in columns]
+    encoded = [(tokens.index.to_numpy(dtype=np.int64), normalizer.encode(tokens)) for tokens in exploded]
+    # Width is fixed only after every column has registered its unknown labels
+    n_labels = len(normalizer.names)
+    return [
+        LabelMatrix.from_ids(rows, ids, len(column), n_labels)
+        for column, (rows, ids) in zip(columns, encoded)
+    ]
+
+
+class CompiledTaxonomy:
+    """Immutable, precomputed view of labels.json for O(1) lookups"""
+
+    def __init__(self, labels: dict, aliases: Optional[Dict[str, str]] = None):
+        self.labels = labels
+        self.crop_names = list(labels.keys())
+        self.issue_names_by_crop = {crop: list(issues.values()) for crop, issues in labels.items()}
+        self.issue_id_by_name = {
+            crop: {name: issue_id for issue_id, name in issues.items()} for crop, issues in labels.items()
+        }
+        # Normalized (crop, label) pairs, for validating reviewer input
+        self.valid_issues = {
+            (crop.lower(), normalize_label_key(name)) for crop, issues in labels.items() for name in issues.values()
+        }
+        self.normalizer = LabelNormalizer(labels, aliases)
+
+    def get_issue_names(self, crop_name: str) -> List[str]:
+        """Issue names for a crop (shared list; do not mutate)"""
+        return self.issue_names_by_crop.get(crop_name, [])
+
+    def get_issue_name_by_id(self, crop_name: str, issue_id: str) -> str:
+        """Issue name for a crop and issue id, or empty string"""
+        return self.labels.get(crop_name, {}).get(issue_id, "")
+
+    def get_issue_id(self, crop_name: str, issue_name: str) -> Optional[str]:
+        """Issue id for a crop and exact issue name, or None"""
+        return self.issue_id_by_name.get(crop_name, {}).get(issue_name)
+
+    def is_valid_issue(self, crop_name: str, issue_name: str) -> bool:
+        """Whether an issue belongs to a crop (case-insensitive, aliases resolved)"""
+        key = normalize_label_key(issue_name)
+        label_id = self.normalizer.id_by_key.get(key)
+        if label_id is not None and label_id < self.normalizer.known_count:
+            key = normalize_label_key(self.normalizer.names[label_id])
+        return (crop_name.lower(), key) in self.valid_issues
+
+
+class TaxonomyStore:
+    """Holds the compiled taxonomy and atomically swaps in a new one when labels.json changes"""
+
+    def __init__(self, labels_path: str, aliases: Optional[Dict[str, str]] = None, check_interval: float = 2.0):
+        self.labels_path = labels_path
+        self.aliases = aliases
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature = ()  # Never matches a real signature, so the first get() loads
+        self._next_check = 0.0
+        self._taxonomy = CompiledTaxonomy({}, aliases)
+        self.get()
+
+    def _file_signature(self):
+        """Return (mtime_ns, size) of labels.json, or None if missing"""
+        try:
+            stat = os.stat(self.labels_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self) -> CompiledTaxonomy:
+        """Return the current taxonomy, reloading it if labels.json changed on disk"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._taxonomy
+
+        with self._lock:
+            if now < self._next_check:
+                return self._taxonomy
+            self._next_check = now + self.check_interval
+            signature = self._file_signature()
+            if signature == self._signature:
+                return self._taxonomy
+            if signature is None:
+                print(f"Warning: {self.labels_path} not found.")
+                self._signature = None
+                return self._taxonomy
+            try:
+                with open(self.labels_path, 'r') as f:
+                    labels = json.load(f)
+                taxonomy = CompiledTaxonomy(labels, self.aliases)
+            except json.JSONDecodeError as e:
+                # Keep serving the previous taxonomy (e.g. file is mid-edit)
+                print(f"Error parsing {self.labels_path}: {e}")
+                return self._taxonomy
+            except Exception as e:
+                print(f"Error loading labels: {e}")
+                return self._taxonomy
+            if self._signature:
+                print(f"Reloaded labels from {self.labels_path}")
+            self._signature = signature
+            self._taxonomy = taxonomy
+            return taxonomy
@@ -0,0 +1,216 @@
+"""
+Lightweight in-process metrics with Prometheus text-format export.
+
+``METRICS.timed`` wraps a function in a latency histogram (plus an exception
+counter); ``record_user_event`` keeps per-user counters and a rolling
+reviews-per-hour rate. When the registry is disabled every hook returns after
+a single attribute check, so instrumentation can stay in the hot path.
+
+``start_metrics_server`` serves ``/metrics`` from a daemon thread, bound to
+localhost by default. Short-lived scripts can use ``write_textfile`` instead.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Latency buckets in seconds, from cache hits to slow NFS reads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+USER_EVENTS_METRIC = "review_app_user_events_total"
+REVIEWS_PER_HOUR_METRIC = "review_app_user_reviews_per_hour"
+
+# (metric name, help, type, {label tuple: value}) returned by collectors at scrape time
+Sample = Tuple[str, str, str, Dict[Tuple[Tuple[str, str], ...], float]]
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Histogram:
+    """Cumulative-bucket histogram for one label set"""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * n_buckets
+        self.total = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """Thread-safe histograms and counters, rendered in Prometheus text format"""
+
+    def __init__(self, enabled: bool = False, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms = {}  # metric -> {labels: _Histogram}
+        self._counters = {}  # metric -> {labels: value}
+        self._help = {}  # metric -> help text
+        self._review_times = {}  # username -> deque of save timestamps in the last hour
+        self._collectors = []
+
+    def describe(self, metric: str, help_text: str):
+        """Set the HELP text of a metric"""
+        self._help[metric] = help_text
+
+    def observe(self, metric: str, labels: Tuple[Tuple[str, str], ...], value: float):
+        """Add one observation to a histogram"""
+        if not self.enabled:
+            return
+        with self._lock:
+            series = self._histograms.setdefault(metric, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = _Histogram(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram.counts[i] += 1
+                    break
+            histogram.total += value
+            histogram.count += 1
+
+    def inc(self, metric: str, labels: Tuple[Tuple[str, str], ...] = (), amount: float = 1):
+        """Increment a counter"""
+        if not self.enabled:
+            return
+        with self._lock:
+            series = self._counters.setdefault(metric, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def timed(self, metric: str, **labels) -> Callable:
+        """
+        Decorator recording a function's latency in ``<metric>_seconds`` and
+        exceptions raised in ``<metric>_exceptions_total``.
+        """
+        label_items = tuple(sorted(labels.items()))
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    self.inc(f"{metric}_exceptions_total", label_items)
+                    raise
+                finally:
+                    self.observe(f"{metric}_seconds", label_items, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def record_user_event(self, username: str, event: str):
+        """Count a per-user event (e.g. save, save_rejected, error); saves also feed reviews/hour"""
+        if not self.enabled:
+            return
+        self.inc(USER_EVENTS_METRIC, (("event", event), ("user", username or "")))
+        if event == "save":
+            now = time.time()
+            with self._lock:
+                times = self._review_times.setdefault(username or "", deque())
+                times.append(now)
+                while times and times[0] < now - 3600:
+                    times.popleft()
+
+    def add_collector(self, collector: Callable[[], List[Sample]]):
+        """Register a callback returning extra samples (e.g. cache stats) at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render every metric in Prometheus text exposition format"""
+        lines = []
+        cutoff = time.time() - 3600
+        with self._lock:
+            for metric, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {metric} {self._help.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} "
+                                     f"{cumulative}")
+                    lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.total}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+            for metric, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {metric} {self._help.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+            if self._review_times:
+                lines.append(f"# HELP {REVIEWS_PER_HOUR_METRIC} Reviews saved in the last hour")
+                lines.append(f"# TYPE {REVIEWS_PER_HOUR_METRIC} gauge")
+                for username, times in sorted(self._review_times.items()):
+                    while times and times[0] < cutoff:
+                        times.popleft()
+                    lines.append(f"{REVIEWS_PER_HOUR_METRIC}{_format_labels((('user', username),))} {len(times)}")
+
+        for collector in self._collectors:
+            try:
+                samples = collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+                continue
+            for metric, help_text, metric_type, values in samples:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} {metric_type}")
+                for labels, value in values.items():
+                    lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Write the rendered metrics to a file (e.g. for node_exporter's textfile collector)"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+
+def start_metrics_server(registry: MetricsRegistry, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve registry.render() at http://host:port/metrics from a daemon thread"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Keep scrapes out of the app log
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+# Shared registry; the app and combine_reviews enable it from their config / CLI
+METRICS = MetricsRegistry()
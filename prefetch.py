@@ -0,0 +1,157 @@
+"""
+Background prefetching of neighbouring annotations.
+
+Whenever a session is served an index, the next N (and previous M) indices
+are warmed on a small bounded thread pool. Work is deduplicated across
+sessions, and queued work is dropped once every session that asked for it
+has moved somewhere else.
+
+Warm-ups are remembered by key (e.g. CSV version and image path rather than
+the row number, so a reloaded CSV does not look warm) and are consumed by the
+access they were made for, so the hit rate only counts views that really
+found prefetched data.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Optional
+
+
+class Prefetcher:
+    """Bounded, session-aware prefetcher with hit-rate metrics"""
+
+    def __init__(self, warm_fn: Callable[[int], None], ahead: int = 3, behind: int = 1,
+                 max_workers: int = 4, max_pending: int = 64, max_warmed: int = 4096,
+                 key_fn: Optional[Callable[[int], Hashable]] = None, max_age: Optional[float] = None):
+        """
+        Args:
+            warm_fn: Warms one index
+            ahead: Next indices to warm after each access
+            behind: Previous indices to warm after each access
+            max_workers: Warm-up threads
+            max_pending: Queued warm-ups beyond which new ones are skipped
+            max_warmed: Warm-ups remembered for hit accounting
+            key_fn: Maps an index to what warming it covers (default: the index itself)
+            max_age: Seconds a warm-up stays useful (None: until consumed or evicted)
+        """
+        self.warm_fn = warm_fn
+        self.ahead = ahead
+        self.behind = behind
+        self.max_pending = max_pending
+        self.max_warmed = max_warmed
+        self.key_fn = key_fn or (lambda index: index)
+        self.max_age = max_age
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._generations = {}  # session_token -> generation of its latest request
+        self._pending = {}  # index -> {session_token: generation} of sessions wanting it
+        self._warmed = OrderedDict()  # key -> monotonic time it was warmed, oldest first
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "scheduled": 0,
+            "deduplicated": 0,
+            "dropped": 0,
+            "skipped_full": 0,
+            "completed": 0,
+            "errors": 0,
+        }
+
+    def _is_fresh(self, key: Hashable, now: float) -> bool:
+        """Whether key was warmed and has not expired (caller holds the lock)"""
+        warmed_at = self._warmed.get(key)
+        return warmed_at is not None and (self.max_age is None or now - warmed_at < self.max_age)
+
+    def record_access(self, index: int) -> bool:
+        """Record that an index is being served, consuming its warm-up; return True if it was prefetched"""
+        key = self.key_fn(index)
+        with self._lock:
+            hit = self._is_fresh(key, time.monotonic())
+            # The view uses up what was prefetched; a revisit has to be warmed again
+            self._warmed.pop(key, None)
+            self._stats["hits" if hit else "misses"] += 1
+            return hit
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Forget a warm-up (or all of them) whose data changed before it was used"""
+        with self._lock:
+            if key is None:
+                self._warmed.clear()
+            else:
+                self._warmed.pop(key, None)
+
+    def schedule(self, session_token: str, index: int, total: int):
+        """Queue warm-up of the neighbours of index for a session"""
+        targets = [index + offset for offset in range(1, self.ahead + 1)]
+        targets += [index - offset for offset in range(1, self.behind + 1)]
+        keys = {target: self.key_fn(target) for target in targets if 0 <= target < total}
+
+        with self._lock:
+            # A new request supersedes anything this session queued earlier
+            generation = self._generations.get(session_token, 0) + 1
+            self._generations[session_token] = generation
+
+            now = time.monotonic()
+            for target, key in keys.items():
+                if self._is_fresh(key, now):
+                    continue
+                if target in self._pending:
+                    self._pending[target][session_token] = generation
+                    self._stats["deduplicated"] += 1
+                    continue
+                if len(self._pending) >= self.max_pending:
+                    self._stats["skipped_full"] += 1
+                    continue
+                self._pending[target] = {session_token: generation}
+                self._stats["scheduled"] += 1
+                self._executor.submit(self._run, target)
+
+    def _run(self, index: int):
+        """Warm a single index unless every session that wanted it has moved on"""
+        with self._lock:
+            requesters = self._pending.get(index, {})
+            wanted = any(self._generations.get(token) == generation
+                         for token, generation in requesters.items())
+            if not wanted:
+                self._pending.pop(index, None)
+                self._stats["dropped"] += 1
+                return
+
+        try:
+            # Keyed before warming: a CSV reload meanwhile can only cost a miss, never a false hit
+            key = self.key_fn(index)
+            self.warm_fn(index)
+        except Exception as e:
+            print(f"Error prefetching annotation {index}: {e}")
+            with self._lock:
+                self._pending.pop(index, None)
+                self._stats["errors"] += 1
+            return
+
+        with self._lock:
+            self._pending.pop(index, None)
+            self._warmed[key] = time.monotonic()
+            self._warmed.move_to_end(key)
+            while len(self._warmed) > self.max_warmed:
+                self._warmed.popitem(last=False)
+            self._stats["completed"] += 1
+
+    def forget_session(self, session_token: str):
+        """Drop a session so its queued work is discarded"""
+        with self._lock:
+            self._generations.pop(session_token, None)
+
+    def get_stats(self) -> dict:
+        """Return prefetch counters and the hit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        accesses = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / accesses if accesses else 0.0
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work and optionally wait for queued warm-ups to finish"""
+        self._executor.shutdown(wait=wait)
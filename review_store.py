@@ -0,0 +1,1115 @@
+#!/usr/bin/env python3
+"""
+Pluggable storage backends for reviewed annotations.
+
+- ``JsonDirectoryReviewBackend``: one JSON file per image in the output
+  directory, either flat (the original layout) or sharded into two levels of
+  hashed prefix directories (``ab/cd/<file>.json``) so no single directory
+  grows to hundreds of thousands of entries. Reads work against either
+  layout, including a directory that is partway through a migration.
+- ``SQLiteReviewBackend``: a single WAL-mode SQLite database indexed by
+  image_path and reviewer, so lookups are O(log n) instead of a stat + open +
+  json.load per image. It can optionally keep emitting the per-image JSON
+  files for tools that still read the output directory.
+- ``ReviewLogBackend``: an append-only, line-delimited log of every review
+  submission, so earlier decisions are kept for audits. Latest versions are
+  served from an in-memory index over the log and a periodically compacted
+  snapshot. It can also keep emitting the per-image JSON files.
+- ``WriteBehindReviewBackend``: wraps any backend, acknowledging saves
+  immediately and group-committing queued reviews from a background thread.
+
+``iter_reviews_window`` lets exports read only the reviews of a time range or
+reviewer: the JSON backend skips files last modified before the window
+without opening them, and SQLite answers from its timestamp and reviewer
+indexes.
+
+Run ``python review_store.py import`` to load an existing JSON directory into
+a SQLite database, ``python review_store.py migrate`` to move a JSON
+directory between the flat and sharded layouts, and ``python review_store.py
+compact`` to compact a review log.
+"""
+
+import argparse
+import contextlib
+import fcntl
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff')
+
+DURABILITY_SYNC = "sync"  # Write each review before acknowledging the save
+DURABILITY_GROUP = "group"  # Acknowledge immediately, write in batches from a background thread
+
+LAYOUT_FLAT = "flat"  # <output_dir>/<file>.json
+LAYOUT_SHARDED = "sharded"  # <output_dir>/ab/cd/<file>.json, ab/cd from the sha1 of the filename
+LAYOUTS = (LAYOUT_FLAT, LAYOUT_SHARDED)
+LAYOUT_MARKER = ".review_layout"  # Records the layout once a directory is fully in it
+# Review files written this long before a window starts are still read, for clock skew between
+# the app host and the file server that sets the mtime
+MTIME_SLACK_SECONDS = 300
+
+
+@functools.lru_cache(maxsize=1 << 18)
+def get_image_filename_from_path(image_path: str) -> str:
+    """Convert image path to the review JSON filename"""
+    safe_filename = image_path.replace("/", "_").replace("\\", "_")
+    if safe_filename.endswith(IMAGE_EXTENSIONS):
+        safe_filename = safe_filename.rsplit('.', 1)[0]
+    return f"{safe_filename}.json"
+
+
+def get_disambiguated_filename(image_path: str) -> str:
+    """Review filename for an image whose plain filename collides with another image"""
+    digest = hashlib.sha1(image_path.encode("utf-8")).hexdigest()[:8]
+    return f"{get_image_filename_from_path(image_path)[:-len('.json')]}__{digest}.json"
+
+
+def get_shard_dir(json_filename: str) -> str:
+    """Relative two-level shard directory for a review filename"""
+    digest = hashlib.sha1(json_filename.encode("utf-8")).hexdigest()
+    return os.path.join(digest[:2], digest[2:4])
+
+
+def get_review_relpath(json_filename: str, layout: str) -> str:
+    """Path of a review file relative to the output directory in the given layout"""
+    if layout == LAYOUT_SHARDED:
+        return os.path.join(get_shard_dir(json_filename), json_filename)
+    return json_filename
+
+
+def _is_shard_name(name: str) -> bool:
+    return len(name) == 2 and all(c in "0123456789abcdef" for c in name)
+
+
+def iter_review_files(output_dir: str) -> Iterator[os.DirEntry]:
+    """Yield a DirEntry for every review file in output_dir, in either layout"""
+    try:
+        top = os.scandir(output_dir)
+    except FileNotFoundError:
+        return
+    with top:
+        for entry in top:
+            # Hidden files are the layout marker and in-progress atomic writes
+            if entry.name.startswith('.'):
+                continue
+            if entry.name.endswith('.json'):
+                if entry.is_file():
+                    yield entry
+            elif _is_shard_name(entry.name) and entry.is_dir():
+                with os.scandir(entry.path) as level1:
+                    for shard in level1:
+                        if not (_is_shard_name(shard.name) and shard.is_dir()):
+                            continue
+                        with os.scandir(shard.path) as level2:
+                            for review_file in level2:
+                                if (review_file.name.endswith('.json') and not review_file.name.startswith('.')
+                                        and review_file.is_file()):
+                                    yield review_file
+
+
+def read_layout_marker(output_dir: str) -> Optional[str]:
+    """Layout recorded for output_dir, or None if the directory is unmarked"""
+    try:
+        with open(os.path.join(output_dir, LAYOUT_MARKER), 'r') as f:
+            layout = f.read().strip()
+    except OSError:
+        return None
+    return layout if layout in LAYOUTS else None
+
+
+def write_layout_marker(output_dir: str, layout: str):
+    """Record that every review file in output_dir is in the given layout"""
+    with open(os.path.join(output_dir, LAYOUT_MARKER), 'w') as f:
+        f.write(layout + "\n")
+
+
+class ReviewBackend:
+    """Interface implemented by every review storage backend"""
+
+    def get_review(self, image_path: str) -> Optional[dict]:
+        """Return the stored review for an image, or None if not reviewed"""
+        raise NotImplementedError
+
+    def save_review(self, review_data: dict) -> str:
+        """Persist a review and return the review filename it maps to"""
+        raise NotImplementedError
+
+    def save_reviews(self, reviews: Iterable[dict]) -> int:
+        """Persist many reviews and return how many were written"""
+        count = 0
+        for review_data in reviews:
+            self.save_review(review_data)
+            count += 1
+        return count
+
+    def save_new_reviews(self, reviews: Iterable[dict]) -> List[dict]:
+        """
+        Persist reviews only for images that have no review yet and return the ones written.
+
+        Existence is checked per image at write time, so a review saved by
+        someone else after the caller scanned the store is never overwritten.
+        """
+        reviews = [review_data for review_data in reviews if self.get_review(review_data["image_path"]) is None]
+        self.save_reviews(reviews)
+        return reviews
+
+    def iter_reviews(self) -> Iterator[Tuple[str, dict]]:
+        """Yield (review filename, review data) for every stored review"""
+        raise NotImplementedError
+
+    def iter_reviews_window(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                            reviewers: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, dict]]:
+        """
+        Yield (review filename, review data) for reviews that may fall in a window.
+
+        Backends skip what they can rule out cheaply; the result can still
+        contain reviews outside [since, until], so callers check
+        review_timestamp themselves. Only reviews by ``reviewers`` are
+        yielded, if given.
+        """
+        reviewers = set(reviewers) if reviewers is not None else None
+        for json_filename, review_data in self.iter_reviews():
+            if reviewers is None or review_data.get("reviewer_username", "") in reviewers:
+                yield json_filename, review_data
+
+    def iter_reviewed_images(self) -> Iterator[Tuple[str, str]]:
+        """Yield (image_path, reviewer_username) for every stored review"""
+        for _, review_data in self.iter_reviews():
+            yield review_data.get("image_path", ""), review_data.get("reviewer_username", "")
+
+    def count_reviews(self) -> int:
+        """Return the number of stored reviews"""
+        return sum(1 for _ in self.iter_reviews())
+
+    def close(self):
+        """Release any resources held by the backend"""
+
+
+class JsonDirectoryReviewBackend(ReviewBackend):
+    """One JSON file per reviewed image, in a flat or sharded output directory"""
+
+    def __init__(self, output_dir: str, filename_fn: Optional[Callable[[str], str]] = None,
+                 layout: Optional[str] = None):
+        """
+        Args:
+            output_dir: Directory holding the review files
+            filename_fn: Maps an image path to its review filename
+            layout: LAYOUT_FLAT or LAYOUT_SHARDED for new writes; defaults to
+                the layout recorded in the directory, else flat
+        """
+        self.output_dir = output_dir
+        self.filename_fn = filename_fn or get_image_filename_from_path
+        marker = read_layout_marker(output_dir)
+        self.layout = layout or marker or LAYOUT_FLAT
+        if self.layout not in LAYOUTS:
+            raise ValueError(f"Unknown review layout: {self.layout}")
+        # Unless the directory is known to be entirely in our layout, reads
+        # also look for the file in the other one
+        self._check_other_layout = marker != self.layout
+        self._ready_dirs = set()
+
+    def _path(self, json_filename: str, layout: str) -> str:
+        return os.path.join(self.output_dir, get_review_relpath(json_filename, layout))
+
+    def _find_file(self, json_filename: str) -> Optional[str]:
+        """Path of a review file in whichever layout holds it, or None"""
+        json_path = self._path(json_filename, self.layout)
+        if os.path.exists(json_path):
+            return json_path
+        if self._check_other_layout:
+            other = LAYOUT_FLAT if self.layout == LAYOUT_SHARDED else LAYOUT_SHARDED
+            json_path = self._path(json_filename, other)
+            if os.path.exists(json_path):
+                return json_path
+        return None
+
+    def _read_review(self, json_path: str, image_path: str) -> Optional[dict]:
+        """Load a review file, or None if it belongs to another image"""
+        with open(json_path, 'r') as f:
+            review_data = json.load(f)
+        if review_data.get("image_path") != image_path:
+            # A filename shared by several images (see get_disambiguated_filename)
+            return None
+        return review_data
+
+    def _plain_filename(self, image_path: str, json_filename: str) -> Optional[str]:
+        """Plain review filename of an image whose review filename is disambiguated, else None"""
+        plain = get_image_filename_from_path(image_path)
+        return plain if plain != json_filename else None
+
+    def find_review_file(self, image_path: str) -> Optional[str]:
+        """Path of the file holding an image's review, in either layout, or None"""
+        json_filename = self.filename_fn(image_path)
+        json_path = self._find_file(json_filename)
+        if json_path is not None:
+            return json_path
+        # Saved under the plain name before another image collided with it
+        plain = self._plain_filename(image_path, json_filename)
+        json_path = self._find_file(plain) if plain else None
+        if json_path is not None and self._read_review(json_path, image_path) is not None:
+            return json_path
+        return None
+
+    def get_review(self, image_path: str) -> Optional[dict]:
+        json_filename = self.filename_fn(image_path)
+        candidates = [json_filename]
+        plain = self._plain_filename(image_path, json_filename)
+        if plain:
+            candidates.append(plain)
+        for candidate in candidates:
+            json_path = self._find_file(candidate)
+            if json_path is not None:
+                review_data = self._read_review(json_path, image_path)
+                if review_data is not None:
+                    return review_data
+        return None
+
+    def _ensure_dir(self, directory: str):
+        """Create a directory once per backend instead of on every save"""
+        if directory in self._ready_dirs:
+            return
+        if directory == self.output_dir and not os.path.isdir(directory):
+            # A new directory is entirely in our layout from the start
+            os.makedirs(directory, exist_ok=True)
+            write_layout_marker(directory, self.layout)
+            self._check_other_layout = False
+        else:
+            os.makedirs(directory, exist_ok=True)
+        self._ready_dirs.add(directory)
+
+    def save_review(self, review_data: dict) -> str:
+        return self._write(review_data, overwrite=True)
+
+    def save_new_reviews(self, reviews: Iterable[dict]) -> List[dict]:
+        """Write each review only if its image has no review file yet, checked file by file"""
+        return [review_data for review_data in reviews
+                if self.find_review_file(review_data["image_path"]) is None
+                and self._write(review_data, overwrite=False) is not None]
+
+    def _write(self, review_data: dict, overwrite: bool) -> Optional[str]:
+        """Write one review file; without overwrite, return None instead of replacing an existing one"""
+        self._ensure_dir(self.output_dir)
+        json_filename = self.filename_fn(review_data["image_path"])
+        json_path = self._path(json_filename, self.layout)
+        target_dir = os.path.dirname(json_path)
+        self._ensure_dir(target_dir)
+        # Write to a temp file and rename, so readers never see a partial review
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=target_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(review_data, f, indent=2)
+            if overwrite:
+                os.replace(tmp_path, json_path)
+            else:
+                # link() fails if the file appeared since it was checked, e.g. a reviewer just saved it
+                try:
+                    os.link(tmp_path, json_path)
+                except FileExistsError:
+                    return None
+                finally:
+                    os.remove(tmp_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        if self._check_other_layout:
+            # Drop a stale copy left in the other layout by an unfinished migration
+            other = LAYOUT_FLAT if self.layout == LAYOUT_SHARDED else LAYOUT_SHARDED
+            try:
+                os.remove(self._path(json_filename, other))
+            except FileNotFoundError:
+                pass
+        # Drop this image's older review under its plain name, now superseded
+        plain = self._plain_filename(review_data["image_path"], json_filename)
+        plain_path = self._find_file(plain) if plain else None
+        if plain_path is not None and self._read_review(plain_path, review_data["image_path"]) is not None:
+            os.remove(plain_path)
+        return json_filename
+
+    def iter_reviews(self) -> Iterator[Tuple[str, dict]]:
+        for entry in iter_review_files(self.output_dir):
+            try:
+                with open(entry.path, 'r') as f:
+                    review_data = json.load(f)
+            except Exception as e:
+                print(f"Error processing {entry.path}: {e}")
+                continue
+            yield entry.name, review_data
+
+    def iter_reviews_window(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                            reviewers: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, dict]]:
+        """Like ReviewBackend.iter_reviews_window, without opening files last modified before since"""
+        reviewers = set(reviewers) if reviewers is not None else None
+        # A review file is written after its review_timestamp is taken, so its mtime is never older
+        min_mtime_ns = int((since.timestamp() - MTIME_SLACK_SECONDS) * 1e9) if since is not None else None
+        for entry in iter_review_files(self.output_dir):
+            if min_mtime_ns is not None and entry.stat().st_mtime_ns < min_mtime_ns:
+                continue
+            try:
+                with open(entry.path, 'r') as f:
+                    review_data = json.load(f)
+            except Exception as e:
+                print(f"Error processing {entry.path}: {e}")
+                continue
+            if reviewers is None or review_data.get("reviewer_username", "") in reviewers:
+                yield entry.name, review_data
+
+    def count_reviews(self) -> int:
+        return sum(1 for _ in iter_review_files(self.output_dir))
+
+
+def migrate_layout(output_dir: str, layout: str) -> int:
+    """
+    Move every review file in output_dir into the given layout.
+
+    Files are moved with os.replace, so the directory stays readable while
+    the migration runs and an interrupted migration can simply be re-run.
+    The layout marker is written only once every file has been moved.
+
+    Returns:
+        int: Number of files moved
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown review layout: {layout}")
+    moved = 0
+    created_dirs = set()
+    for entry in list(iter_review_files(output_dir)):
+        target = os.path.join(output_dir, get_review_relpath(entry.name, layout))
+        if os.path.abspath(entry.path) == os.path.abspath(target):
+            continue
+        target_dir = os.path.dirname(target)
+        if target_dir not in created_dirs:
+            os.makedirs(target_dir, exist_ok=True)
+            created_dirs.add(target_dir)
+        os.replace(entry.path, target)
+        moved += 1
+    if layout == LAYOUT_FLAT:
+        # Remove the now-empty shard directories
+        for name in os.listdir(output_dir):
+            shard_path = os.path.join(output_dir, name)
+            if _is_shard_name(name) and os.path.isdir(shard_path):
+                for sub in os.listdir(shard_path):
+                    try:
+                        os.rmdir(os.path.join(shard_path, sub))
+                    except OSError:
+                        pass
+                try:
+                    os.rmdir(shard_path)
+                except OSError:
+                    pass
+    write_layout_marker(output_dir, layout)
+    return moved
+
+
+class SQLiteReviewBackend(ReviewBackend):
+    """Reviews in a WAL-mode SQLite database indexed by image_path and reviewer"""
+
+    def __init__(self, db_path: str, json_output_dir: Optional[str] = None,
+                 filename_fn: Optional[Callable[[str], str]] = None, json_layout: Optional[str] = None):
+        self.db_path = db_path
+        self.filename_fn = filename_fn or get_image_filename_from_path
+        # Compatibility mode: also write the per-image JSON files
+        self.json_mirror = (
+            JsonDirectoryReviewBackend(json_output_dir, self.filename_fn, json_layout) if json_output_dir else None
+        )
+        self._local = threading.local()
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reviews (
+                    image_path TEXT PRIMARY KEY,
+                    json_filename TEXT NOT NULL,
+                    reviewer_username TEXT,
+                    review_timestamp TEXT,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_reviews_reviewer ON reviews (reviewer_username)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_reviews_timestamp ON reviews (review_timestamp)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_review(self, image_path: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT data FROM reviews WHERE image_path = ?", (image_path,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_review(self, review_data: dict) -> str:
+        self.save_reviews([review_data])
+        return self.filename_fn(review_data["image_path"])
+
+    def save_reviews(self, reviews: Iterable[dict]) -> int:
+        """Upsert many reviews in a single transaction"""
+        reviews = list(reviews)
+        rows = [
+            (
+                review["image_path"],
+                self.filename_fn(review["image_path"]),
+                review.get("reviewer_username", ""),
+                review.get("review_timestamp", ""),
+                json.dumps(review),
+            )
+            for review in reviews
+        ]
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO reviews "
+                "(image_path, json_filename, reviewer_username, review_timestamp, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        if self.json_mirror:
+            self.json_mirror.save_reviews(reviews)
+        return len(rows)
+
+    def save_new_reviews(self, reviews: Iterable[dict]) -> List[dict]:
+        """Insert reviews for images not in the database yet, in a single transaction"""
+        written = []
+        conn = self._connection()
+        with conn:
+            for review in reviews:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO reviews "
+                    "(image_path, json_filename, reviewer_username, review_timestamp, data) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (review["image_path"], self.filename_fn(review["image_path"]),
+                     review.get("reviewer_username", ""), review.get("review_timestamp", ""), json.dumps(review)),
+                )
+                if cursor.rowcount:
+                    written.append(review)
+        if self.json_mirror:
+            self.json_mirror.save_reviews(written)
+        return written
+
+    def iter_reviews(self) -> Iterator[Tuple[str, dict]]:
+        cursor = self._connection().execute("SELECT json_filename, data FROM reviews")
+        for json_filename, data in cursor:
+            yield json_filename, json.loads(data)
+
+    def iter_reviews_window(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                            reviewers: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, dict]]:
+        """Like ReviewBackend.iter_reviews_window, using the timestamp and reviewer indexes"""
+        clauses, params = [], []
+        # ISO timestamps sort as text; the bounds are widened to whole seconds so
+        # timestamps with and without microseconds both fall on the right side
+        if since is not None:
+            clauses.append("review_timestamp >= ?")
+            params.append(since.replace(microsecond=0).isoformat())
+        if until is not None:
+            clauses.append("review_timestamp < ?")
+            params.append((until.replace(microsecond=0) + timedelta(seconds=1)).isoformat())
+        if reviewers is not None:
+            reviewers = list(reviewers)
+            clauses.append(f"reviewer_username IN ({', '.join('?' * len(reviewers))})")
+            params.extend(reviewers)
+        query = "SELECT json_filename, data FROM reviews"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        for json_filename, data in self._connection().execute(query, params):
+            yield json_filename, json.loads(data)
+
+    def iter_reviewed_images(self) -> Iterator[Tuple[str, str]]:
+        yield from self._connection().execute("SELECT image_path, reviewer_username FROM reviews")
+
+    def get_reviews_by_reviewer(self, reviewer_username: str) -> Iterator[dict]:
+        """Yield every review made by one reviewer"""
+        cursor = self._connection().execute(
+            "SELECT data FROM reviews WHERE reviewer_username = ?", (reviewer_username,)
+        )
+        for (data,) in cursor:
+            yield json.loads(data)
+
+    def count_reviews(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def iter_review_log(log_dir: str, image_path: Optional[str] = None) -> Iterator[dict]:
+    """Yield every review version in a review log in the order it was saved, optionally for one image only"""
+    try:
+        f = open(os.path.join(log_dir, ReviewLogBackend.LOG_NAME), 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # Still being written
+            try:
+                review_data = json.loads(line)
+            except ValueError:
+                continue
+            if image_path is None or review_data.get("image_path") == image_path:
+                yield review_data
+
+
+class ReviewLogBackend(ReviewBackend):
+    """
+    Every review submission appended to a line-delimited log, with a compacted latest-version snapshot.
+
+    ``<log_dir>/reviews.log.jsonl`` is append-only: each save is one write of
+    one JSON line per review, so earlier decisions are never overwritten and
+    the full history stays available for audits. Latest versions are found
+    through an in-memory {image_path: (file, offset, length)} index, so a
+    lookup is one positioned read. Compaction writes the latest version of
+    every image to ``snapshot-<log offset>.jsonl`` with its index, so opening
+    the log only replays what was appended after the newest snapshot.
+    Appends from other processes (e.g. bulk_review.py) are picked up within
+    ``check_interval`` seconds.
+
+    Appends hold an exclusive ``flock`` on the log and replays a shared one.
+    O_APPEND alone only keeps concurrent appends whole on a local disk; on NFS
+    two hosts can write at the same offset, and taking the lock also makes
+    the client fetch the current file size from the server.
+    """
+
+    LOG_NAME = "reviews.log.jsonl"
+    READ_CHUNK_BYTES = 16 << 20  # Log bytes replayed, or review lines appended, per system call
+    _SNAPSHOT = 0  # Index locations: (source, offset, length)
+    _LOG = 1
+
+    def __init__(self, log_dir: str, json_output_dir: Optional[str] = None,
+                 filename_fn: Optional[Callable[[str], str]] = None, json_layout: Optional[str] = None,
+                 compact_every: int = 10000, check_interval: float = 2.0):
+        """
+        Args:
+            log_dir: Directory holding the log and its snapshots
+            json_output_dir: Also write the per-image JSON files (latest version) here
+            filename_fn: Maps an image path to its review filename
+            json_layout: Layout of the mirrored JSON files
+            compact_every: Compact in the background after this many appends (0 disables)
+            check_interval: Minimum seconds between checks of the log for appends by other processes
+        """
+        self.log_dir = log_dir
+        self.filename_fn = filename_fn or get_image_filename_from_path
+        self.json_mirror = (
+            JsonDirectoryReviewBackend(json_output_dir, self.filename_fn, json_layout) if json_output_dir else None
+        )
+        self.compact_every = compact_every
+        self.check_interval = check_interval
+        self.log_path = os.path.join(log_dir, self.LOG_NAME)
+        os.makedirs(log_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()  # One compaction at a time
+        self._compacting = False
+        self._next_check = 0.0
+        self._stats = {"appended": 0, "replayed": 0, "compactions": 0}
+        self._log_fd = os.open(self.log_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._snapshot_fd = None
+        self._index = {}
+        self._log_end = 0  # Log bytes already in the index
+        self._since_compaction = 0
+        self._load_snapshot()
+        with self._log_locked(exclusive=False):
+            self._replay()
+
+    def _snapshot_offsets(self) -> list:
+        """Log offsets of the complete snapshots in log_dir, oldest first"""
+        offsets = []
+        for name in os.listdir(self.log_dir):
+            if name.startswith("snapshot-") and name.endswith(".index.json"):
+                offset = name[len("snapshot-"):-len(".index.json")]
+                if offset.isdigit():
+                    offsets.append(int(offset))
+        return sorted(offsets)
+
+    def _snapshot_path(self, log_offset: int, suffix: str) -> str:
+        return os.path.join(self.log_dir, f"snapshot-{log_offset:016d}{suffix}")
+
+    def _load_snapshot(self):
+        """Start the index from the newest snapshot, if any"""
+        offsets = self._snapshot_offsets()
+        if not offsets:
+            return
+        log_offset = offsets[-1]
+        with open(self._snapshot_path(log_offset, ".index.json"), 'r') as f:
+            snapshot_index = json.load(f)
+        self._snapshot_fd = os.open(self._snapshot_path(log_offset, ".jsonl"), os.O_RDONLY)
+        self._index = {image_path: (self._SNAPSHOT, offset, length)
+                       for image_path, (offset, length) in snapshot_index.items()}
+        self._log_end = log_offset
+
+    @contextlib.contextmanager
+    def _log_locked(self, exclusive: bool):
+        """Hold an flock on the log: exclusive to append, shared to replay (never nested)"""
+        fcntl.flock(self._log_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._log_fd, fcntl.LOCK_UN)
+
+    def _replay(self):
+        """Index log lines appended since the last replay, by this or another process (caller holds the log lock)"""
+        size = os.fstat(self._log_fd).st_size
+        while self._log_end < size:
+            data = os.pread(self._log_fd, min(size - self._log_end, self.READ_CHUNK_BYTES), self._log_end)
+            if b"\n" not in data and len(data) < size - self._log_end:
+                # One line longer than a chunk
+                data = os.pread(self._log_fd, size - self._log_end, self._log_end)
+            # A line cut by the chunk is read by the next pass; one still being written, next time
+            data = data[:data.rfind(b"\n") + 1]
+            if not data:
+                return
+            position = self._log_end
+            for line in data.splitlines(keepends=True):
+                try:
+                    image_path = json.loads(line)["image_path"]
+                except (ValueError, KeyError) as e:
+                    print(f"Error reading {self.log_path} at byte {position}: {e}")
+                else:
+                    self._index[image_path] = (self._LOG, position, len(line))
+                    self._stats["replayed"] += 1
+                    self._since_compaction += 1
+                position += len(line)
+            self._log_end = position
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock, self._log_locked(exclusive=False):
+            self._next_check = now + self.check_interval
+            self._replay()
+
+    def _read(self, location: Tuple[int, int, int]) -> dict:
+        source, offset, length = location
+        fd = self._snapshot_fd if source == self._SNAPSHOT else self._log_fd
+        return json.loads(os.pread(fd, length, offset))
+
+    def get_review(self, image_path: str) -> Optional[dict]:
+        self._refresh()
+        # Under the lock, so a compaction cannot swap the snapshot between lookup and read
+        with self._lock:
+            location = self._index.get(image_path)
+            return self._read(location) if location is not None else None
+
+    def save_review(self, review_data: dict) -> str:
+        self.save_reviews([review_data])
+        return self.filename_fn(review_data["image_path"])
+
+    def save_reviews(self, reviews: Iterable[dict]) -> int:
+        """Append many reviews with a single write"""
+        return len(self._append(reviews, only_new=False))
+
+    def save_new_reviews(self, reviews: Iterable[dict]) -> List[dict]:
+        """Append reviews only for images the log has no version of, checked under the append lock"""
+        return self._append(reviews, only_new=True)
+
+    def _append(self, reviews: Iterable[dict], only_new: bool) -> List[dict]:
+        """Append reviews (with only_new, just those for images without a version) and return the ones appended"""
+        reviews = list(reviews)
+        if not reviews:
+            return []
+        with self._lock, self._log_locked(exclusive=True):
+            # Index anything other processes appended first, so offsets stay exact
+            self._replay()
+            if only_new:
+                reviews = [review for review in reviews if review["image_path"] not in self._index]
+                if not reviews:
+                    return []
+            lines = [(json.dumps(review, ensure_ascii=False) + "\n").encode("utf-8") for review in reviews]
+            total = sum(len(line) for line in lines)
+            start = 0
+            while start < len(lines):
+                # Whole lines per write, so a reader never sees half a review followed by another one
+                end, size = start, 0
+                while end < len(lines) and (end == start or size + len(lines[end]) <= self.READ_CHUNK_BYTES):
+                    size += len(lines[end])
+                    end += 1
+                chunk = memoryview(b"".join(lines[start:end]))
+                while chunk:
+                    chunk = chunk[os.write(self._log_fd, chunk):]
+                start = end
+            # With O_APPEND the file position is now the end of our last write
+            position = os.lseek(self._log_fd, 0, os.SEEK_CUR) - total
+            if position != self._log_end:
+                # A writer that does not take the lock appended meanwhile; index in log order
+                self._replay()
+            else:
+                for review, line in zip(reviews, lines):
+                    self._index[review["image_path"]] = (self._LOG, position, len(line))
+                    position += len(line)
+                self._log_end = position
+            self._stats["appended"] += len(lines)
+            self._since_compaction += len(lines)
+            start_compaction = (self.compact_every and self._since_compaction >= self.compact_every
+                                and not self._compacting)
+            if start_compaction:
+                self._compacting = True
+        if start_compaction:
+            threading.Thread(target=self._compact_in_background, name="review-log-compaction", daemon=True).start()
+        if self.json_mirror:
+            self.json_mirror.save_reviews(reviews)
+        return reviews
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Error compacting {self.log_path}: {e}")
+
+    def compact(self) -> int:
+        """
+        Write the latest version of every image to a new snapshot and switch reads to it.
+
+        The log itself is never rewritten. Returns the number of reviews in the snapshot.
+        """
+        with self._compact_lock:
+            try:
+                return self._compact()
+            finally:
+                with self._lock:
+                    self._compacting = False
+
+    def _compact(self) -> int:
+        with self._lock, self._log_locked(exclusive=False):
+            self._compacting = True
+            self._replay()
+            log_offset = self._log_end
+            compacted_appends = self._since_compaction
+            locations = sorted(self._index.items(), key=lambda item: item[1])
+        snapshot_index = {}
+        data_path = self._snapshot_path(log_offset, ".jsonl")
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".jsonl", dir=self.log_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                position = 0
+                for image_path, (source, offset, length) in locations:
+                    line = os.pread(self._snapshot_fd if source == self._SNAPSHOT else self._log_fd, length, offset)
+                    f.write(line)
+                    snapshot_index[image_path] = (position, length)
+                    position += length
+            os.replace(tmp_path, data_path)
+            # The index file is written last: its presence marks the snapshot complete
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=self.log_dir)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(snapshot_index, f)
+            os.replace(tmp_path, self._snapshot_path(log_offset, ".index.json"))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        snapshot_fd = os.open(data_path, os.O_RDONLY)
+        with self._lock:
+            old_fd = self._snapshot_fd
+            self._snapshot_fd = snapshot_fd
+            for image_path, (offset, length) in snapshot_index.items():
+                source, current_offset, _ = self._index[image_path]
+                # Versions appended while the snapshot was written stay in the log
+                if source == self._SNAPSHOT or current_offset < log_offset:
+                    self._index[image_path] = (self._SNAPSHOT, offset, length)
+            self._since_compaction -= compacted_appends
+            self._stats["compactions"] += 1
+        if old_fd is not None:
+            os.close(old_fd)
+        # Older snapshots are superseded; readers that still have one open keep their file handle
+        for offset in self._snapshot_offsets():
+            if offset < log_offset:
+                for suffix in (".index.json", ".jsonl"):
+                    try:
+                        os.remove(self._snapshot_path(offset, suffix))
+                    except FileNotFoundError:
+                        pass
+        return len(snapshot_index)
+
+    def iter_reviews(self) -> Iterator[Tuple[str, dict]]:
+        self._refresh()
+        with self._lock:
+            locations = sorted(self._index.items(), key=lambda item: item[1])
+        # Read in file order, so the snapshot and log are read sequentially
+        for image_path, location in locations:
+            with self._lock:
+                # Re-check: a compaction may have moved the review into a new snapshot
+                location = self._index.get(image_path, location)
+                review_data = self._read(location)
+            yield self.filename_fn(image_path), review_data
+
+    def iter_history(self, image_path: Optional[str] = None) -> Iterator[dict]:
+        """Yield every saved version in the order it was saved, optionally for one image only"""
+        return iter_review_log(self.log_dir, image_path)
+
+    def count_reviews(self) -> int:
+        self._refresh()
+        return len(self._index)
+
+    def get_stats(self) -> dict:
+        """Return append, replay and compaction counters and the number of versions since the last snapshot"""
+        with self._lock:
+            return dict(self._stats, reviews=len(self._index), since_compaction=self._since_compaction,
+                        log_bytes=self._log_end)
+
+    def close(self):
+        with self._lock:
+            if self._log_fd is not None:
+                os.close(self._log_fd)
+                self._log_fd = None
+            if self._snapshot_fd is not None:
+                os.close(self._snapshot_fd)
+                self._snapshot_fd = None
+
+
+class WriteBehindReviewBackend(ReviewBackend):
+    """
+    Write-behind wrapper around another backend.
+
+    save_review() only queues the review and returns; a background thread
+    group-commits the queue every ``flush_interval`` seconds, or as soon as
+    ``max_batch`` reviews are waiting. Several saves of the same image in
+    one interval collapse into a single write. Reads see queued reviews
+    immediately, and close() flushes everything still queued. A batch that
+    fails stays queued and is retried; get_write_error() reports the failure
+    until a flush succeeds again.
+    """
+
+    def __init__(self, backend: ReviewBackend, flush_interval: float = 0.5, max_batch: int = 100):
+        self.backend = backend
+        self.filename_fn = getattr(backend, "filename_fn", get_image_filename_from_path)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One batch is written at a time
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._pending = {}  # image_path -> latest queued review
+        self._in_flight = {}  # image_path -> review being written by the current batch
+        self._last_error = None  # Error of the latest flush while it keeps failing, cleared by a successful one
+        self._stats = {"queued": 0, "coalesced": 0, "written": 0, "batches": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name="review-writer", daemon=True)
+        self._thread.start()
+
+    def get_review(self, image_path: str) -> Optional[dict]:
+        with self._lock:
+            review_data = self._pending.get(image_path) or self._in_flight.get(image_path)
+        if review_data is not None:
+            return review_data
+        return self.backend.get_review(image_path)
+
+    def save_review(self, review_data: dict) -> str:
+        if self._closed:
+            raise RuntimeError("Review writer is closed")
+        image_path = review_data["image_path"]
+        with self._lock:
+            if image_path in self._pending:
+                self._stats["coalesced"] += 1
+            self._pending[image_path] = review_data
+            self._stats["queued"] += 1
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.set()
+        return self.filename_fn(image_path)
+
+    def save_reviews(self, reviews: Iterable[dict]) -> int:
+        """Queue many reviews at once (e.g. a bulk accept) and wake the writer"""
+        if self._closed:
+            raise RuntimeError("Review writer is closed")
+        count = 0
+        with self._lock:
+            for review_data in reviews:
+                image_path = review_data["image_path"]
+                if image_path in self._pending:
+                    self._stats["coalesced"] += 1
+                self._pending[image_path] = review_data
+                count += 1
+            self._stats["queued"] += count
+        self._wakeup.set()
+        return count
+
+    def save_new_reviews(self, reviews: Iterable[dict]) -> List[dict]:
+        """Write reviews for images with no stored or queued review straight through, bypassing the queue"""
+        if self._closed:
+            raise RuntimeError("Review writer is closed")
+        with self._lock:
+            reviews = [review_data for review_data in reviews
+                       if review_data["image_path"] not in self._pending
+                       and review_data["image_path"] not in self._in_flight]
+        # A reviewer's save queued after this check is flushed later and wins
+        return self.backend.save_new_reviews(reviews)
+
+    def _run(self):
+        """Background loop: flush on every interval, or early when a batch fills up"""
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write every queued review now; failed reviews stay queued for the next attempt"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = {}
+                self._in_flight = batch
+            try:
+                written = self.backend.save_reviews(list(batch.values()))
+            except Exception as e:
+                print(f"Error writing {len(batch)} queued reviews: {e}")
+                with self._lock:
+                    # Newer saves of the same image win over the failed ones
+                    for image_path, review_data in batch.items():
+                        self._pending.setdefault(image_path, review_data)
+                    self._in_flight = {}
+                    self._stats["errors"] += 1
+                    self._last_error = f"{type(e).__name__}: {e}"
+                return 0
+            with self._lock:
+                self._in_flight = {}
+                self._last_error = None
+                self._stats["written"] += written
+                self._stats["batches"] += 1
+            return written
+
+    def iter_reviews(self) -> Iterator[Tuple[str, dict]]:
+        self.flush()
+        return self.backend.iter_reviews()
+
+    def iter_reviews_window(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                            reviewers: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, dict]]:
+        self.flush()
+        return self.backend.iter_reviews_window(since, until, reviewers)
+
+    def iter_reviewed_images(self) -> Iterator[Tuple[str, str]]:
+        self.flush()
+        return self.backend.iter_reviewed_images()
+
+    def count_reviews(self) -> int:
+        self.flush()
+        return self.backend.count_reviews()
+
+    def get_stats(self) -> dict:
+        """Return write counters, the current queue depth and whether writes are failing"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending) + len(self._in_flight)
+            stats["failing"] = int(self._last_error is not None)
+        return stats
+
+    def get_write_error(self) -> Optional[str]:
+        """Why queued reviews are not being written (the latest failed flush), or None while writes succeed"""
+        with self._lock:
+            return self._last_error
+
+    def close(self):
+        """Stop the background thread, flush what is queued and close the wrapped backend"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self.flush()
+        with self._lock:
+            remaining = len(self._pending)
+        if remaining:
+            print(f"Warning: {remaining} reviews could not be written at shutdown")
+        self.backend.close()
+
+
+def create_review_backend(output_dir: str, db_path: Optional[str] = None, emit_json: bool = False,
+                          filename_fn: Optional[Callable[[str], str]] = None,
+                          durability: str = DURABILITY_SYNC, flush_interval: float = 0.5,
+                          max_batch: int = 100, layout: Optional[str] = None,
+                          log_dir: Optional[str] = None) -> ReviewBackend:
+    """
+    Return the SQLite backend if db_path is given, the review log backend if
+    log_dir is given, else the JSON directory backend. With emit_json, the
+    SQLite and log backends also write the per-image JSON files to output_dir.
+
+    With durability=DURABILITY_GROUP the backend is wrapped in a
+    WriteBehindReviewBackend that group-commits every flush_interval seconds.
+    The review log is never wrapped: a save is already a single append, and
+    coalescing queued saves would drop versions from its history.
+    layout selects the flat or sharded JSON layout for new files (default:
+    whatever the directory is marked with, else flat).
+    """
+    if db_path and log_dir:
+        raise ValueError("Use either a review database or a review log, not both")
+    if log_dir:
+        backend = ReviewLogBackend(log_dir, json_output_dir=output_dir if emit_json else None,
+                                   filename_fn=filename_fn, json_layout=layout)
+    elif db_path:
+        backend = SQLiteReviewBackend(db_path, json_output_dir=output_dir if emit_json else None,
+                                      filename_fn=filename_fn, json_layout=layout)
+    else:
+        backend = JsonDirectoryReviewBackend(output_dir, filename_fn, layout)
+    if durability not in (DURABILITY_SYNC, DURABILITY_GROUP):
+        raise ValueError(f"Unknown review durability mode: {durability}")
+    if durability == DURABILITY_GROUP and not log_dir:
+        return WriteBehindReviewBackend(backend, flush_interval, max_batch)
+    return backend
+
+
+def import_json_directory(output_dir: str, db_path: str, batch_size: int = 1000) -> int:
+    """One-shot import of an existing JSON review directory into SQLite"""
+    source = JsonDirectoryReviewBackend(output_dir)
+    target = SQLiteReviewBackend(db_path)
+    imported = 0
+    batch = []
+    for _, review_data in source.iter_reviews():
+        if not review_data.get("image_path"):
+            continue
+        batch.append(review_data)
+        if len(batch) >= batch_size:
+            imported += target.save_reviews(batch)
+            batch = []
+    if batch:
+        imported += target.save_reviews(batch)
+    target.close()
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the review store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import a JSON review directory into SQLite")
+    import_parser.add_argument("--output-dir", default="./output", help="Directory containing JSON review files")
+    import_parser.add_argument("--review-db", default="./reviews.sqlite3", help="SQLite review database")
+
+    migrate_parser = subparsers.add_parser("migrate", help="Move JSON review files to the flat or sharded layout")
+    migrate_parser.add_argument("--output-dir", default="./output", help="Directory containing JSON review files")
+    migrate_parser.add_argument("--layout", choices=LAYOUTS, default=LAYOUT_SHARDED, help="Target layout")
+
+    compact_parser = subparsers.add_parser("compact", help="Snapshot the latest version of every review in a review log")
+    compact_parser.add_argument("--review-log", default="./review_log", help="Review log directory")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        count = import_json_directory(args.output_dir, args.review_db)
+        print(f"Imported {count} reviews from {args.output_dir} into {args.review_db}")
+    elif args.command == "migrate":
+        count = migrate_layout(args.output_dir, args.layout)
+        print(f"Moved {count} review files in {args.output_dir} to the {args.layout} layout")
+    elif args.command == "compact":
+        log = ReviewLogBackend(args.review_log, compact_every=0)
+        count = log.compact()
+        log.close()
+        print(f"Compacted {args.review_log}: {count} reviews in the snapshot")
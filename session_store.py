@@ -0,0 +1,241 @@
+"""
+Session storage backends for the review app.
+
+- ``InMemorySessionBackend``: per-process dict with idle-TTL expiry and an
+  LRU cap on the number of sessions.
+- ``SQLiteSessionBackend``: sessions in a shared SQLite file, so any worker
+  process behind a load balancer can verify a token, and positions survive
+  restarts.
+
+Both backends remember each user's last ``current_index`` so reviewers
+resume where they stopped after logging in again. Every session that goes
+away without delete() (swept, found expired by get(), or evicted by the LRU
+cap) is reported by ``sweep_if_due()``, so the app can release what it held.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class SessionBackend:
+    """Interface implemented by every session backend"""
+
+    def __init__(self, ttl_seconds: float, sweep_interval: float = 60):
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+        self._dropped_lock = threading.Lock()
+        self._dropped = []  # Tokens expired by get() or evicted by create(), not yet reported
+
+    def create(self, session_token: str, data: dict):
+        """Store a new session"""
+        raise NotImplementedError
+
+    def get(self, session_token: str) -> Optional[dict]:
+        """Return session data (refreshing its idle timer), or None if unknown or expired"""
+        raise NotImplementedError
+
+    def update(self, session_token: str, data: dict):
+        """Persist changed session data (e.g. current_index)"""
+        raise NotImplementedError
+
+    def delete(self, session_token: str):
+        """Remove a session"""
+        raise NotImplementedError
+
+    def sweep(self) -> List[str]:
+        """Remove idle sessions and return their tokens"""
+        raise NotImplementedError
+
+    def get_last_position(self, username: str) -> Optional[int]:
+        """Return the last current_index saved for a user, if any"""
+        raise NotImplementedError
+
+    def _record_dropped(self, session_token: str):
+        """Remember a session that expired or was evicted outside sweep(), for sweep_if_due()"""
+        with self._dropped_lock:
+            self._dropped.append(session_token)
+
+    def sweep_if_due(self) -> List[str]:
+        """
+        Return the tokens of sessions dropped since the last call.
+
+        These are sessions get() found expired and sessions create() evicted,
+        plus a sweep() of idle sessions at most once per sweep_interval.
+        """
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, []
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return dropped
+        self._next_sweep = now + self.sweep_interval
+        return dropped + self.sweep()
+
+
+class InMemorySessionBackend(SessionBackend):
+    """Process-local sessions with idle expiry and an LRU cap"""
+
+    def __init__(self, ttl_seconds: float = 8 * 3600, max_sessions: int = 1000, sweep_interval: float = 60):
+        super().__init__(ttl_seconds, sweep_interval)
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # token -> (data, last_seen), least recently used first
+        self._positions = {}  # username -> last current_index
+
+    def create(self, session_token: str, data: dict):
+        with self._lock:
+            self._sessions[session_token] = (data, time.time())
+            while len(self._sessions) > self.max_sessions:
+                evicted, _ = self._sessions.popitem(last=False)
+                self._record_dropped(evicted)
+
+    def get(self, session_token: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_token)
+            if entry is None:
+                return None
+            data, last_seen = entry
+            if now - last_seen > self.ttl_seconds:
+                del self._sessions[session_token]
+                self._record_dropped(session_token)
+                return None
+            self._sessions[session_token] = (data, now)
+            self._sessions.move_to_end(session_token)
+            return data
+
+    def update(self, session_token: str, data: dict):
+        with self._lock:
+            if session_token in self._sessions:
+                self._sessions[session_token] = (data, time.time())
+            if "current_index" in data:
+                self._positions[data["username"]] = data["current_index"]
+
+    def delete(self, session_token: str):
+        with self._lock:
+            self._sessions.pop(session_token, None)
+
+    def sweep(self) -> List[str]:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [token for token, (_, last_seen) in self._sessions.items() if last_seen < cutoff]
+            for token in expired:
+                del self._sessions[token]
+        return expired
+
+    def get_last_position(self, username: str) -> Optional[int]:
+        with self._lock:
+            return self._positions.get(username)
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Sessions shared across worker processes through a SQLite file"""
+
+    def __init__(self, db_path: str, ttl_seconds: float = 8 * 3600, sweep_interval: float = 60,
+                 touch_interval: float = 60):
+        super().__init__(ttl_seconds, sweep_interval)
+        self.db_path = db_path
+        # last_seen is only rewritten when older than this, to avoid a write per click
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    token TEXT PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    last_seen REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions (last_seen)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_positions (
+                    username TEXT PRIMARY KEY,
+                    current_index INTEGER NOT NULL
+                )
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, session_token: str, data: dict):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (token, username, data, last_seen) VALUES (?, ?, ?, ?)",
+                (session_token, data["username"], json.dumps(data), time.time()),
+            )
+
+    def get(self, session_token: str) -> Optional[dict]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT data, last_seen FROM sessions WHERE token = ?", (session_token,)
+        ).fetchone()
+        if row is None:
+            return None
+        data, last_seen = row
+        now = time.time()
+        if now - last_seen > self.ttl_seconds:
+            self.delete(session_token)
+            self._record_dropped(session_token)
+            return None
+        if now - last_seen > self.touch_interval:
+            with conn:
+                conn.execute("UPDATE sessions SET last_seen = ? WHERE token = ?", (now, session_token))
+        return json.loads(data)
+
+    def update(self, session_token: str, data: dict):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE sessions SET data = ?, last_seen = ? WHERE token = ?",
+                (json.dumps(data), time.time(), session_token),
+            )
+            if "current_index" in data:
+                conn.execute(
+                    "INSERT OR REPLACE INTO user_positions (username, current_index) VALUES (?, ?)",
+                    (data["username"], data["current_index"]),
+                )
+
+    def delete(self, session_token: str):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE token = ?", (session_token,))
+
+    def sweep(self) -> List[str]:
+        cutoff = time.time() - self.ttl_seconds
+        conn = self._connection()
+        with conn:
+            expired = [token for (token,) in conn.execute(
+                "SELECT token FROM sessions WHERE last_seen < ?", (cutoff,)
+            )]
+            conn.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,))
+        return expired
+
+    def get_last_position(self, username: str) -> Optional[int]:
+        row = self._connection().execute(
+            "SELECT current_index FROM user_positions WHERE username = ?", (username,)
+        ).fetchone()
+        return row[0] if row else None
+
+
+def create_session_backend(db_path: Optional[str] = None, ttl_seconds: float = 8 * 3600,
+                           max_sessions: int = 1000) -> SessionBackend:
+    """Return the SQLite backend if db_path is given, else the in-memory backend"""
+    if db_path:
+        return SQLiteSessionBackend(db_path, ttl_seconds)
+    return InMemorySessionBackend(ttl_seconds, max_sessions)
@@ -0,0 +1,35 @@
+"""Shared fixtures; the modules under test live in the repository root"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from annotation_store import AnnotationIndex  # noqa: E402
+from label_taxonomy import LabelNormalizer, encode_label_columns  # noqa: E402
+from work_queue import WorkQueue  # noqa: E402
+
+
+def make_annotations(n: int = 10, agree_every: int = 2) -> pd.DataFrame:
+    """Synthetic annotation rows; every agree_every-th row has both rounds agreeing"""
+    return pd.DataFrame({
+        "image_path": [f"/data/imgs/img_{i:04d}.jpg" for i in range(n)],
+        "crop1": ["Maize"] * n,
+        "label1": ["['Fall_armyworm']"] * n,
+        "crop2": ["Maize" if i % agree_every == 0 else "Rice" for i in range(n)],
+        "label2": ["['Fall_armyworm']"] * n,
+    })
+
+
+def make_work_queue(df: pd.DataFrame, reviews=(), broken=None) -> WorkQueue:
+    """WorkQueue over df with the given (image_path, reviewer) reviews"""
+    matrices = encode_label_columns([df["label1"], df["label2"]], LabelNormalizer({}))
+    return WorkQueue(df, AnnotationIndex(df["image_path"]), reviews, tuple(matrices), broken)
+
+
+@pytest.fixture
+def annotations() -> pd.DataFrame:
+    return make_annotations()
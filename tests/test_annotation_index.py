@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from annotation_store import AnnotationIndex, AnnotationStore, ArrowAnnotationIndex, convert_csv_to_arrow
+from review_store import JsonDirectoryReviewBackend, get_image_filename_from_path
+
+COLLIDING = ["/data/a/b_c.png", "/data/a_b/c.png", "/data_a/b/c.png"]
+
+
+def test_duplicate_rows_share_the_first_row():
+    index = AnnotationIndex(["x.jpg", "y.jpg", "x.jpg"])
+    assert index.get_row("x.jpg") == 0
+    assert index.duplicate_rows == {"x.jpg": [2]}
+    assert index.get_image_path(1) == "y.jpg"
+
+
+@pytest.mark.parametrize("order", [COLLIDING, COLLIDING[::-1], [COLLIDING[1], COLLIDING[2], COLLIDING[0]]])
+def test_colliding_filenames_do_not_depend_on_row_order(order):
+    index = AnnotationIndex(["other.jpg"] + order)
+    reference = AnnotationIndex(COLLIDING)
+    plain = get_image_filename_from_path(COLLIDING[0])
+    assert set(index.collisions[plain]) == set(COLLIDING)
+    for image_path in COLLIDING:
+        filename = index.get_review_filename(image_path)
+        assert filename != plain
+        assert filename == reference.get_review_filename(image_path)
+        assert index.get_image_path_for_filename(filename) == image_path
+    assert len({index.get_review_filename(image_path) for image_path in COLLIDING}) == len(COLLIDING)
+    assert index.get_review_filename("other.jpg") == "other.json"
+
+
+def test_arrow_index_matches_the_dataframe_index(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    image_paths = ["x.jpg", "dir\\y.TIFF", "x.jpg"] + COLLIDING + ["y.jpeg", COLLIDING[0]]
+    reference = AnnotationIndex(image_paths)
+    index = ArrowAnnotationIndex(pa.chunked_array([image_paths[:4], image_paths[4:]]))
+
+    assert index.duplicate_rows == reference.duplicate_rows
+    assert {name: set(paths) for name, paths in index.collisions.items()} == \
+        {name: set(paths) for name, paths in reference.collisions.items()}
+    for row, image_path in enumerate(image_paths):
+        assert index.get_image_path(row) == image_path
+        assert index.get_row(image_path) == reference.get_row(image_path)
+        filename = index.get_review_filename(image_path)
+        assert filename == reference.get_review_filename(image_path)
+        assert index.get_image_path_for_filename(filename) == image_path
+    assert index.get_row("missing.jpg") is None
+    assert index.get_image_path_for_filename(get_image_filename_from_path(COLLIDING[0])) is None
+    lookups = image_paths + ["missing.jpg"]
+    assert index.get_rows(lookups).tolist() == reference.get_rows(lookups).tolist()
+
+
+def test_arrow_store_caches_converted_columns(tmp_path, annotations):
+    pytest.importorskip("pyarrow")
+    csv_path = tmp_path / "annotations.csv"
+    annotations.to_csv(csv_path, index=False)
+    arrow_path = str(tmp_path / "annotations.arrow")
+    convert_csv_to_arrow(str(csv_path), arrow_path)
+
+    store = AnnotationStore(arrow_path)
+    table = store.get_dataframe()
+    assert table["label1"] is table["label1"]
+    index = store.get_index()
+    assert isinstance(index, ArrowAnnotationIndex)
+    assert index.get_row(annotations["image_path"][3]) == 3
+
+
+def test_review_under_the_plain_name_stays_with_its_image(tmp_path):
+    # Saved while only the second image was in the CSV
+    plain = get_image_filename_from_path(COLLIDING[1])
+    with open(tmp_path / plain, "w") as f:
+        json.dump({"image_path": COLLIDING[1], "reviewer_username": "alice"}, f)
+
+    index = AnnotationIndex(COLLIDING)
+    store = JsonDirectoryReviewBackend(str(tmp_path), index.get_review_filename)
+    assert store.get_review(COLLIDING[0]) is None
+    assert store.get_review(COLLIDING[2]) is None
+    assert store.get_review(COLLIDING[1])["reviewer_username"] == "alice"
+
+    # Re-saving moves the review to the image's own filename
+    store.save_review({"image_path": COLLIDING[1], "reviewer_username": "bob"})
+    assert not (tmp_path / plain).exists()
+    assert store.get_review(COLLIDING[1])["reviewer_username"] == "bob"
+    assert [review["image_path"] for _, review in store.iter_reviews()] == [COLLIDING[1]]
+
+
+def test_review_file_of_another_image_is_ignored(tmp_path):
+    filename = get_image_filename_from_path(COLLIDING[0])
+    with open(tmp_path / filename, "w") as f:
+        json.dump({"image_path": COLLIDING[1], "reviewer_username": "alice"}, f)
+    store = JsonDirectoryReviewBackend(str(tmp_path))
+    assert store.get_review(COLLIDING[0]) is None
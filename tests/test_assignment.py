@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+from conftest import make_work_queue
+from review_store import SQLiteReviewBackend
+from work_queue import AssignmentScheduler, InMemoryLeaseBackend, SQLiteLeaseBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def leases(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryLeaseBackend()
+        return
+    backend = SQLiteLeaseBackend(str(tmp_path / "sessions.sqlite3"))
+    yield backend
+    backend.close()
+
+
+def test_batches_do_not_overlap(annotations, leases):
+    scheduler = AssignmentScheduler(make_work_queue(annotations), batch_size=3, leases=leases)
+    first = scheduler.next_assigned("a")
+    second = scheduler.next_assigned("b")
+    assert first == 0
+    assert second == 3
+    assert scheduler.get_lease_holder(first) == "a"
+    assert scheduler.get_lease_holder(second) == "b"
+
+
+def test_skipping_releases_the_row_left_behind(annotations, leases):
+    scheduler = AssignmentScheduler(make_work_queue(annotations), batch_size=5, leases=leases)
+    row = scheduler.next_assigned("a")
+    served = [row]
+    for _ in range(4):
+        row = scheduler.next_assigned("a", row)
+        served.append(row)
+    assert served == [0, 1, 2, 3, 4]
+    # Rows 0-3 were skipped without saving: free again, only the open row is held
+    assert scheduler.leased_rows() == [4]
+    assert [scheduler.get_lease_holder(r) for r in range(4)] == [None] * 4
+    # Another reviewer can claim and save them
+    scheduler.batch_size = 10
+    assert scheduler.next_assigned("b") == 0
+    assert scheduler.get_lease_holder(0) == "b"
+    assert scheduler.get_lease_holder(4) == "a"
+
+
+def test_renew_only_extends_the_viewed_row(annotations, leases):
+    scheduler = AssignmentScheduler(make_work_queue(annotations), batch_size=3, lease_seconds=0.2, leases=leases)
+    row = scheduler.next_assigned("a")
+    time.sleep(0.15)
+    scheduler.renew("a", row)
+    time.sleep(0.1)
+    # The viewed row survived; the unvisited rest of the batch expired
+    assert scheduler.leased_rows() == [row]
+    scheduler.renew("b", row)
+    assert scheduler.get_lease_holder(row) == "a"
+
+
+def test_expired_leases_are_reclaimed(annotations, leases):
+    scheduler = AssignmentScheduler(make_work_queue(annotations), batch_size=10, lease_seconds=0.05, leases=leases)
+    assert scheduler.next_assigned("a") == 0
+    time.sleep(0.1)
+    assert scheduler.get_lease_holder(0) is None
+    assert scheduler.next_assigned("b") == 0
+    assert scheduler.get_lease_holder(0) == "b"
+
+
+def test_reviewed_rows_are_not_served(annotations, leases):
+    queue = make_work_queue(annotations)
+    scheduler = AssignmentScheduler(queue, batch_size=3, leases=leases)
+    row = scheduler.next_assigned("a")
+    queue.mark_reviewed(row, "a")
+    scheduler.complete(row)
+    queue.mark_reviewed(1, "someone-else")
+    assert scheduler.next_assigned("a", row) == 2
+
+
+def test_release_session(annotations, leases):
+    scheduler = AssignmentScheduler(make_work_queue(annotations), batch_size=3, leases=leases)
+    scheduler.next_assigned("a")
+    scheduler.release_session("a")
+    assert scheduler.leased_rows() == []
+
+
+def test_sqlite_leases_are_shared_between_workers(annotations, tmp_path):
+    db_path = str(tmp_path / "sessions.sqlite3")
+    worker1 = AssignmentScheduler(make_work_queue(annotations), batch_size=3, leases=SQLiteLeaseBackend(db_path))
+    worker2 = AssignmentScheduler(make_work_queue(annotations), batch_size=3, leases=SQLiteLeaseBackend(db_path))
+    assert worker1.next_assigned("a") == 0
+    assert worker2.get_lease_holder(0) == "a"
+    assert worker2.next_assigned("b") == 3
+    # The session moved to the other worker: it keeps its batch
+    assert worker2.next_assigned("a", 0) == 1
+
+
+def test_rows_reviewed_on_another_worker_are_skipped(annotations, tmp_path):
+    db_path = str(tmp_path / "sessions.sqlite3")
+    reviews = SQLiteReviewBackend(str(tmp_path / "reviews.sqlite3"))
+    queue1, queue2 = make_work_queue(annotations), make_work_queue(annotations)
+    worker1 = AssignmentScheduler(queue1, batch_size=2, leases=SQLiteLeaseBackend(db_path),
+                                  get_review=reviews.get_review)
+    worker2 = AssignmentScheduler(queue2, batch_size=2, leases=SQLiteLeaseBackend(db_path),
+                                  get_review=reviews.get_review)
+
+    # Worker 1 serves rows 0 and 1, saves both and moves on
+    for row in (worker1.next_assigned("a"), worker1.next_assigned("a", 0)):
+        reviews.save_review({"image_path": queue1.get_image_path(row), "reviewer_username": "a"})
+        queue1.mark_reviewed(row, "a")
+        worker1.complete(row)
+    # Worker 2's own queue never saw those saves
+    assert not queue2.is_reviewed(0)
+    assert worker2.next_assigned("b") == 2
+    assert queue2.is_reviewed(0) and queue2.is_reviewed(1)
+
+    # A row reviewed elsewhere after it was leased is released, not served
+    reviews.save_review({"image_path": queue2.get_image_path(3), "reviewer_username": "c"})
+    assert worker2.next_assigned("b", 2) == 4
+    assert worker2.get_lease_holder(3) is None
+    reviews.close()
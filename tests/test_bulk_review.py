@@ -0,0 +1,49 @@
+import pytest
+
+from bulk_review import bulk_accept, find_agreeing_rows
+from conftest import make_annotations
+from review_store import (JsonDirectoryReviewBackend, ReviewLogBackend, SQLiteReviewBackend,
+                          WriteBehindReviewBackend)
+
+
+@pytest.fixture(params=["json", "sqlite", "log", "write-behind"])
+def store(request, tmp_path):
+    if request.param == "json":
+        backend = JsonDirectoryReviewBackend(str(tmp_path / "output"))
+    elif request.param == "sqlite":
+        backend = SQLiteReviewBackend(str(tmp_path / "reviews.sqlite3"))
+    elif request.param == "log":
+        backend = ReviewLogBackend(str(tmp_path / "log"))
+    else:
+        backend = WriteBehindReviewBackend(JsonDirectoryReviewBackend(str(tmp_path / "output")), flush_interval=60)
+    yield backend
+    backend.close()
+
+
+def test_agreeing_rows_skip_reviewed_images():
+    df = make_annotations(6)
+    assert find_agreeing_rows(df).tolist() == [0, 2, 4]
+    assert find_agreeing_rows(df, reviewed_images=[df["image_path"][2]]).tolist() == [0, 4]
+
+
+def test_dry_run_writes_nothing(store):
+    result = bulk_accept(make_annotations(6), store, dry_run=True)
+    assert result["candidates"] == 3
+    assert result["written"] == 0
+    assert store.count_reviews() == 0
+
+
+def test_review_saved_during_the_batch_is_not_overwritten(store, monkeypatch):
+    df = make_annotations(6)
+    # The scan ran before the reviewer saved row 2
+    monkeypatch.setattr(store, "iter_reviewed_images", lambda: iter(()))
+    human = {"image_path": df["image_path"][2], "reviewer_username": "alice", "reviewer_crop": "Rice"}
+    store.save_review(human)
+
+    result = bulk_accept(df, store, dry_run=False)
+    assert result["candidates"] == 3
+    assert result["written"] == 2
+    assert result["skipped"] == 1
+    assert result["rows"].tolist() == [0, 4]
+    assert store.get_review(df["image_path"][2])["reviewer_username"] == "alice"
+    assert store.get_review(df["image_path"][0])["auto_accepted"] is True
@@ -0,0 +1,141 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from combine_reviews import (build_review_report, export_review_window, get_review_summary, load_checkpoint,
+                             load_stitched_output, stitch_reviews_streaming)
+from review_store import LAYOUT_SHARDED, get_review_relpath
+
+
+def write_review(output_dir, relpath, review_data, mtime=None):
+    path = os.path.join(output_dir, relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(review_data, f)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_parquet_output_keeps_types_and_nulls(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    output_dir = str(tmp_path / "output")
+    write_review(output_dir, "a.json", {"image_path": "a.jpg", "comments": None, "auto_accepted": True})
+    write_review(output_dir, "b.json", {"image_path": "b.jpg", "comments": "blurry"})
+    output_path = str(tmp_path / "final.parquet")
+
+    assert stitch_reviews_streaming(output_dir, output_path, workers=1).startswith("Updated")
+    table = pq.read_table(output_path)
+    assert str(table.schema.field("auto_accepted").type) == "bool"
+    rows = {row["image_path"]: row for row in table.to_pylist()}
+    assert rows["a.jpg"]["auto_accepted"] is True
+    assert rows["b.jpg"]["auto_accepted"] is False
+    assert rows["a.jpg"]["comments"] is None
+    assert rows["b.jpg"]["comments"] == "blurry"
+
+    # Carried-over rows keep their types on an incremental run
+    write_review(output_dir, "c.json", {"image_path": "c.jpg"})
+    stitch_reviews_streaming(output_dir, output_path, workers=1)
+    rows = {row["image_path"]: row for row in pq.read_table(output_path).to_pylist()}
+    assert rows["a.jpg"]["auto_accepted"] is True and rows["a.jpg"]["comments"] is None
+
+
+def test_half_migrated_directory_yields_one_row_per_review(tmp_path):
+    output_dir = str(tmp_path / "output")
+    output_path = str(tmp_path / "final.csv")
+    write_review(output_dir, "a.json", {"image_path": "a.jpg", "reviewer_username": "alice"}, mtime=1000)
+    write_review(output_dir, "b.json", {"image_path": "b.jpg", "reviewer_username": "alice"}, mtime=1000)
+    stitch_reviews_streaming(output_dir, output_path, workers=1)
+
+    # A newer copy of a.json in the sharded layout next to the flat one
+    sharded = get_review_relpath("a.json", LAYOUT_SHARDED)
+    write_review(output_dir, sharded, {"image_path": "a.jpg", "reviewer_username": "bob"}, mtime=2000)
+    stitch_reviews_streaming(output_dir, output_path, workers=1)
+    df = pd.read_csv(output_path)
+    assert sorted(df["json_filename"]) == ["a.json", "b.json"]
+    assert df.set_index("image_path").at["a.jpg", "reviewer_username"] == "bob"
+
+    # Finishing the migration removes the flat copy; the output does not change
+    os.remove(os.path.join(output_dir, "a.json"))
+    assert "up to date" in stitch_reviews_streaming(output_dir, output_path, workers=1)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_summary_and_report_come_from_the_stitched_output(tmp_path, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow.parquet")
+    output_dir = str(tmp_path / "output")
+    for i, reviewer in enumerate(["alice", "alice", "bob"]):
+        write_review(output_dir, f"{i}.json", {
+            "image_path": f"{i}.jpg", "reviewer_username": reviewer, "review_timestamp": f"2024-05-0{i + 1}T10:00:00",
+            "crop1": "maize", "reviewer_crop": "maize", "selected_annotation": "1",
+        })
+    output_path = str(tmp_path / f"final{suffix}")
+    stitch_reviews_streaming(output_dir, output_path, workers=1)
+    # The review files are not needed any more
+    for i in range(3):
+        os.remove(os.path.join(output_dir, f"{i}.json"))
+
+    reviews = load_stitched_output(output_path)
+    summary = get_review_summary(reviews=reviews)
+    assert summary["total_reviews"] == 3
+    assert sorted(summary["reviewers"]) == ["alice", "bob"]
+    assert summary["latest_review"]["image"] == "2.jpg"
+    report = build_review_report(reviews)
+    assert {row["reviewer_username"]: row["reviews"] for row in report["reviewers"]} == {"alice": 2, "bob": 1}
+
+
+def export(tmp_path, checkpoint):
+    """Windowed export of tmp_path/output with a checkpoint; returns the exported image paths"""
+    output_csv = str(tmp_path / "window.csv")
+    result = export_review_window(str(tmp_path / "output"), output_csv, checkpoint_path=checkpoint)
+    assert not result.startswith("Error"), result
+    return sorted(pd.read_csv(output_csv)["image_path"])
+
+
+def save(tmp_path, name, timestamp, reviewer="alice"):
+    write_review(str(tmp_path / "output"), f"{name}.json",
+                 {"image_path": f"{name}.jpg", "reviewer_username": reviewer, "review_timestamp": timestamp})
+
+
+def test_checkpoint_resumes_after_the_last_export(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    save(tmp_path, "a", "2024-05-01T09:00:00")
+    save(tmp_path, "b", "2024-05-01T10:00:00")
+    assert export(tmp_path, checkpoint) == ["a.jpg", "b.jpg"]
+    # Resumes CHECKPOINT_OVERLAP_SECONDS before the newest exported review
+    assert load_checkpoint(checkpoint)["since"] == "2024-05-01T09:50:00"
+
+    save(tmp_path, "c", "2024-05-01T11:00:00")
+    assert export(tmp_path, checkpoint) == ["c.jpg"]
+    assert load_checkpoint(checkpoint)["newest_review"] == "2024-05-01T11:00:00"
+
+
+def test_reviews_in_the_overlap_are_exported_once(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    save(tmp_path, "a", "2024-05-01T10:00:00")
+    assert export(tmp_path, checkpoint) == ["a.jpg"]
+
+    # Saved after the export, but stamped inside the overlap (e.g. a slow save)
+    save(tmp_path, "b", "2024-05-01T09:58:00")
+    assert export(tmp_path, checkpoint) == ["b.jpg"]
+    # a re-saved with a new decision is a new version and is exported again
+    save(tmp_path, "a", "2024-05-01T10:05:00", reviewer="bob")
+    assert export(tmp_path, checkpoint) == ["a.jpg"]
+    assert sorted(key[0] for key in load_checkpoint(checkpoint)["exported"]) == ["a.json", "a.json", "b.json"]
+
+
+def test_empty_window_does_not_advance_the_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    os.makedirs(tmp_path / "output")
+    assert export(tmp_path, checkpoint) == []
+    assert "since" not in load_checkpoint(checkpoint)
+
+    save(tmp_path, "a", "2024-05-01T10:00:00")
+    export(tmp_path, checkpoint)
+    before = load_checkpoint(checkpoint)
+    # Nothing new: the CSV is written with just a header and the window stays where it was
+    assert export(tmp_path, checkpoint) == []
+    after = load_checkpoint(checkpoint)
+    assert (after["since"], after["exported"]) == (before["since"], before["exported"])
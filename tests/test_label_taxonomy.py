@@ -0,0 +1,45 @@
+import threading
+
+import pandas as pd
+
+from label_taxonomy import CompiledTaxonomy, encode_label_columns
+
+LABELS = {"Maize": {"1": "Fall_Armyworm", "2": "Healthy"}}
+
+
+def test_encoding_leaves_the_shared_normalizer_unchanged():
+    taxonomy = CompiledTaxonomy(LABELS, {"FAW": "Fall_Armyworm"})
+    names = list(taxonomy.normalizer.names)
+    labels1, labels2 = encode_label_columns(
+        [pd.Series(["['fall_armyworm']", "['Rust']"]), pd.Series(["['FAW']", "['Blight']"])],
+        taxonomy.normalizer,
+    )
+    assert taxonomy.normalizer.names == names
+    assert taxonomy.normalizer.unknown_labels == []
+    # Aliases and case resolve to the same id; different unknown labels do not
+    assert labels1.equals(labels2).tolist() == [True, False]
+    assert not taxonomy.is_valid_issue("Maize", "Rust")
+
+
+def test_concurrent_encodes_keep_unknown_labels_apart():
+    taxonomy = CompiledTaxonomy(LABELS)
+    results, errors = [], []
+
+    def encode(k):
+        try:
+            column = pd.Series([f"['Unknown_{k}_{i}']" for i in range(200)])
+            labels1, labels2 = encode_label_columns([column, column.iloc[::-1].reset_index(drop=True)],
+                                                    taxonomy.normalizer)
+            results.append(labels1.equals(labels2).sum())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=encode, args=(k,)) for k in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    # A reversed column of 200 distinct labels matches itself on no row
+    assert results == [0] * 8
+    assert taxonomy.normalizer.unknown_labels == []
@@ -0,0 +1,49 @@
+from prefetch import Prefetcher
+
+
+def make_prefetcher(rows, warmed, **kwargs):
+    """Prefetcher over a mutable list of image paths, keyed by (version, image path) like the app"""
+    state = {"version": 1}
+    prefetcher = Prefetcher(warmed.append, ahead=2, behind=0, max_workers=1,
+                            key_fn=lambda index: (state["version"], rows[index]), **kwargs)
+    return prefetcher, state
+
+
+def test_warm_up_is_consumed_by_the_access():
+    warmed = []
+    prefetcher, _ = make_prefetcher(["a", "b", "c"], warmed)
+    prefetcher.schedule("s1", 0, 3)
+    prefetcher.shutdown()
+    assert sorted(warmed) == [1, 2]
+
+    assert prefetcher.record_access(1)
+    # Nothing was warmed for the revisit
+    assert not prefetcher.record_access(1)
+    stats = prefetcher.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_reloaded_csv_does_not_look_warm():
+    rows = ["a", "b", "c"]
+    prefetcher, state = make_prefetcher(rows, [])
+    prefetcher.schedule("s1", 0, 3)
+    prefetcher.shutdown()
+
+    state["version"] += 1
+    rows[1] = "z"
+    assert not prefetcher.record_access(1)
+    assert not prefetcher.record_access(2)
+
+
+def test_expired_and_invalidated_warm_ups_are_misses():
+    prefetcher, _ = make_prefetcher(["a", "b", "c"], [], max_age=0)
+    prefetcher.schedule("s1", 0, 3)
+    prefetcher.shutdown()
+    assert not prefetcher.record_access(1)
+
+    prefetcher, _ = make_prefetcher(["a", "b", "c"], [])
+    prefetcher.schedule("s1", 0, 3)
+    prefetcher.shutdown()
+    prefetcher.invalidate((1, "b"))
+    assert not prefetcher.record_access(1)
+    assert prefetcher.record_access(2)
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+from review_store import (JsonDirectoryReviewBackend, SQLiteReviewBackend, get_disambiguated_filename,
+                          get_image_filename_from_path, import_json_directory)
+
+
+def review(image_path: str, reviewer: str = "alice", timestamp: str = "2024-05-01T12:00:00") -> dict:
+    return {"image_path": image_path, "reviewer_username": reviewer, "review_timestamp": timestamp}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "json":
+        store = JsonDirectoryReviewBackend(str(tmp_path / "output"))
+    else:
+        store = SQLiteReviewBackend(str(tmp_path / "reviews.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_save_overwrites_and_counts(backend):
+    assert backend.get_review("/data/a.jpg") is None
+    assert backend.save_review(review("/data/a.jpg")) == "_data_a.json"
+    backend.save_reviews([review("/data/b.jpg"), review("/data/a.jpg", "bob")])
+
+    assert backend.get_review("/data/a.jpg")["reviewer_username"] == "bob"
+    assert backend.count_reviews() == 2
+    assert sorted(backend.iter_reviewed_images()) == [("/data/a.jpg", "bob"), ("/data/b.jpg", "alice")]
+    assert sorted(name for name, _ in backend.iter_reviews()) == ["_data_a.json", "_data_b.json"]
+
+
+def test_save_new_reviews_keeps_existing_ones(backend):
+    backend.save_review(review("/data/a.jpg", "alice"))
+    written = backend.save_new_reviews([review("/data/a.jpg", "bulk"), review("/data/b.jpg", "bulk")])
+    assert [item["image_path"] for item in written] == ["/data/b.jpg"]
+    assert backend.get_review("/data/a.jpg")["reviewer_username"] == "alice"
+    assert backend.get_review("/data/b.jpg")["reviewer_username"] == "bulk"
+
+
+def test_window_filters_by_reviewer_and_time(backend):
+    backend.save_reviews([
+        review("/data/a.jpg", "alice", "2024-05-01T09:00:00"),
+        review("/data/b.jpg", "bob", "2024-05-01T10:30:00.250000"),
+        review("/data/c.jpg", "alice", "2024-05-02T08:00:00"),
+    ])
+    by_reviewer = {data["image_path"] for _, data in backend.iter_reviews_window(reviewers=["alice"])}
+    assert by_reviewer == {"/data/a.jpg", "/data/c.jpg"}
+
+    # The window may over-report (the JSON backend filters by mtime), never under-report
+    window = {data["image_path"] for _, data in backend.iter_reviews_window(
+        since=datetime(2024, 5, 1, 10), until=datetime(2024, 5, 1, 10, 30))}
+    assert "/data/b.jpg" in window
+    if isinstance(backend, SQLiteReviewBackend):
+        assert window == {"/data/b.jpg"}
+
+
+def test_colliding_filenames_keep_separate_reviews(tmp_path):
+    paths = ["/data/a.jpg", "/data/a.png"]
+    assert get_image_filename_from_path(paths[0]) == get_image_filename_from_path(paths[1])
+    store = JsonDirectoryReviewBackend(str(tmp_path), filename_fn=get_disambiguated_filename)
+    store.save_review(review(paths[0], "alice"))
+    store.save_review(review(paths[1], "bob"))
+    assert store.get_review(paths[0])["reviewer_username"] == "alice"
+    assert store.get_review(paths[1])["reviewer_username"] == "bob"
+    assert store.count_reviews() == 2
+
+
+def test_import_json_directory(tmp_path):
+    source = JsonDirectoryReviewBackend(str(tmp_path / "output"))
+    source.save_reviews([review(f"/data/{i}.jpg", "alice" if i % 2 else "bob") for i in range(5)])
+
+    db_path = str(tmp_path / "reviews.sqlite3")
+    assert import_json_directory(str(tmp_path / "output"), db_path, batch_size=2) == 5
+    target = SQLiteReviewBackend(db_path)
+    assert target.count_reviews() == 5
+    assert len(list(target.get_reviews_by_reviewer("alice"))) == 2
+    assert target.get_review("/data/3.jpg") == source.get_review("/data/3.jpg")
+    target.close()
@@ -0,0 +1,52 @@
+import os
+
+from review_store import (LAYOUT_FLAT, LAYOUT_SHARDED, JsonDirectoryReviewBackend, get_review_relpath,
+                          migrate_layout, read_layout_marker)
+
+
+def review(i: int) -> dict:
+    return {"image_path": f"/data/img_{i}.jpg", "reviewer_username": "alice"}
+
+
+def test_migration_round_trip(tmp_path):
+    output_dir = str(tmp_path / "output")
+    flat = JsonDirectoryReviewBackend(output_dir)
+    flat.save_reviews([review(i) for i in range(5)])
+    assert read_layout_marker(output_dir) == LAYOUT_FLAT
+
+    assert migrate_layout(output_dir, LAYOUT_SHARDED) == 5
+    assert read_layout_marker(output_dir) == LAYOUT_SHARDED
+    assert os.path.isfile(os.path.join(output_dir, get_review_relpath("_data_img_3.json", LAYOUT_SHARDED)))
+    assert not any(name.endswith(".json") for name in os.listdir(output_dir))
+    # Re-running a finished migration moves nothing
+    assert migrate_layout(output_dir, LAYOUT_SHARDED) == 0
+
+    sharded = JsonDirectoryReviewBackend(output_dir)
+    assert sharded.layout == LAYOUT_SHARDED
+    assert sharded.count_reviews() == 5
+    assert sharded.get_review("/data/img_3.jpg")["reviewer_username"] == "alice"
+
+    assert migrate_layout(output_dir, LAYOUT_FLAT) == 5
+    # The emptied shard directories are removed
+    assert sorted(os.listdir(output_dir)) == [".review_layout"] + sorted(f"_data_img_{i}.json" for i in range(5))
+    assert JsonDirectoryReviewBackend(output_dir).get_review("/data/img_3.jpg") is not None
+
+
+def test_half_migrated_directory_reads_both_layouts(tmp_path):
+    output_dir = str(tmp_path / "output")
+    JsonDirectoryReviewBackend(output_dir).save_reviews([review(0), review(1)])
+    # Move one file by hand, as an interrupted migration would leave it
+    target = os.path.join(output_dir, get_review_relpath("_data_img_1.json", LAYOUT_SHARDED))
+    os.makedirs(os.path.dirname(target))
+    os.replace(os.path.join(output_dir, "_data_img_1.json"), target)
+
+    store = JsonDirectoryReviewBackend(output_dir, layout=LAYOUT_SHARDED)
+    assert store.get_review("/data/img_0.jpg") is not None
+    assert store.get_review("/data/img_1.jpg") is not None
+    assert store.count_reviews() == 2
+
+    # Saving in the new layout drops the stale flat copy
+    store.save_review(dict(review(0), reviewer_username="bob"))
+    assert store.count_reviews() == 2
+    assert not os.path.exists(os.path.join(output_dir, "_data_img_0.json"))
+    assert store.get_review("/data/img_0.jpg")["reviewer_username"] == "bob"
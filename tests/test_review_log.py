@@ -0,0 +1,123 @@
+import os
+import threading
+
+from annotation_store import AnnotationIndex
+from combine_reviews import load_review_history, load_reviews
+from review_store import ReviewLogBackend, iter_review_log
+
+
+def review(image_path: str, reviewer: str = "alice", crop: str = "maize") -> dict:
+    return {"image_path": image_path, "reviewer_username": reviewer, "reviewer_crop": crop}
+
+
+def open_log(log_dir, **kwargs) -> ReviewLogBackend:
+    # check_interval=0: always look for appends by the other instances
+    return ReviewLogBackend(str(log_dir), compact_every=0, check_interval=0, **kwargs)
+
+
+def test_latest_version_wins_and_history_is_kept(tmp_path):
+    log = open_log(tmp_path)
+    log.save_review(review("a.jpg", "alice"))
+    log.save_review(review("b.jpg", "alice"))
+    log.save_review(review("a.jpg", "bob"))
+
+    assert log.get_review("a.jpg")["reviewer_username"] == "bob"
+    assert log.count_reviews() == 2
+    assert [version["reviewer_username"] for version in log.iter_history("a.jpg")] == ["alice", "bob"]
+    assert len(list(iter_review_log(str(tmp_path)))) == 3
+    log.close()
+
+    # A new process rebuilds the same index by replaying the log
+    reopened = open_log(tmp_path)
+    assert reopened.get_review("a.jpg")["reviewer_username"] == "bob"
+    assert sorted(image_path for image_path, _ in reopened.iter_reviewed_images()) == ["a.jpg", "b.jpg"]
+    reopened.close()
+
+
+def test_partial_last_line_is_left_for_later(tmp_path):
+    log = open_log(tmp_path)
+    log.save_review(review("a.jpg"))
+    with open(tmp_path / ReviewLogBackend.LOG_NAME, "ab") as f:
+        f.write(b'{"image_path": "b.jpg"')
+    reader = open_log(tmp_path)
+    assert reader.count_reviews() == 1
+    with open(tmp_path / ReviewLogBackend.LOG_NAME, "ab") as f:
+        f.write(b', "reviewer_username": "carol"}\n')
+    assert reader.get_review("b.jpg")["reviewer_username"] == "carol"
+    log.close()
+    reader.close()
+
+
+def test_compaction_snapshot_and_later_appends(tmp_path):
+    log = open_log(tmp_path)
+    log.save_reviews([review(f"{i}.jpg") for i in range(5)])
+    log.save_review(review("0.jpg", "bob"))
+    assert log.compact() == 5
+    snapshots = [name for name in os.listdir(tmp_path) if name.startswith("snapshot-")]
+    assert len(snapshots) == 2  # data and index
+    log.save_review(review("1.jpg", "carol"))
+    assert log.get_review("0.jpg")["reviewer_username"] == "bob"
+    assert log.get_review("1.jpg")["reviewer_username"] == "carol"
+    log.close()
+
+    # Opening starts from the snapshot and replays only what came after it
+    reopened = open_log(tmp_path)
+    assert reopened.get_stats()["replayed"] == 1
+    assert reopened.get_review("0.jpg")["reviewer_username"] == "bob"
+    assert reopened.get_review("1.jpg")["reviewer_username"] == "carol"
+    assert reopened.count_reviews() == 5
+    # A second compaction supersedes the first snapshot
+    assert reopened.compact() == 5
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("snapshot-")]) == 2
+    assert dict(reopened.iter_reviews())["1.json"]["reviewer_username"] == "carol"
+    reopened.close()
+
+
+def test_concurrent_appends_from_two_writers(tmp_path):
+    writers = [open_log(tmp_path), open_log(tmp_path)]
+
+    def append(writer, prefix):
+        for i in range(50):
+            writer.save_reviews([review(f"{prefix}-{i}-{j}.jpg") for j in range(3)])
+
+    threads = [threading.Thread(target=append, args=(writer, f"w{k}")) for k, writer in enumerate(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reader = open_log(tmp_path)
+    assert reader.count_reviews() == 300
+    assert len(list(iter_review_log(str(tmp_path)))) == 300
+    for writer in writers:
+        assert writer.count_reviews() == 300
+        assert writer.get_review("w1-49-2.jpg")["image_path"] == "w1-49-2.jpg"
+        writer.close()
+    reader.close()
+
+
+def test_save_new_reviews_skips_images_another_writer_saved(tmp_path):
+    first, second = open_log(tmp_path), open_log(tmp_path)
+    first.save_review(review("a.jpg", "alice"))
+    written = second.save_new_reviews([review("a.jpg", "bulk"), review("b.jpg", "bulk")])
+    assert [item["image_path"] for item in written] == ["b.jpg"]
+    assert second.get_review("a.jpg")["reviewer_username"] == "alice"
+    first.close()
+    second.close()
+
+
+def test_history_names_colliding_images_like_the_store(tmp_path):
+    # Both images map to the plain review filename a_b_c.json
+    paths = ["a/b_c.png", "a_b/c.png"]
+    filename_fn = AnnotationIndex(paths).get_review_filename
+    log = open_log(tmp_path, filename_fn=filename_fn)
+    log.save_reviews([review(paths[0], "alice"), review(paths[1], "bob"), review(paths[0], "carol")])
+    log.close()
+
+    history, _ = load_review_history(str(tmp_path), filename_fn=filename_fn)
+    latest, _ = load_reviews(review_log=str(tmp_path), filename_fn=filename_fn)
+    assert history["json_filename"].nunique() == 2
+    assert set(history["json_filename"]) == set(latest["json_filename"])
+    newest = history[history["is_latest"]]
+    assert (set(zip(newest["json_filename"], newest["reviewer_username"]))
+            == set(zip(latest["json_filename"], latest["reviewer_username"])))
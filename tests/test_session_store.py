@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from session_store import InMemorySessionBackend, SQLiteSessionBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(ttl_seconds=3600):
+        if request.param == "memory":
+            return InMemorySessionBackend(ttl_seconds, sweep_interval=0)
+        return SQLiteSessionBackend(str(tmp_path / "sessions.sqlite3"), ttl_seconds, sweep_interval=0)
+    return make
+
+
+def test_sessions_and_last_position(make_store):
+    store = make_store()
+    store.create("t1", {"username": "alice", "current_index": 0})
+    session = store.get("t1")
+    session["current_index"] = 7
+    store.update("t1", session)
+    assert store.get("t1")["current_index"] == 7
+    assert store.get_last_position("alice") == 7
+    assert store.get_last_position("bob") is None
+    store.delete("t1")
+    assert store.get("t1") is None
+    # The position outlives the session
+    assert store.get_last_position("alice") == 7
+    assert store.get("unknown") is None
+
+
+def test_expired_sessions_are_reported_once(make_store):
+    store = make_store(ttl_seconds=0.05)
+    store.create("idle", {"username": "alice"})
+    store.create("read", {"username": "bob"})
+    time.sleep(0.1)
+    # Found expired on access: reported along with the sweep of the other one
+    assert store.get("read") is None
+    assert sorted(store.sweep_if_due()) == ["idle", "read"]
+    assert store.sweep_if_due() == []
+
+
+def test_sessions_evicted_by_the_cap_are_reported():
+    store = InMemorySessionBackend(3600, max_sessions=2, sweep_interval=3600)
+    for token in ("a", "b", "c"):
+        store.create(token, {"username": token})
+    assert store.get("a") is None
+    assert store.sweep_if_due() == ["a"]
+    # Least recently used, not oldest: touching b makes c the next to go
+    store.get("b")
+    store.create("d", {"username": "d"})
+    assert store.sweep_if_due() == ["c"]
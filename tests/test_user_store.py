@@ -0,0 +1,70 @@
+import os
+
+from user_store import UserStore, hash_password, migrate_plaintext, read_users, verify_password, write_users
+
+# Cheap hashes keep the tests fast; the cost is stored with each hash
+ITERATIONS = 1000
+
+
+def write_and_touch(users_path, users, mtime):
+    """Rewrite users.json with a distinct mtime, so the change is seen even within one clock tick"""
+    write_users(str(users_path), users)
+    os.utime(users_path, ns=(mtime, mtime))
+
+
+def test_hash_round_trip():
+    encoded = hash_password("secret", ITERATIONS)
+    assert encoded.startswith(f"pbkdf2_sha256${ITERATIONS}$")
+    assert encoded != hash_password("secret", ITERATIONS)  # salted
+    assert verify_password("secret", encoded)
+    assert not verify_password("Secret", encoded)
+    assert not verify_password("secret", "pbkdf2_sha256$garbage")
+    # Legacy plaintext entries still verify
+    assert verify_password("secret", "secret")
+
+
+def test_authenticate_and_cache(tmp_path):
+    users_path = tmp_path / "users.json"
+    write_users(str(users_path), {"alice": hash_password("secret", ITERATIONS)})
+    store = UserStore(str(users_path), check_interval=0)
+
+    assert store.authenticate("alice", "secret")
+    assert store.authenticate("alice", "secret")
+    assert not store.authenticate("alice", "wrong")
+    assert not store.authenticate("mallory", "secret")
+    stats = store.get_stats()
+    assert (stats["logins"], stats["cache_hits"], stats["failures"]) == (4, 1, 2)
+
+    uncached = UserStore(str(users_path), check_interval=0, cache_ttl=0)
+    assert uncached.authenticate("alice", "secret")
+    assert uncached.authenticate("alice", "secret")
+    assert uncached.get_stats()["cache_hits"] == 0
+
+
+def test_changed_file_is_reloaded(tmp_path):
+    users_path = tmp_path / "users.json"
+    write_and_touch(users_path, {"alice": hash_password("secret", ITERATIONS)}, 1_000_000_000)
+    store = UserStore(str(users_path), check_interval=0)
+    assert store.authenticate("alice", "secret")
+
+    # A password change invalidates the cached login
+    write_and_touch(users_path, {"alice": hash_password("new", ITERATIONS),
+                                 "bob": hash_password("hunter2", ITERATIONS)}, 2_000_000_000)
+    assert not store.authenticate("alice", "secret")
+    assert store.authenticate("alice", "new")
+    assert store.authenticate("bob", "hunter2")
+
+    # A file that is mid-edit keeps the previous users
+    users_path.write_text('{"users": {')
+    os.utime(users_path, ns=(3_000_000_000, 3_000_000_000))
+    assert store.authenticate("bob", "hunter2")
+
+
+def test_migrate_plaintext(tmp_path):
+    users_path = str(tmp_path / "users.json")
+    write_users(users_path, {"alice": "secret", "bob": hash_password("hunter2", ITERATIONS)})
+    assert migrate_plaintext(users_path, ITERATIONS) == (1, 1)
+    users = read_users(users_path)
+    assert users["alice"] != "secret"
+    assert verify_password("secret", users["alice"])
+    assert migrate_plaintext(users_path, ITERATIONS) == (0, 2)
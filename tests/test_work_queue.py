@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from conftest import make_annotations, make_work_queue
+from work_queue import (MODE_BROKEN, MODE_CROP, MODE_DISAGREEING, MODE_REVIEWER, MODE_UNREVIEWED,
+                        FenwickBitset)
+
+
+def brute_next(mask, row):
+    return next((r for r in range(row + 1, len(mask)) if mask[r]), None)
+
+
+def brute_previous(mask, row):
+    return next((r for r in range(min(row, len(mask)) - 1, -1, -1) if mask[r]), None)
+
+
+@pytest.mark.parametrize("size", [0, 1, 7, 64, 100])
+def test_fenwick_matches_a_linear_scan(size):
+    rng = np.random.default_rng(size)
+    mask = rng.random(size) < 0.3
+    bitset = FenwickBitset(mask)
+    for row, value in zip(rng.integers(0, max(size, 1), 40), rng.random(40) < 0.5):
+        if size:
+            bitset.set(int(row), bool(value))
+            mask[row] = value
+        assert bitset.count == int(mask.sum())
+        for probe in range(-1, size + 1):
+            assert bitset.next_after(probe) == brute_next(mask, probe)
+            assert bitset.previous_before(probe) == brute_previous(mask, probe)
+            assert bitset.rank(max(probe, 0)) == int(mask[:max(probe, 0)].sum())
+
+
+def test_filters_follow_saved_reviews():
+    # Odd rows disagree on the crop
+    queue = make_work_queue(make_annotations(10), reviews=[("/data/imgs/img_0003.jpg", "alice")])
+    assert queue.count(MODE_UNREVIEWED) == 9
+    assert queue.count(MODE_DISAGREEING) == 4
+    assert queue.find_next(1, MODE_DISAGREEING) == 5
+    assert queue.count(MODE_REVIEWER, "alice") == 1
+
+    queue.mark_reviewed(5, "bob")
+    assert queue.is_reviewed(5)
+    assert queue.find_next(1, MODE_DISAGREEING) == 7
+    assert queue.find_previous(7, MODE_DISAGREEING) == 1
+    assert queue.count(MODE_REVIEWER, "bob") == 1
+
+    # Re-reviewing moves the row between reviewer filters
+    queue.mark_reviewed(3, "bob")
+    assert queue.count(MODE_REVIEWER, "alice") == 0
+    assert queue.count(MODE_REVIEWER, "bob") == 2
+
+    queue.mark_reviewed_rows([0, 1, 2], "carol")
+    assert queue.count(MODE_UNREVIEWED) == 5
+    assert queue.find_next(-1, MODE_DISAGREEING) == 7
+    assert queue.count(MODE_REVIEWER, "carol") == 3
+
+
+def test_crop_filter_is_case_insensitive():
+    queue = make_work_queue(make_annotations(10))
+    assert queue.count(MODE_CROP, "rice") == 5
+    assert queue.count(MODE_CROP, "MAIZE") == 10
+    with pytest.raises(ValueError):
+        queue.count("nonsense")
+
+
+def test_broken_images_are_never_work():
+    broken = np.zeros(10, dtype=bool)
+    broken[[1, 2]] = True
+    queue = make_work_queue(make_annotations(10), broken=broken)
+    assert queue.count(MODE_BROKEN) == 2
+    assert queue.find_next(0, MODE_UNREVIEWED) == 3
+    assert queue.find_next(0, MODE_DISAGREEING) == 3
+
+    queue.refresh_broken(np.zeros(10, dtype=bool))
+    assert queue.find_next(0, MODE_UNREVIEWED) == 1
+
+
+def test_duplicate_rows_share_a_review():
+    df = make_annotations(6)
+    df.loc[4, "image_path"] = df.loc[1, "image_path"]
+    queue = make_work_queue(df)
+    queue.mark_reviewed(1, "alice")
+    assert queue.is_reviewed(4)
+    assert queue.count(MODE_REVIEWER, "alice") == 2
+
+    queue = make_work_queue(df, reviews=[(df.loc[1, "image_path"], "alice")])
+    assert queue.is_reviewed(4)
+    queue = make_work_queue(df)
+    queue.mark_reviewed_rows([1], "bob")
+    assert queue.is_reviewed(4)
+    assert queue.count(MODE_UNREVIEWED) == 4
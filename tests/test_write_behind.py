@@ -0,0 +1,69 @@
+from review_store import ReviewBackend, WriteBehindReviewBackend
+
+
+class FlakyBackend(ReviewBackend):
+    """Stores reviews in a dict; save_reviews raises while failing is set"""
+
+    def __init__(self):
+        self.reviews = {}
+        self.failing = False
+        self.closed = False
+
+    def get_review(self, image_path):
+        return self.reviews.get(image_path)
+
+    def save_reviews(self, reviews):
+        if self.failing:
+            raise OSError("disk full")
+        reviews = list(reviews)
+        for review in reviews:
+            self.reviews[review["image_path"]] = review
+        return len(reviews)
+
+    def iter_reviews(self):
+        return iter(self.reviews.items())
+
+    def close(self):
+        self.closed = True
+
+
+def review(image_path, reviewer="alice"):
+    return {"image_path": image_path, "reviewer_username": reviewer}
+
+
+def test_queued_reviews_are_readable_before_the_flush():
+    backend = FlakyBackend()
+    writer = WriteBehindReviewBackend(backend, flush_interval=60)
+    writer.save_review(review("a.jpg"))
+    assert writer.get_review("a.jpg")["reviewer_username"] == "alice"
+    assert backend.reviews == {}
+    assert writer.flush() == 1
+    assert "a.jpg" in backend.reviews
+    writer.close()
+
+
+def test_failed_flush_is_reported_and_retried():
+    backend = FlakyBackend()
+    writer = WriteBehindReviewBackend(backend, flush_interval=60)
+    backend.failing = True
+    writer.save_review(review("a.jpg"))
+    assert writer.flush() == 0
+    assert writer.get_write_error() == "OSError: disk full"
+    assert writer.get_stats()["failing"] == 1
+    assert writer.get_stats()["pending"] == 1
+    # A newer save of the same image wins over the failed one
+    writer.save_review(review("a.jpg", "bob"))
+    backend.failing = False
+    assert writer.flush() == 1
+    assert writer.get_write_error() is None
+    assert backend.reviews["a.jpg"]["reviewer_username"] == "bob"
+    writer.close()
+
+
+def test_close_flushes_and_closes_the_backend():
+    backend = FlakyBackend()
+    writer = WriteBehindReviewBackend(backend, flush_interval=60)
+    writer.save_reviews([review("a.jpg"), review("b.jpg")])
+    writer.close()
+    assert set(backend.reviews) == {"a.jpg", "b.jpg"}
+    assert backend.closed
@@ -0,0 +1,129 @@
+"""
+Persistent on-disk thumbnail cache for review images.
+
+Thumbnails are keyed by (source path, source mtime, max_size), so edits to an
+image or a different display size never serve a stale file, and two images
+with the same basename in different folders never collide. The cache is kept
+under a byte budget with least-recently-used eviction and every file is
+written atomically (temp file + rename) so concurrent reviewers never read a
+half-written thumbnail.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from PIL import Image
+
+
+def compute_resized_size(width: int, height: int, max_size: int):
+    """Return (width, height) with the longest side scaled to max_size"""
+    if width > height:
+        return max_size, int((height * max_size) / width)
+    return int((width * max_size) / height), max_size
+
+
+class ThumbnailCache:
+    """Content-addressed thumbnail cache with an LRU byte budget"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # filename -> size, oldest first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._scanned = False
+
+    def _scan(self):
+        """Index thumbnails left over from previous runs, oldest access first"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        existing = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.startswith(".tmp-"):
+                    continue
+                stat = entry.stat()
+                existing.append((stat.st_atime, entry.name, stat.st_size))
+        existing.sort()
+        for _, name, size in existing:
+            self._entries[name] = size
+            self._total_bytes += size
+        self._scanned = True
+
+    def cache_key(self, image_path: str, mtime_ns: int, max_size: int) -> str:
+        """Return the cache filename for a source image at a given size"""
+        key = f"{os.path.abspath(image_path)}|{mtime_ns}|{max_size}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        ext = os.path.splitext(image_path)[1].lower() or ".png"
+        return f"{digest}{ext}"
+
+    def _lookup(self, image_path: str, max_size: int) -> Tuple[Optional[str], Optional[str], bool]:
+        """Return (cache filename, path, hit) for image_path, or (None, None, False) if it cannot be stat'ed"""
+        try:
+            mtime_ns = os.stat(image_path).st_mtime_ns
+        except OSError:
+            return None, None, False
+
+        name = self.cache_key(image_path, mtime_ns, max_size)
+        path = os.path.join(self.cache_dir, name)
+        with self._lock:
+            if not self._scanned:
+                self._scan()
+            if name in self._entries:
+                if os.path.exists(path):
+                    # Cache hit: no PIL work at all
+                    self._entries.move_to_end(name)
+                    return name, path, True
+                # Evicted by another process sharing the cache dir
+                self._total_bytes -= self._entries.pop(name)
+        return name, path, False
+
+    def get_cached(self, image_path: str, max_size: int = 640) -> Optional[str]:
+        """Return the thumbnail path if it is already cached, without generating it"""
+        _, path, hit = self._lookup(image_path, max_size)
+        return path if hit else None
+
+    def get(self, image_path: str, max_size: int = 640) -> Optional[str]:
+        """Return a thumbnail path for image_path, generating it on a miss"""
+        name, path, hit = self._lookup(image_path, max_size)
+        if name is None or hit:
+            return path
+
+        with Image.open(image_path) as img:
+            new_size = compute_resized_size(img.width, img.height, max_size)
+            resized_img = img.resize(new_size, Image.Resampling.LANCZOS)
+
+            # Write to a temp file in the cache dir, then atomically rename
+            fd, temp_path = tempfile.mkstemp(
+                dir=self.cache_dir, prefix=".tmp-", suffix=os.path.splitext(name)[1]
+            )
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    resized_img.save(f, format=img.format or "PNG")
+                os.replace(temp_path, path)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+        size = os.path.getsize(path)
+        with self._lock:
+            if name not in self._entries:
+                self._total_bytes += size
+            self._entries[name] = size
+            self._entries.move_to_end(name)
+            self._evict()
+        return path
+
+    def _evict(self):
+        """Drop least-recently-used thumbnails until under the byte budget"""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Hashed reviewer credentials from ``users.json``, reloaded when the file changes.
+
+Passwords are stored as salted PBKDF2-SHA256 hashes::
+
+    pbkdf2_sha256$<iterations>$<salt>$<hash>
+
+The iteration count is stored with each hash, so the cost can be raised for
+new passwords without invalidating existing ones (``benchmark.py login``
+measures what a given cost means for login latency). Hashes are compared in
+constant time, and unknown usernames are checked against a dummy hash so
+they take as long as a wrong password.
+
+A successful login is remembered as a keyed HMAC of the password (the key
+never leaves the process) until ``cache_ttl`` runs out or the user's stored
+hash changes, so repeat logins skip the expensive hash. Failed logins are
+never cached.
+
+Plaintext entries from older ``users.json`` files are still accepted, with a
+warning; ``python user_store.py migrate`` hashes them in place.
+"""
+
+import argparse
+import base64
+import getpass
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+HASH_ALGORITHM = "pbkdf2_sha256"
+DEFAULT_ITERATIONS = 600_000
+SALT_BYTES = 16
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_password(password: str, iterations: int = DEFAULT_ITERATIONS, salt: Optional[bytes] = None) -> str:
+    """Return an encoded salted PBKDF2-SHA256 hash of password"""
+    salt = salt or secrets.token_bytes(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{HASH_ALGORITHM}${iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def is_password_hash(value: str) -> bool:
+    """Whether a users.json entry is a hash (as opposed to a legacy plaintext password)"""
+    return isinstance(value, str) and value.startswith(HASH_ALGORITHM + "$")
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    """Check password against an encoded hash (or legacy plaintext entry) in constant time"""
+    if not is_password_hash(encoded):
+        return hmac.compare_digest(password.encode("utf-8"), str(encoded).encode("utf-8"))
+    try:
+        _, iterations, salt, expected = encoded.split("$")
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), _b64decode(salt), int(iterations))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(digest, _b64decode(expected))
+
+
+class UserStore:
+    """users.json credentials with hot reload and a cache of verified logins"""
+
+    def __init__(self, users_path: str, check_interval: float = 2.0, cache_ttl: float = 12 * 3600):
+        """
+        Args:
+            users_path: users.json with {"users": {username: hash}}
+            check_interval: Minimum seconds between checks of the file for changes
+            cache_ttl: Seconds a verified login is remembered (0 disables the cache)
+        """
+        self.users_path = users_path
+        self.check_interval = check_interval
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._signature = ()  # Never matches a real signature, so the first get_users() loads
+        self._next_check = 0.0
+        self._users = {}
+        self._cache_key = secrets.token_bytes(32)
+        self._verified = {}  # username -> (stored hash, password HMAC, expires_at)
+        self._dummy_hash = None  # Matches the highest cost in users.json, set on load
+        self._stats = {"logins": 0, "cache_hits": 0, "failures": 0}
+        self.get_users()
+
+    def _file_signature(self):
+        """Return (mtime_ns, size) of users.json, or None if missing"""
+        try:
+            stat = os.stat(self.users_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get_users(self) -> Dict[str, str]:
+        """Return {username: stored hash}, reloading users.json if it changed on disk"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._users
+
+        with self._lock:
+            if now < self._next_check:
+                return self._users
+            self._next_check = now + self.check_interval
+            signature = self._file_signature()
+            if signature == self._signature:
+                return self._users
+            if signature is None:
+                print(f"Error: {self.users_path} not found. Please create the users.json file.")
+                self._signature = None
+                return self._users
+            try:
+                with open(self.users_path, 'r') as f:
+                    users = json.load(f).get("users", {})
+            except json.JSONDecodeError as e:
+                # Keep the previous users (e.g. file is mid-edit)
+                print(f"Error parsing {self.users_path}: {e}")
+                return self._users
+            except Exception as e:
+                print(f"Error loading users: {e}")
+                return self._users
+            plaintext = sorted(username for username, value in users.items() if not is_password_hash(value))
+            if plaintext:
+                print(f"Warning: plaintext passwords in {self.users_path} for {', '.join(plaintext)}; "
+                      f"run `python user_store.py migrate --users {self.users_path}` to hash them.")
+            if self._signature:
+                print(f"Reloaded users from {self.users_path}")
+            self._signature = signature
+            self._users = users
+            self._update_dummy_hash(users)
+            # Forget verified logins of removed users; changed hashes no longer match their entries
+            self._verified = {username: entry for username, entry in self._verified.items() if username in users}
+            return users
+
+    def _update_dummy_hash(self, users: Dict[str, str]):
+        """Keep the dummy hash as expensive as the costliest real one"""
+        costs = [int(value.split("$")[1]) for value in users.values()
+                 if is_password_hash(value) and value.split("$")[1].isdigit()]
+        iterations = max(costs, default=0)
+        prefix = f"{HASH_ALGORITHM}${iterations}$"
+        if iterations and (self._dummy_hash is None or not self._dummy_hash.startswith(prefix)):
+            self._dummy_hash = hash_password(secrets.token_urlsafe(16), iterations)
+
+    def _password_mac(self, password: str) -> bytes:
+        return hmac.new(self._cache_key, password.encode("utf-8"), hashlib.sha256).digest()
+
+    def authenticate(self, username: str, password: str) -> bool:
+        """Verify a username/password pair"""
+        users = self.get_users()
+        stored = users.get(username)
+        self._stats["logins"] += 1
+        if stored is None:
+            # Same cost as a wrong password, so usernames cannot be probed by timing
+            if self._dummy_hash is not None:
+                verify_password(password, self._dummy_hash)
+            self._stats["failures"] += 1
+            return False
+
+        mac = self._password_mac(password)
+        cached = self._verified.get(username)
+        if cached is not None and cached[0] == stored and cached[2] > time.monotonic():
+            if hmac.compare_digest(cached[1], mac):
+                self._stats["cache_hits"] += 1
+                return True
+
+        if not verify_password(password, stored):
+            self._stats["failures"] += 1
+            return False
+        if self.cache_ttl > 0:
+            self._verified[username] = (stored, mac, time.monotonic() + self.cache_ttl)
+        return True
+
+    def get_stats(self) -> dict:
+        """Login counters, for tuning the hash cost and cache TTL"""
+        return dict(self._stats, users=len(self._users), cached=len(self._verified))
+
+
+def write_users(users_path: str, users: Dict[str, str]):
+    """Atomically rewrite users.json"""
+    directory = os.path.dirname(os.path.abspath(users_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"users": users}, f, indent=2)
+        os.replace(temp_path, users_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_users(users_path: str) -> Dict[str, str]:
+    """Read {username: entry} from users.json, or {} if it does not exist"""
+    if not os.path.exists(users_path):
+        return {}
+    with open(users_path, 'r') as f:
+        return json.load(f).get("users", {})
+
+
+def migrate_plaintext(users_path: str, iterations: int = DEFAULT_ITERATIONS) -> Tuple[int, int]:
+    """
+    Hash every plaintext password in users.json in place.
+
+    Returns:
+        tuple: (entries hashed, entries already hashed)
+    """
+    users = read_users(users_path)
+    hashed = 0
+    for username, value in users.items():
+        if not is_password_hash(value):
+            users[username] = hash_password(str(value), iterations)
+            hashed += 1
+    if hashed:
+        write_users(users_path, users)
+    return hashed, len(users) - hashed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage hashed reviewer credentials in users.json")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    hash_parser = subparsers.add_parser("hash", help="Print the hash of a password (prompted)")
+    hash_parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="PBKDF2 iterations")
+
+    set_parser = subparsers.add_parser("set", help="Add a user or change their password (prompted)")
+    set_parser.add_argument("--users", default="users.json", help="users.json to update")
+    set_parser.add_argument("--username", required=True, help="Username")
+    set_parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="PBKDF2 iterations")
+
+    migrate_parser = subparsers.add_parser("migrate", help="Hash every plaintext password in users.json")
+    migrate_parser.add_argument("--users", default="users.json", help="users.json to update")
+    migrate_parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="PBKDF2 iterations")
+
+    args = parser.parse_args()
+    if args.command == "hash":
+        print(hash_password(getpass.getpass("Password: "), args.iterations))
+    elif args.command == "set":
+        password = getpass.getpass("Password: ")
+        if password != getpass.getpass("Repeat password: "):
+            raise SystemExit("Passwords do not match")
+        users = read_users(args.users)
+        users[args.username] = hash_password(password, args.iterations)
+        write_users(args.users, users)
+        print(f"Updated {args.username} in {args.users}; running apps pick it up automatically")
+    elif args.command == "migrate":
+        hashed, existing = migrate_plaintext(args.users, args.iterations)
+        print(f"Hashed {hashed} plaintext passwords in {args.users} ({existing} already hashed)")
@@ -0,0 +1,542 @@
+"""
+Precomputed work queue for filtered navigation.
+
+Each navigation filter (unreviewed, disagreeing, by crop, by reviewer,
+broken images) is kept as a Fenwick-tree bitset over the CSV rows, so
+"next/previous row matching the filter" and "mark this row reviewed" are both
+O(log n), even for batches with millions of rows. Rows whose image failed the
+pre-flight check (image_index.py) are left out of the unreviewed and
+disagreeing filters, and so are never assigned.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from annotation_store import AnnotationIndex
+from label_taxonomy import LabelMatrix
+
+MODE_ALL = "all"
+MODE_UNREVIEWED = "unreviewed"
+MODE_DISAGREEING = "disagreeing"
+MODE_CROP = "crop"
+MODE_REVIEWER = "reviewer"
+MODE_ASSIGNED = "assigned"
+MODE_BROKEN = "broken"
+
+
+class FenwickBitset:
+    """Bitset over n rows with O(log n) update, rank and next/previous-set lookups"""
+
+    def __init__(self, mask: np.ndarray):
+        mask = np.asarray(mask, dtype=bool)
+        self.size = len(mask)
+        self.bits = mask.copy()
+        # tree[i] = number of set bits in rows (i & (i + 1)) .. i
+        cumsum = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+        rows = np.arange(self.size)
+        self.tree = (cumsum[rows + 1] - cumsum[rows & (rows + 1)]).astype(np.int64)
+        self.count = int(cumsum[-1])
+        self._top_bit = 1 << max(self.size.bit_length() - 1, 0)
+
+    def set(self, row: int, value: bool):
+        """Set or clear a row"""
+        if self.bits[row] == value:
+            return
+        self.bits[row] = value
+        delta = 1 if value else -1
+        self.count += delta
+        i = row
+        while i < self.size:
+            self.tree[i] += delta
+            i |= i + 1
+
+    def rank(self, end: int) -> int:
+        """Number of set rows in [0, end)"""
+        total = 0
+        i = min(end, self.size) - 1
+        while i >= 0:
+            total += int(self.tree[i])
+            i = (i & (i + 1)) - 1
+        return total
+
+    def select(self, k: int) -> int:
+        """Row of the k-th set bit (1-based k)"""
+        pos = -1
+        step = self._top_bit
+        while step:
+            nxt = pos + step
+            if nxt < self.size and self.tree[nxt] < k:
+                pos = nxt
+                k -= int(self.tree[nxt])
+            step >>= 1
+        return pos + 1
+
+    def next_after(self, row: int) -> Optional[int]:
+        """First set row strictly after row, or None"""
+        before = self.rank(row + 1)
+        if before >= self.count:
+            return None
+        return self.select(before + 1)
+
+    def previous_before(self, row: int) -> Optional[int]:
+        """Last set row strictly before row, or None"""
+        before = self.rank(max(row, 0))
+        if before == 0:
+            return None
+        return self.select(before)
+
+
+def normalize_crops(crops: pd.Series) -> np.ndarray:
+    """Lower-cased crop names as an array; categoricals are normalized per category, not per row"""
+    if isinstance(crops.dtype, pd.CategoricalDtype):
+        # Code -1 (missing) picks the trailing "nan", matching astype(str)
+        categories = np.append(crops.cat.categories.astype(str).str.lower().to_numpy(dtype=object), "nan")
+        return categories[crops.cat.codes.to_numpy()]
+    return crops.astype(str).str.lower().to_numpy()
+
+
+def labels_disagree(crop1: pd.Series, crop2: pd.Series, labels1: LabelMatrix, labels2: LabelMatrix) -> np.ndarray:
+    """Boolean mask of rows where the two annotation rounds disagree (normalized crops and labels)"""
+    crops_differ = normalize_crops(crop1) != normalize_crops(crop2)
+    return crops_differ | ~labels1.equals(labels2)
+
+
+class WorkQueue:
+    """Filtered navigation index over one CSV version, kept current on every save"""
+
+    def __init__(self, df: pd.DataFrame, index: AnnotationIndex, reviews: Iterable[Tuple[str, str]],
+                 label_matrices: Tuple[LabelMatrix, LabelMatrix], broken: Optional[np.ndarray] = None):
+        """
+        Args:
+            df: Annotation DataFrame
+            index: AnnotationIndex for the same CSV version
+            reviews: (image_path, reviewer_username) for every existing review
+            label_matrices: Normalized (label1, label2) matrices for the same CSV version
+            broken: Boolean mask of rows whose image is missing or cannot be decoded
+        """
+        n = len(df)
+        self.size = n
+        self._lock = threading.Lock()
+        self._reviewer_of = np.full(n, None, dtype=object)
+        reviews = list(reviews)
+        # One bulk lookup instead of one per review
+        review_rows = index.get_rows(image_path for image_path, _ in reviews)
+        for row, (_, reviewer) in zip(review_rows.tolist(), reviews):
+            if row >= 0:
+                self._reviewer_of[row] = reviewer or ""
+        # Duplicate rows of an image share its review
+        for first_row, rows in zip(index.get_rows(index.duplicate_rows), index.duplicate_rows.values()):
+            self._reviewer_of[rows] = self._reviewer_of[first_row]
+        self._index = index
+
+        reviewed = self._reviewer_of != None  # noqa: E711 (elementwise comparison)
+        self._disagree = labels_disagree(df["crop1"], df["crop2"], *label_matrices)
+        self._crop1 = normalize_crops(df["crop1"])
+        self._crop2 = normalize_crops(df["crop2"])
+        self._broken = np.asarray(broken, dtype=bool) if broken is not None else np.zeros(n, dtype=bool)
+
+        self._bitsets = {}
+        self._rebuild_work_bitsets(reviewed)
+
+    def _rebuild_work_bitsets(self, reviewed: np.ndarray):
+        """Rebuild the unreviewed, disagreeing and broken filters in O(n)"""
+        workable = ~reviewed & ~self._broken
+        self._bitsets[(MODE_UNREVIEWED, None)] = FenwickBitset(workable)
+        self._bitsets[(MODE_DISAGREEING, None)] = FenwickBitset(self._disagree & workable)
+        self._bitsets[(MODE_BROKEN, None)] = FenwickBitset(self._broken)
+
+    def refresh_labels(self, df: pd.DataFrame, label_matrices: Tuple[LabelMatrix, LabelMatrix]):
+        """Recompute disagreements after the label taxonomy changed"""
+        disagree = labels_disagree(df["crop1"], df["crop2"], *label_matrices)
+        with self._lock:
+            reviewed = self._reviewer_of != None  # noqa: E711 (elementwise comparison)
+            self._disagree = disagree
+            self._bitsets[(MODE_DISAGREEING, None)] = FenwickBitset(disagree & ~reviewed & ~self._broken)
+
+    def refresh_broken(self, broken: np.ndarray):
+        """Swap in a new broken-image mask after the image index was rebuilt"""
+        with self._lock:
+            self._broken = np.asarray(broken, dtype=bool)
+            self._rebuild_work_bitsets(self._reviewer_of != None)  # noqa: E711 (elementwise comparison)
+
+    def _get_bitset(self, mode: str, value: Optional[str]) -> FenwickBitset:
+        """Return the bitset for a filter, building crop/reviewer filters on first use"""
+        key = (mode, value)
+        bitset = self._bitsets.get(key)
+        if bitset is None:
+            if mode == MODE_CROP:
+                crop = (value or "").lower()
+                bitset = FenwickBitset((self._crop1 == crop) | (self._crop2 == crop))
+            elif mode == MODE_REVIEWER:
+                bitset = FenwickBitset(self._reviewer_of == value)
+            else:
+                raise ValueError(f"Unknown navigation mode: {mode}")
+            self._bitsets[key] = bitset
+        return bitset
+
+    def mark_reviewed(self, row: int, reviewer: str):
+        """Record a saved review for row (and any duplicate rows of the same image)"""
+        image_path = self._index.get_image_path(row)
+        with self._lock:
+            for r in self._rows_for_image(image_path):
+                previous = self._reviewer_of[r]
+                self._reviewer_of[r] = reviewer
+                self._bitsets[(MODE_UNREVIEWED, None)].set(r, False)
+                self._bitsets[(MODE_DISAGREEING, None)].set(r, False)
+                if previous != reviewer and (MODE_REVIEWER, previous) in self._bitsets:
+                    self._bitsets[(MODE_REVIEWER, previous)].set(r, False)
+                if (MODE_REVIEWER, reviewer) in self._bitsets:
+                    self._bitsets[(MODE_REVIEWER, reviewer)].set(r, True)
+
+    def mark_reviewed_rows(self, rows: Iterable[int], reviewer: str):
+        """Record many saved reviews at once (e.g. a bulk accept), rebuilding the affected bitsets in O(n)"""
+        rows = set(int(row) for row in rows)
+        duplicate_rows = self._index.duplicate_rows
+        for first_row, duplicates in zip(self._index.get_rows(duplicate_rows).tolist(), duplicate_rows.values()):
+            if first_row in rows:
+                rows.update(duplicates)
+        rows = np.fromiter(rows, dtype=np.int64)
+        with self._lock:
+            previous = set(self._reviewer_of[rows].tolist()) - {None}
+            self._reviewer_of[rows] = reviewer
+            self._rebuild_work_bitsets(self._reviewer_of != None)  # noqa: E711 (elementwise comparison)
+            # Reviewer filters are rebuilt on next use
+            for value in previous | {reviewer}:
+                self._bitsets.pop((MODE_REVIEWER, value), None)
+
+    def _rows_for_image(self, image_path: str):
+        """Rows that hold image_path (usually just one)"""
+        first_row = self._index.get_row(image_path)
+        if first_row is None:
+            return []
+        return [first_row] + self._index.duplicate_rows.get(image_path, [])
+
+    def is_reviewed(self, row: int) -> bool:
+        """Whether row already has a review"""
+        return self._reviewer_of[row] is not None
+
+    def is_broken(self, row: int) -> bool:
+        """Whether row's image failed the pre-flight check"""
+        return bool(self._broken[row])
+
+    def get_row(self, image_path: str) -> Optional[int]:
+        """First row holding image_path, or None if it is not in this CSV version"""
+        return self._index.get_row(image_path)
+
+    def get_image_path(self, row: int) -> str:
+        """Image path stored at row"""
+        return self._index.get_image_path(row)
+
+    def find_next(self, row: int, mode: str, value: Optional[str] = None) -> Optional[int]:
+        """First row after row matching the filter, or None"""
+        with self._lock:
+            return self._get_bitset(mode, value).next_after(row)
+
+    def find_previous(self, row: int, mode: str, value: Optional[str] = None) -> Optional[int]:
+        """Last row before row matching the filter, or None"""
+        with self._lock:
+            return self._get_bitset(mode, value).previous_before(row)
+
+    def count(self, mode: str, value: Optional[str] = None) -> int:
+        """Number of rows matching the filter"""
+        with self._lock:
+            return self._get_bitset(mode, value).count
+
+
+class InMemoryLeaseBackend:
+    """Process-local assignment leases, keyed by image path"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leases = {}  # image_path -> (session_token, expires_at)
+
+    def claim(self, image_paths: Iterable[str], session_token: str, expires_at: float, now: float) -> List[str]:
+        """Lease every image that is free (or whose lease ran out) to a session; return the ones claimed"""
+        claimed = []
+        with self._lock:
+            for image_path in image_paths:
+                lease = self._leases.get(image_path)
+                if lease is None or lease[1] <= now:
+                    self._leases[image_path] = (session_token, expires_at)
+                    claimed.append(image_path)
+        return claimed
+
+    def renew(self, image_path: str, session_token: str, expires_at: float, now: float) -> bool:
+        """Extend a session's unexpired lease on an image; return False if it does not hold one"""
+        with self._lock:
+            lease = self._leases.get(image_path)
+            if lease is None or lease[0] != session_token or lease[1] <= now:
+                return False
+            self._leases[image_path] = (session_token, expires_at)
+            return True
+
+    def release(self, image_path: str, session_token: Optional[str] = None):
+        """Drop the lease on an image (only if session_token holds it, when given)"""
+        with self._lock:
+            lease = self._leases.get(image_path)
+            if lease is not None and (session_token is None or lease[0] == session_token):
+                del self._leases[image_path]
+
+    def release_session(self, session_token: str):
+        """Drop every lease held by a session"""
+        with self._lock:
+            for image_path in [path for path, (token, _) in self._leases.items() if token == session_token]:
+                del self._leases[image_path]
+
+    def get_holder(self, image_path: str, now: float) -> Optional[str]:
+        """Session holding an unexpired lease on an image, if any"""
+        with self._lock:
+            lease = self._leases.get(image_path)
+        return lease[0] if lease is not None and lease[1] > now else None
+
+    def get_leases(self, now: float, session_token: Optional[str] = None) -> List[str]:
+        """Images under an unexpired lease (held by session_token, when given); expired leases are dropped"""
+        with self._lock:
+            for image_path in [path for path, (_, expires_at) in self._leases.items() if expires_at <= now]:
+                del self._leases[image_path]
+            return [path for path, (token, _) in self._leases.items()
+                    if session_token is None or token == session_token]
+
+    def close(self):
+        """Release any resources held by the backend"""
+
+
+class SQLiteLeaseBackend(InMemoryLeaseBackend):
+    """Assignment leases in a shared SQLite file, so every worker process sees the same assignments"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS assignment_leases (
+                    image_path TEXT PRIMARY KEY,
+                    session_token TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_leases_session ON assignment_leases (session_token)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, image_paths: Iterable[str], session_token: str, expires_at: float, now: float) -> List[str]:
+        claimed = []
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front, so two workers cannot claim the same image
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for image_path in image_paths:
+                cursor = conn.execute(
+                    "UPDATE assignment_leases SET session_token = ?, expires_at = ? "
+                    "WHERE image_path = ? AND expires_at <= ?",
+                    (session_token, expires_at, image_path, now),
+                )
+                if cursor.rowcount == 0:
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO assignment_leases (image_path, session_token, expires_at) "
+                        "VALUES (?, ?, ?)",
+                        (image_path, session_token, expires_at),
+                    )
+                if cursor.rowcount:
+                    claimed.append(image_path)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def renew(self, image_path: str, session_token: str, expires_at: float, now: float) -> bool:
+        cursor = self._connection().execute(
+            "UPDATE assignment_leases SET expires_at = ? WHERE image_path = ? AND session_token = ? AND expires_at > ?",
+            (expires_at, image_path, session_token, now),
+        )
+        return cursor.rowcount > 0
+
+    def release(self, image_path: str, session_token: Optional[str] = None):
+        if session_token is None:
+            self._connection().execute("DELETE FROM assignment_leases WHERE image_path = ?", (image_path,))
+        else:
+            self._connection().execute(
+                "DELETE FROM assignment_leases WHERE image_path = ? AND session_token = ?",
+                (image_path, session_token),
+            )
+
+    def release_session(self, session_token: str):
+        self._connection().execute("DELETE FROM assignment_leases WHERE session_token = ?", (session_token,))
+
+    def get_holder(self, image_path: str, now: float) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT session_token FROM assignment_leases WHERE image_path = ? AND expires_at > ?",
+            (image_path, now),
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_leases(self, now: float, session_token: Optional[str] = None) -> List[str]:
+        conn = self._connection()
+        conn.execute("DELETE FROM assignment_leases WHERE expires_at <= ?", (now,))
+        if session_token is None:
+            return [path for (path,) in conn.execute("SELECT image_path FROM assignment_leases")]
+        return [path for (path,) in conn.execute(
+            "SELECT image_path FROM assignment_leases WHERE session_token = ?", (session_token,)
+        )]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def create_lease_backend(db_path: Optional[str] = None) -> InMemoryLeaseBackend:
+    """Return the SQLite lease backend if db_path is given, else the in-memory backend"""
+    if db_path:
+        return SQLiteLeaseBackend(db_path)
+    return InMemoryLeaseBackend()
+
+
+class AssignmentScheduler:
+    """
+    Hands each session a batch of unreviewed rows under a time-bounded lease.
+
+    A session's batch is the set of images leased to it, served in row order.
+    Moving on to the next assigned row releases the lease on the row the
+    session was on, whether or not it saved a review, so skipped rows go
+    straight back to the pool. Only the row being viewed is renewed; rows of
+    a batch the session never reaches are reclaimed when their lease runs
+    out. Leases are keyed by image path and live in the lease backend, so
+    with SQLiteLeaseBackend every worker process shares them.
+
+    The work queue only sees reviews saved through this process, so a row
+    is checked against the review store (get_review) before it is claimed
+    or served; a review saved on another worker is recorded in the local
+    queue and the row is skipped.
+    """
+
+    def __init__(self, queue: WorkQueue, batch_size: int = 20, lease_seconds: float = 900,
+                 leases: Optional[InMemoryLeaseBackend] = None,
+                 get_review: Optional[Callable[[str], Optional[dict]]] = None):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.leases = leases if leases is not None else InMemoryLeaseBackend()
+        self.get_review = get_review
+        self._lock = threading.Lock()
+        self._cursor = -1  # Scan position for the next batch, wraps around
+
+    def _rows(self, image_paths: Iterable[str]) -> List[int]:
+        """Rows of leased images in the current CSV version, in row order"""
+        rows = (self.queue.get_row(image_path) for image_path in image_paths)
+        return sorted(row for row in rows if row is not None)
+
+    def _reviewed_elsewhere(self, row: int) -> bool:
+        """Whether the store holds a review of row that the work queue has not seen; records it if so"""
+        if self.get_review is None:
+            return False
+        review_data = self.get_review(self.queue.get_image_path(row))
+        if review_data is None:
+            return False
+        self.queue.mark_reviewed(row, review_data.get("reviewer_username", ""))
+        return True
+
+    def _claim_batch(self, session_token: str, now: float) -> List[int]:
+        """Lease up to batch_size unreviewed, unleased rows to a session"""
+        leased = set(self.leases.get_leases(now))
+        claimed = []
+        start = self._cursor
+        row = start
+        wrapped = False
+        while len(claimed) < self.batch_size:
+            candidates = []
+            while len(claimed) + len(candidates) < self.batch_size:
+                row = self.queue.find_next(row, MODE_UNREVIEWED)
+                if row is None:
+                    if wrapped:
+                        break
+                    wrapped = True
+                    row = -1
+                    continue
+                if wrapped and row > start:
+                    row = None
+                    break
+                image_path = self.queue.get_image_path(row)
+                if image_path not in leased and not self._reviewed_elsewhere(row):
+                    candidates.append(image_path)
+            if not candidates:
+                break
+            # Another worker may have claimed some of them since get_leases
+            got = self.leases.claim(candidates, session_token, now + self.lease_seconds, now)
+            leased.update(candidates)
+            claimed.extend(got)
+            if row is None:
+                break
+        claimed = self._rows(claimed)
+        if claimed:
+            self._cursor = claimed[-1]
+        return claimed
+
+    def next_assigned(self, session_token: str, current_row: Optional[int] = None) -> Optional[int]:
+        """
+        Return the session's next assigned row, claiming a new batch when it runs out.
+
+        The lease on current_row (the row the session is moving away from) is
+        released if the session holds it, so a row skipped without saving is
+        free for other reviewers again.
+        """
+        now = time.time()
+        with self._lock:
+            if current_row is not None and 0 <= current_row < self.queue.size:
+                self.leases.release(self.queue.get_image_path(current_row), session_token)
+            claimed = False
+            for _ in range(2):
+                batch = self._rows(self.leases.get_leases(now, session_token))
+                # The held batch may run out only after releasing rows reviewed elsewhere
+                if not batch and not claimed:
+                    batch = self._claim_batch(session_token, now)
+                    claimed = True
+                for row in batch:
+                    if not self.queue.is_reviewed(row) and not self._reviewed_elsewhere(row):
+                        self.leases.renew(self.queue.get_image_path(row), session_token,
+                                          now + self.lease_seconds, now)
+                        return row
+                    # Reviewed through another mode or worker since it was leased
+                    self.leases.release(self.queue.get_image_path(row), session_token)
+            return None
+
+    def renew(self, session_token: str, row: int):
+        """Extend the session's lease on the row it is viewing (no-op if it holds none)"""
+        if not 0 <= row < self.queue.size:
+            return
+        now = time.time()
+        self.leases.renew(self.queue.get_image_path(row), session_token, now + self.lease_seconds, now)
+
+    def get_lease_holder(self, row: int) -> Optional[str]:
+        """Session currently holding a lease on row, if any"""
+        return self.leases.get_holder(self.queue.get_image_path(row), time.time())
+
+    def leased_rows(self) -> List[int]:
+        """Rows currently under an unexpired lease"""
+        return self._rows(self.leases.get_leases(time.time()))
+
+    def complete(self, row: int):
+        """Release the lease on a row once its review is saved"""
+        self.leases.release(self.queue.get_image_path(row))
+
+    def release_session(self, session_token: str):
+        """Return all of a session's leased rows to the pool (e.g. on session expiry)"""
+        self.leases.release_session(session_token)